@@ -0,0 +1,190 @@
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+
+import cv2
+from playsound import playsound
+
+# --- Dispatcher alert di latar belakang ---
+# Loop frame hanya memasukkan alert (plat target cocok) ke antrean lalu lanjut. Satu thread
+# dispatcher menyimpan screenshot, memanggil notifier (log database, event, webhook, file log)
+# dan memutar suara, jadi kamera lain tidak ikut tertahan saat ada kecocokan.
+#
+# Notifier adalah callable notifier(alert) yang menerima dict:
+#   {'camera', 'plat_nomor', 'timestamp', 'screenshot_path'}
+# ditambah detail opsional dari dispatch(), misalnya 'ocr_plat' dan 'match_distance'.
+
+ALERT_QUEUE_SIZE = 64
+STOP_POLL_SECONDS = 0.1 # Saat berhenti, thread dispatcher memeriksa antrean kosong sesering ini
+
+
+class AlertDispatcher:
+    """
+    Runs alert side effects (screenshot, notifiers, sound) on a background thread.
+
+    dispatch() only enqueues, so the caller must hand over a frame nobody will draw on
+    or overwrite afterwards (a copy). Alerts that arrive while the queue is full are
+    dropped and counted rather than blocking the frame loop.
+    """
+
+    def __init__(self, screenshot_folder, sound_path='alert.wav', notifiers=None, maxsize=ALERT_QUEUE_SIZE):
+        self.screenshot_folder = screenshot_folder
+        self.sound_path = sound_path
+        self.notifiers = list(notifiers or [])
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stopping = threading.Event()
+        self._stop_deadline = None
+        self._sound_lock = threading.Lock()
+        self._sound_playing = False
+        self.alerts_dispatched = 0
+        self.alerts_dropped = 0
+        self.notifier_errors = 0
+        self.sounds_skipped = 0
+        self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+        self._thread.start()
+
+    def add_notifier(self, notifier):
+        self.notifiers.append(notifier)
+
+    def dispatch(self, plat_nomor, frame, camera=None, detected_at=None, **details):
+        """
+        Queues an alert for a matched plate. Returns False if it had to be dropped.
+        Extra keyword arguments are passed on to the notifiers in the alert dict.
+        """
+        alert = dict(details)
+        alert.update({
+            'camera': camera,
+            'plat_nomor': plat_nomor,
+            'detected_at': detected_at or time.time(),
+            'frame': frame,
+        })
+        try:
+            self._queue.put_nowait(alert)
+            return True
+        except queue.Full:
+            self.alerts_dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            stopping = self._stopping.is_set()
+            try:
+                # Once stopping, an empty queue ends the thread even if stop() found no room for None
+                alert = self._queue.get(timeout=STOP_POLL_SECONDS if stopping else None)
+            except queue.Empty:
+                break
+            if alert is None:
+                break
+            try:
+                self._handle(alert)
+            except Exception as e:
+                print(f"Error saat memproses alert {alert.get('plat_nomor')}: {e}")
+            if stopping and time.monotonic() > self._stop_deadline:
+                self._drop_pending()
+                break
+
+    def _drop_pending(self):
+        while True:
+            try:
+                alert = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if alert is not None:
+                self.alerts_dropped += 1
+
+    def _handle(self, alert):
+        frame = alert.pop('frame')
+        detected_at = alert.pop('detected_at')
+        alert['timestamp'] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(detected_at))
+        alert['screenshot_path'] = None
+        if frame is not None:
+            if not os.path.exists(self.screenshot_folder):
+                os.makedirs(self.screenshot_folder)
+            filename = os.path.join(self.screenshot_folder,
+                                    f"{alert['plat_nomor'].replace(' ', '_')}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(detected_at))}.jpg")
+            if cv2.imwrite(filename, frame): # Save screenshot
+                alert['screenshot_path'] = filename
+            else:
+                print(f"Error menyimpan screenshot {filename}")
+
+        for notifier in self.notifiers:
+            try:
+                notifier(dict(alert))
+            except Exception as e:
+                self.notifier_errors += 1
+                print(f"Error pada notifier {getattr(notifier, '__name__', notifier)}: {e}")
+
+        self.alerts_dispatched += 1
+        self._play_sound()
+
+    def _play_sound(self):
+        if not self.sound_path:
+            return
+        with self._sound_lock:
+            if self._sound_playing:
+                # An alert sound is already playing; overlapping alerts don't queue up more sound
+                self.sounds_skipped += 1
+                return
+            self._sound_playing = True
+        threading.Thread(target=self._sound_worker, name="alert-sound", daemon=True).start()
+
+    def _sound_worker(self):
+        try:
+            playsound(self.sound_path) # Play alert sound
+        except Exception as e:
+            print(f"Error memutar suara: {e}")
+        finally:
+            with self._sound_lock:
+                self._sound_playing = False
+
+    def stop(self, timeout=5.0):
+        """
+        Handles the alerts still queued for up to timeout seconds, then stops the dispatcher
+        thread; alerts left after that (e.g. behind a slow webhook) are dropped and counted.
+        """
+        self._stop_deadline = time.monotonic() + timeout
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(None) # Wakes an idle thread right away
+        except queue.Full:
+            pass # The thread is busy with the queue and notices _stopping on its own
+        self._thread.join(timeout + STOP_POLL_SECONDS)
+
+    def stats(self):
+        return {
+            'alerts_dispatched': self.alerts_dispatched,
+            'alerts_dropped': self.alerts_dropped,
+            'alerts_pending': self._queue.qsize(),
+            'notifier_errors': self.notifier_errors,
+            'sounds_skipped': self.sounds_skipped,
+        }
+
+
+class WebhookNotifier:
+    """POSTs each alert as JSON to a URL, e.g. a local webhook receiver."""
+
+    def __init__(self, url, timeout=2.0):
+        self.url = url
+        self.timeout = timeout
+        self.__name__ = f"webhook {url}"
+
+    def __call__(self, alert):
+        request = urllib.request.Request(self.url, data=json.dumps(alert).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class LogFileNotifier:
+    """Appends each alert as one JSON line to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.__name__ = f"log {path}"
+
+    def __call__(self, alert):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(alert) + "\n")
@@ -0,0 +1,89 @@
+import os
+import threading
+from multiprocessing.connection import Listener, AuthenticationError
+
+# --- Proses mesin deteksi mandiri ---
+# Satu proses ini memegang semua kamera, model YOLO dan OCR. Worker web (gunicorn dengan
+# ANPR_ENGINE=remote) terhubung lewat IPC lokal untuk menarik frame beranotasi dan event
+# deteksi, serta mengirim perintah (daftar kamera, hentikan stream, statistik).
+# Jalankan: python anpr_engine.py  (alamat lihat ANPR_ENGINE_ADDRESS di engine_client.py)
+
+os.environ['ANPR_ENGINE'] = 'inprocess' # Mesin selalu menjalankan deteksi sendiri
+import app as detector
+from engine_client import DEFAULT_ENGINE_ADDRESS, ENGINE_ADDRESS, ENGINE_ERRORS, engine_authkey, ensure_runtime_dir
+
+
+def serve_frames(conn, camera_index):
+    frames = detector.stream_camera_frames(camera_index)
+    try:
+        for jpeg in frames:
+            conn.send_bytes(jpeg)
+    except ENGINE_ERRORS:
+        raise
+    except Exception as e:
+        print(f"Error pada stream Kamera {camera_index}: {e}")
+    finally:
+        frames.close()
+    conn.send_bytes(b'') # Akhir stream: kamera tidak bisa dibuka, dihentikan atau error
+
+
+def serve_events(conn):
+    events = detector.detection_event_stream() # Pings keep dead clients from lingering
+    try:
+        for event in events:
+            conn.send(event)
+    finally:
+        events.close()
+
+
+def handle_connection(conn):
+    """Serves one client connection: a single command, a frame stream or an event stream."""
+    try:
+        message = conn.recv()
+        cmd = message.pop('cmd', None)
+        if cmd == 'subscribe':
+            serve_frames(conn, message['camera'])
+        elif cmd == 'events':
+            serve_events(conn)
+        elif cmd in detector.ENGINE_COMMANDS:
+            try:
+                conn.send(('ok', detector.ENGINE_COMMANDS[cmd](**message)))
+            except Exception as e:
+                conn.send(('error', f"{type(e).__name__}: {e}"))
+        else:
+            conn.send(('error', f"Perintah tidak dikenal: {cmd}"))
+    except ENGINE_ERRORS:
+        pass # Klien menutup koneksi (misalnya browser berhenti menonton)
+    finally:
+        conn.close()
+
+
+def main():
+    detector.init_target_db()
+    detector.init_log_db()
+    authkey = engine_authkey(create=True)
+    if ENGINE_ADDRESS == DEFAULT_ENGINE_ADDRESS:
+        ensure_runtime_dir() # Socket default hanya bisa dijangkau pengguna yang sama
+    # Socket Unix sisa proses sebelumnya harus dihapus sebelum bisa di-bind ulang
+    if not ENGINE_ADDRESS.startswith('\\\\') and os.path.exists(ENGINE_ADDRESS):
+        os.remove(ENGINE_ADDRESS)
+    listener = Listener(ENGINE_ADDRESS, authkey=authkey)
+    # Model dimuat di latar belakang; /ready di worker web melaporkan kapan selesai
+    detector.start_engine_loading()
+    print(f"Mesin deteksi mendengarkan di {ENGINE_ADDRESS}")
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, OSError, EOFError) as e:
+                print(f"Koneksi klien ditolak: {e}")
+                continue
+            threading.Thread(target=handle_connection, args=(conn,), name="engine-client", daemon=True).start()
+    except KeyboardInterrupt:
+        print("Mesin deteksi dihentikan.")
+    finally:
+        listener.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-import re
 import cv2
 import pytesseract
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -7,7 +6,14 @@ import sqlite3
 from datetime import datetime
 import os # Untuk memeriksa file database
 import imutils
-from playsound import playsound
+from ocr_backend import create_ocr_backend
+from shared_frames import SharedFrameCapture
+from alert_dispatcher import AlertDispatcher
+from log_writer import DetectionLogWriter
+from db import connect_wal
+from watchlist_cache import WatchlistCache, prepare_target_store
+from plate_normalizer import format_plat
+from process_local import ProcessLocal
 
 # --- Konfigurasi Awal ---
 # !!! PENTING: Sesuaikan PATH Tesseract jika di Windows !!!
@@ -16,60 +22,25 @@ from playsound import playsound
 # Jika kamu pakai macOS/Linux dan sudah terinstal via brew/apt, baris ini mungkin tidak perlu.
 
 COOLDOWN_SECONDS = 30  # Atur waktu cooldown dalam detik
+# Toleransi salah baca OCR saat mencocokkan target (lihat watchlist_index.py); 0 = hanya cocok persis
+WATCHLIST_MAX_DISTANCE = float(os.getenv('WATCHLIST_MAX_DISTANCE', '0.6'))
 
 # --- Database Setup ---
 DB_TARGET_PLATS = 'target_plat_nomor.db'
 DB_DETECTED_PLATS = 'detected_plat_nomor.db'
 DB_LOGS = "detection_logs.db"
 
-import re
+# Satu thread penulis dengan koneksi WAL tetap; loop video tidak membuka koneksi per log.
+# Seperti di app.py, dibuat saat pertama dipakai (ProcessLocal), bukan saat modul diimpor
+log_writer = ProcessLocal(lambda: DetectionLogWriter(DB_LOGS))
 
-import re
+# FRAME_TRANSPORT=shm membaca kamera lewat proses capture terpisah ke ring shared memory
+# (shared_frames.py). video_source 'shm:<nama ring>' membaca ring yang sudah diterbitkan proses
+# lain, misalnya 'shm:anpr_cam0' dari pipeline app.py, tanpa membuka kamera untuk kedua kalinya.
+FRAME_TRANSPORT = os.getenv('FRAME_TRANSPORT', 'direct')
 
-def format_plat(plat_text):
-    """
-    Mengambil plat nomor dari teks yang lebih panjang.
-    Mengoreksi kesalahan umum seperti Z vs 2 secara selektif.
-    """
-    if not plat_text:
-        return ""
-    
-    # Hapus spasi, karakter baris baru, dan ubah ke kapital
-    plat_text_clean = plat_text.replace(" ", "").upper().strip()
-    
-    # Pola Regex yang lebih spesifik: (huruf depan)(angka)(huruf belakang)
-    match = re.search(r'([A-Z]{1,2})(\d{1,4})([A-Z]{1,3})', plat_text_clean)
-    if match:
-        prefix = match.group(1) # Huruf depan (misalnya 'B')
-        angka = match.group(2)  # Bagian angka (misalnya '2156')
-        suffix = match.group(3) # Huruf belakang (misalnya 'TOR')
-        
-        # Koreksi kesalahan OCR hanya pada bagian huruf belakang
-        # Ganti angka '2' di suffix menjadi 'Z'
-        suffix = suffix.replace('2', 'Z')
-        
-        return f"{prefix} {angka} {suffix}".strip()
-    
-    # Koreksi untuk kasus yang lebih sederhana, misal 'B1001Z22'
-    if len(plat_text_clean) > 5:
-        # Coba perbaiki plat_text_clean. Contoh: B1001Z22 -> B1001ZZZ
-        corrected_plat = ""
-        for char in plat_text_clean:
-            if char.isdigit() and char != '0' and char != '1':
-                corrected_plat += char.replace('2', 'Z')
-            else:
-                corrected_plat += char
-        plat_text_clean = corrected_plat
-        
-        # Coba cocokkan lagi dengan regex setelah perbaikan
-        match = re.search(r'([A-Z]+)(\d+)([A-Z]+)', plat_text_clean)
-        if match:
-            prefix = match.group(1)
-            angka = match.group(2)
-            suffix = match.group(3)
-            return f"{prefix} {angka} {suffix}".strip()
-            
-    return ""
+# Backend OCR yang sama dengan app.py: engine Tesseract tetap hidup jika libtesseract tersedia
+ocr_backend = ProcessLocal(lambda: create_ocr_backend(os.getenv('OCR_BACKEND', 'auto'), pool_size=1))
 
 def init_target_db():
     conn = sqlite3.connect(DB_TARGET_PLATS)
@@ -94,11 +65,12 @@ def init_target_db():
         except sqlite3.IntegrityError:
             print(f"Plat nomor '{plat}' sudah ada di database. Dilewati.")
 
+    prepare_target_store(cursor) # Kolom rule_type (plat/pola) dan nomor versi watchlist
     conn.commit()
     conn.close()
     print(f"Plat nomor target contoh ditambahkan ke {DB_TARGET_PLATS}.")
 def init_log_db():
-    conn = sqlite3.connect(DB_LOGS)
+    conn = connect_wal(DB_LOGS) # WAL: pembaca tidak menahan penulis log
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS detection_logs (
@@ -127,25 +99,15 @@ def init_detected_db():
     conn.commit()
     conn.close()
 
+# Daftar target dalam memori; dimuat ulang otomatis saat tabel target_plats berubah (watchlist_cache.py)
+watchlist_cache = WatchlistCache(DB_TARGET_PLATS, max_distance=WATCHLIST_MAX_DISTANCE)
+
 def get_target_plats():
-    conn = sqlite3.connect(DB_TARGET_PLATS)
-    cursor = conn.cursor()
-    cursor.execute("SELECT plat_nomor FROM target_plats")
-    plats = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return set(plats) # Menggunakan set untuk pencarian yang lebih cepat
+    return watchlist_cache.plates() # Dari cache, tanpa query database setiap kali
 
-def log_detected_plat(plat_nomor, is_target, screenshot_path=None):
-    try:
-        conn = sqlite3.connect(DB_LOGS)
-        cursor = conn.cursor()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("INSERT INTO detection_logs (timestamp, plat_nomor, is_target, screenshot_path) VALUES (?, ?, ?, ?)",
-                       (timestamp, plat_nomor, is_target, screenshot_path))
-        conn.commit()
-        conn.close()
-    except sqlite3.Error as e:
-        print(f"Error saat menyimpan log ke database: {e}")
+def log_detected_plat(plat_nomor, is_target, screenshot_path=None, timestamp=None):
+    # Hanya dimasukkan ke antrean; log_writer menulisnya berbatch di thread latar belakang
+    log_writer.get().log(plat_nomor, is_target, screenshot_path=screenshot_path, timestamp=timestamp)
 
 # --- Fungsi untuk Melakukan OCR pada Area Plat Nomor ---
 def recognize_plate(image_roi):
@@ -179,9 +141,8 @@ def recognize_plate(image_roi):
         # --oem 3: Menggunakan model OCR Engine Mode neural network & legacy
         # --psm 7: Page Segmentation Mode untuk single text line (cocok untuk plat)
         # -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789: Hanya izinkan huruf dan angka
-        config = r'--oem 3 --psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-        
-        text = pytesseract.image_to_string(thresh, config=config)
+        # (konfigurasi ini diterapkan oleh ocr_backend)
+        text = ocr_backend.get().image_to_string(thresh, psm=7)
         
         # Bersihkan teks yang terbaca (hapus spasi, karakter non-alphanumeric, dll.)
         cleaned_text = "".join(filter(str.isalnum, text)).upper()
@@ -235,7 +196,7 @@ def detect_and_recognize_plate(frame):
                 ret, threshold = cv2.threshold(plate_roi, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
                 
                 # 5. Lakukan OCR
-                plate_text = pytesseract.image_to_string(threshold, config='--psm 8')
+                plate_text = ocr_backend.get().image_to_string(threshold, psm=8, whitelist=None)
                 
                 # Hapus karakter yang tidak valid
                 plate_text = "".join(e for e in plate_text if e.isalnum() or e.isspace())
@@ -247,11 +208,10 @@ def detect_and_recognize_plate(frame):
 
 # --- Fungsi Utama Sistem ANPR ---
 def run_anpr_system(video_source=0):
-    conn = sqlite3.connect(DB_TARGET_PLATS)
-    cursor = conn.cursor()
-    cursor.execute("SELECT plat_nomor FROM target_plats")
-    target_plats = {plat_nomor.upper() for (plat_nomor,) in cursor.fetchall()}
-    conn.close()
+    # Penulis log dan backend OCR dibuat di sini, di proses yang benar-benar menjalankan loop video
+    log_writer.get()
+    ocr_backend.get()
+    target_plats = get_target_plats()
 
     print(f"Plat nomor target yang akan dicari: {target_plats}")
 
@@ -261,17 +221,42 @@ def run_anpr_system(video_source=0):
         os.makedirs(screenshot_folder)
         print(f"Folder screenshot dibuat: {screenshot_folder}")
 
-    cap = cv2.VideoCapture(video_source)
-    if not cap.isOpened():
-        print("Error: Tidak bisa membuka kamera.")
-        return
+    cap = None
+    shared_capture = None
+    if isinstance(video_source, str) and video_source.startswith('shm:'):
+        shared_capture = SharedFrameCapture(ring_name=video_source[len('shm:'):])
+    elif FRAME_TRANSPORT == 'shm':
+        shared_capture = SharedFrameCapture(video_source)
+
+    if shared_capture is not None:
+        if not shared_capture.start():
+            print("Error: Tidak bisa membaca frame dari ring shared memory.")
+            return
+    else:
+        cap = cv2.VideoCapture(video_source)
+        if not cap.isOpened():
+            print("Error: Tidak bisa membuka kamera.")
+            return
+
+    def log_alert(alert):
+        print(f"Screenshot disimpan: {alert['screenshot_path']}")
+        log_detected_plat(alert['plat_nomor'], True, screenshot_path=alert['screenshot_path'], timestamp=alert['timestamp'])
+
+    alert_dispatcher = AlertDispatcher(screenshot_folder, notifiers=[log_alert])
 
     print("Sistem ANPR berjalan. Dekatkan plat nomor ke kamera. Tekan 'q' untuk keluar.")
 
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+        if shared_capture is not None:
+            frame, _ = shared_capture.read()
+            if frame is None:
+                if not shared_capture.is_running():
+                    break
+                continue
+        else:
+            ret, frame = cap.read()
+            if not ret:
+                break
         
         #frame = cv2.flip(frame, 1)
 
@@ -290,27 +275,24 @@ def run_anpr_system(video_source=0):
             if bbox_from_detection:
                 bbox = bbox_from_detection
 
-            if formatted_plat in target_plats:
+            # Perubahan daftar target berlaku tanpa restart; indeks ditukar oleh watchlist_cache
+            hit = watchlist_cache.lookup(formatted_plat) if formatted_plat else None
+            if hit:
+                target_plat, match_distance, matched_rule = hit
                 current_time = datetime.now()
-                if formatted_plat not in last_detected_time_formatted or \
-                   (current_time - last_detected_time_formatted.get(formatted_plat, datetime.min)).total_seconds() > COOLDOWN_SECONDS:
+                if target_plat not in last_detected_time_formatted or \
+                   (current_time - last_detected_time_formatted.get(target_plat, datetime.min)).total_seconds() > COOLDOWN_SECONDS:
 
-                    display_text = f"*** COCOK! {formatted_plat} ***"
+                    display_text = f"*** COCOK! {target_plat} ***"
                     display_color = (0, 255, 0)
                     
-                    # Log deteksi ke database dengan jalur screenshot
-                    timestamp = current_time.strftime("%Y%m%d_%H%M%S")
-                    filename = os.path.join(screenshot_folder, f"{formatted_plat.replace(' ', '_')}_{timestamp}.jpg")
-                    cv2.imwrite(filename, frame)
-                    print(f"Screenshot disimpan: {filename}")
-                    log_detected_plat(formatted_plat, True, screenshot_path=filename)
+                    # Screenshot, log dan suara dijalankan dispatcher agar video tidak tertahan
+                    alert_dispatcher.dispatch(target_plat, frame.copy(), detected_at=current_time.timestamp(),
+                                              ocr_plat=formatted_plat, match_distance=match_distance, matched_rule=matched_rule)
                     
-                    print(f"NOTIFIKASI: Plat nomor cocok: {formatted_plat} pada {current_time.strftime('%H:%M:%S')}")
-                    try:
-                        playsound('alert.wav')
-                    except Exception as e:
-                        print(f"Error memutar suara: {e}")
-                    last_detected_time_formatted.update({formatted_plat: current_time})
+                    rule_text = f", pola '{matched_rule}'" if matched_rule else ""
+                    print(f"NOTIFIKASI: Plat nomor cocok: {target_plat} (terbaca '{formatted_plat}', jarak {match_distance}{rule_text}) pada {current_time.strftime('%H:%M:%S')}")
+                    last_detected_time_formatted.update({target_plat: current_time})
             else:
                 display_text = f"Plat terdeteksi: {formatted_plat}"
                 display_color = (0, 255, 255)
@@ -328,8 +310,15 @@ def run_anpr_system(video_source=0):
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
-    cap.release()
+    if shared_capture is not None:
+        print(f"Statistik ring frame: {shared_capture.stats()}")
+        shared_capture.stop()
+    else:
+        cap.release()
     cv2.destroyAllWindows()
+    alert_dispatcher.stop() # Selesaikan alert yang masih antre
+    log_writer.get().close() # Pastikan semua log sudah tersimpan
+    print(f"Statistik log: {log_writer.get().stats()}")
     print("Sistem ANPR berhenti.")
 
 # Perbarui pemanggilan fungsi inisialisasi
@@ -1,17 +1,41 @@
+import atexit
 import os
 import cv2
 import sqlite3
 import re
 import numpy as np
 from datetime import datetime
-from playsound import playsound
 from flask import Flask, render_template, Response, jsonify, request, send_from_directory
 import pytesseract
-from ultralytics import YOLO
 import subprocess
 import threading
 import time
+import json
+import multiprocessing
+import queue
+import csv
+import io
 import sys # Import sys for platform detection
+from camera_pipeline import PIPELINE_IDLE_SECONDS, CameraPipeline
+from inference_scheduler import BatchInferenceScheduler
+from plate_tracker import PlateTracker, pick_plate
+from motion_gate import MotionGate
+from detection_cadence import AdaptiveCadence, FlowBoxPropagator
+from ocr_cache import OcrResultCache, crop_dhash
+from ocr_backend import create_ocr_backend
+from process_local import ProcessLocal
+from ocr_workers import AsyncOcrPool
+from detector_backend import load_detector
+from camera_profiles import CameraProfile, load_camera_profiles
+from event_bus import EventBus
+from alert_dispatcher import AlertDispatcher, LogFileNotifier, WebhookNotifier
+from log_writer import DetectionLogWriter
+from db import ConnectionPool
+from watchlist_cache import WatchlistCache, prepare_target_store
+from plate_patterns import is_plate_pattern, normalize_pattern
+from plate_normalizer import PlateNormalizer, format_plat, plate_normalizer
+import engine_client
+from engine_client import EngineUnavailable
 
 # --- KONSTANTA & FUNGSI UTAMA ---
 COOLDOWN_SECONDS = 30
@@ -19,15 +43,50 @@ DB_TARGET_PLATS = "target_plats.db"
 DB_LOGS = "detection_logs.db"
 screenshot_folder = "captured_plates"
 last_detected_time = {}
+# Jarak edit berbobot maksimum agar plat terbaca dianggap cocok dengan target (lihat watchlist_index.py).
+# 0 = hanya cocok persis; 1.0 = juga menerima satu karakter lain yang salah atau hilang.
+WATCHLIST_MAX_DISTANCE = float(os.getenv('WATCHLIST_MAX_DISTANCE', '0.6'))
+# Seberapa sering detektor memeriksa apakah daftar target berubah (juga dari proses lain)
+WATCHLIST_CHECK_SECONDS = float(os.getenv('WATCHLIST_CHECK_SECONDS', '1'))
 
 # Inisialisasi lock untuk melindungi akses ke last_detected_time
 last_detected_time_lock = threading.Lock()
 # Inisialisasi lock global untuk mengelola stream kamera aktif
 camera_lock = threading.Lock() # Dipindahkan ke sini untuk memastikan definisi awal
 
-# Muat model YOLO sekali di awal program
-# Ganti dengan 'yolov8n.pt' jika belum melatih model kustom
-yolo_model = YOLO('runs/detect/train/weights/best.pt')
+# Mode mesin deteksi: 'inprocess' (default) menjalankan kamera, model dan OCR di proses ini.
+# 'remote' menjadikan proses ini klien tipis dari anpr_engine.py: frame beranotasi, event deteksi
+# dan perintah kamera lewat IPC lokal (lihat engine_client.py), sehingga worker gunicorn bisa
+# ditambah tanpa menggandakan model atau berebut kamera.
+ENGINE_MODE = os.getenv('ANPR_ENGINE', 'inprocess')
+REMOTE_ENGINE = ENGINE_MODE == 'remote'
+
+# Model YOLO dimuat malas (lihat load_engine_model) agar halaman yang tidak butuh model
+# (/logs, /manage_targets, ...) langsung bisa dilayani tanpa mengimpor torch.
+# Backend dipilih lewat DETECTOR_BACKEND (pytorch, onnx, openvino, openvino-int8); lihat detector_backend.py.
+# Atur DETECTOR_WEIGHTS='yolov8n.pt' jika belum melatih model kustom.
+# PRELOAD_MODEL=1 memuat model saat impor, misalnya untuk 'gunicorn --preload' agar satu salinan
+# model di proses master dibagi copy-on-write ke semua worker (thread-nya dibuat di tiap worker).
+PRELOAD_MODEL = os.getenv('PRELOAD_MODEL', '0') == '1'
+yolo_model = None
+
+# Semua kamera berbagi satu penjadwal inferensi yang menggabungkan frame menjadi batch.
+# Ukuran batch dan batas waktu tunggu bisa diatur lewat variabel lingkungan.
+YOLO_BATCH_SIZE = int(os.getenv('YOLO_BATCH_SIZE', '4'))
+YOLO_BATCH_MAX_WAIT_MS = float(os.getenv('YOLO_BATCH_MAX_WAIT_MS', '10'))
+DETECT_TIMEOUT_SECONDS = float(os.getenv('DETECT_TIMEOUT_SECONDS', '10'))
+
+# Status pemuatan mesin deteksi, dilaporkan oleh /ready
+engine_lock = threading.Lock()
+engine_state = {'status': 'idle', 'error': None, 'load_seconds': None}
+
+# Cache hasil OCR bersama untuk semua kamera, dikunci dengan perceptual hash potongan plat
+ocr_cache = OcrResultCache(
+    max_entries=int(os.getenv('OCR_CACHE_MAX_ENTRIES', '512')),
+    ttl_seconds=float(os.getenv('OCR_CACHE_TTL_SECONDS', '30')),
+    max_distance=int(os.getenv('OCR_CACHE_MAX_DISTANCE', '6')),
+    policy=os.getenv('OCR_CACHE_POLICY', 'lru'),
+)
 
 # --- Konfigurasi Jalur Tesseract ---
 # Coba ambil jalur Tesseract dari variabel lingkungan 'TESSERACT_PATH'.
@@ -53,111 +112,270 @@ else:
         print("Jika terjadi error 'TesseractNotFoundError', pastikan Tesseract terinstal dan")
         print("jalurnya ditambahkan ke PATH sistem Anda, atau atur variabel lingkungan 'TESSERACT_PATH'.")
 
+# Backend OCR: 'auto' (default) memakai engine Tesseract yang tetap hidup di proses jika
+# libtesseract ditemukan, selain itu pytesseract. OCR_ENGINE_POOL_SIZE = jumlah engine paralel.
+# Dibuat per proses saat pertama dipakai (lihat ocr_backend di bagian mesin deteksi).
+
+# OCR untuk plat yang dilacak berjalan di pool proses terpisah agar tidak menahan video.
+# OCR_WORKERS=0 mematikan pool (OCR dijalankan langsung di loop frame seperti sebelumnya).
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+OCR_MAX_PENDING_PER_CAMERA = int(os.getenv('OCR_MAX_PENDING_PER_CAMERA', '2'))
+
+def create_ocr_pool():
+    pool = AsyncOcrPool(OCR_WORKERS, OCR_MAX_PENDING_PER_CAMERA, backend_name=os.getenv('OCR_BACKEND', 'auto'))
+    atexit.register(pool.shutdown)
+    return pool
+
+# Dibuat per proses saat plat pertama dikirim: thread dispatcher tidak ikut ke worker hasil fork
+ocr_pool = ProcessLocal(create_ocr_pool) if OCR_WORKERS > 0 and not REMOTE_ENGINE else None
+
+# Sensitivitas gerbang gerakan per kamera (lihat DEFAULT_MOTION_SETTINGS di motion_gate.py).
+# Kamera yang tidak tercantum memakai pengaturan bawaan.
+# Contoh: {0: {'min_changed_ratio': 0.02, 'keepalive_seconds': 10}, 1: {'enabled': False}}
+MOTION_GATE_SETTINGS = {}
+
+# Profil per kamera (ROI dan imgsz inferensi) dari camera_profiles.json; lihat camera_profiles.py.
+# Pengaturan "motion" di profil menimpa MOTION_GATE_SETTINGS untuk kamera tersebut.
+CAMERA_PROFILES = load_camera_profiles()
+
+# Mode kadens adaptif: deteksi penuh setiap N frame, kotak digeser dengan optical flow di antaranya.
+# N menyesuaikan otomatis dari latensi inferensi agar target fps per kamera tercapai.
+ADAPTIVE_CADENCE_ENABLED = os.getenv('ADAPTIVE_CADENCE', '1') == '1'
+TARGET_FPS_PER_CAMERA = float(os.getenv('TARGET_FPS_PER_CAMERA', '15'))
+
 # Global dictionary to manage active camera streams
-# Stores {camera_index: {'cap': cv2.VideoCapture object, 'stop_event': threading.Event object}}
+# Stores {camera_index: CameraPipeline object}, shared by every viewer of that camera
 active_camera_streams = {}
 
+# Event deteksi untuk pelanggan seperti anpr_engine.py dan /log_stream:
+# type 'match' (plat target cocok, segera) dan type 'log' (baris log yang sudah tersimpan)
+detection_events = EventBus()
+EVENT_KEEPALIVE_SECONDS = 15 # Ping berkala agar pelanggan yang sudah pergi ketahuan
+
+
+# --- Mesin deteksi (dimuat saat pertama dibutuhkan) ---
+def load_engine_model():
+    """
+    Loads the detector once and warms it up with one dummy inference before it is marked ready.
+    With PRELOAD_MODEL the loaded weights are inherited by forked workers.
+    """
+    global yolo_model
+    if yolo_model is not None:
+        return yolo_model
+    with engine_lock:
+        if yolo_model is None:
+            engine_state.update(status='loading', error=None)
+            start = time.perf_counter()
+            try:
+                model = load_detector()
+                model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False) # Pemanasan
+            except Exception as e:
+                engine_state.update(status='error', error=str(e))
+                print(f"Error saat memuat mesin deteksi: {e}")
+                raise
+            yolo_model = model
+            engine_state.update(status='ready', load_seconds=round(time.perf_counter() - start, 2))
+            print(f"Mesin deteksi siap dalam {engine_state['load_seconds']} detik.")
+    return yolo_model
+
+# Penjadwal (thread batching) dan backend OCR dibuat per proses, jadi worker hasil fork
+# 'gunicorn --preload' punya thread sendiri; hanya bobot model yang dibagi dari master
+inference_scheduler = ProcessLocal(lambda: BatchInferenceScheduler(
+    load_engine_model(), max_batch_size=YOLO_BATCH_SIZE, max_wait_ms=YOLO_BATCH_MAX_WAIT_MS))
+ocr_backend = ProcessLocal(lambda: create_ocr_backend(
+    os.getenv('OCR_BACKEND', 'auto'), pool_size=int(os.getenv('OCR_ENGINE_POOL_SIZE', '2'))))
+
+def get_inference_scheduler():
+    """Returns this process's BatchInferenceScheduler, loading the detector on first use."""
+    return inference_scheduler.get()
+
+def start_engine_loading():
+    """Starts loading the detection engine on a background thread (no-op if loaded or loading)."""
+    if engine_state['status'] in ('idle', 'error'):
+        engine_state['status'] = 'loading'
+        threading.Thread(target=_load_engine_quietly, name="engine-loader", daemon=True).start()
+
+def _load_engine_quietly():
+    try:
+        get_inference_scheduler()
+        ocr_backend.get()
+    except Exception:
+        pass # Error sudah dicatat di engine_state
+
+
+# Spawned helper processes (OCR workers) re-import the main module; they must not load the model
+if PRELOAD_MODEL and not REMOTE_ENGINE and multiprocessing.parent_process() is None:
+    load_engine_model()
+
+
+# Koneksi database per thread dengan WAL dan busy timeout (db.py), dipakai semua rute
+target_db = ConnectionPool(DB_TARGET_PLATS)
+log_db = ConnectionPool(DB_LOGS)
+
+# Daftar target dalam memori untuk semua kamera; dimuat ulang otomatis saat target_plats berubah
+watchlist_cache = WatchlistCache(DB_TARGET_PLATS, max_distance=WATCHLIST_MAX_DISTANCE, check_interval=WATCHLIST_CHECK_SECONDS)
+
+def publish_logs(rows):
+    """Publishes log rows committed by log_writer so open log pages can append them."""
+    for row in rows:
+        detection_events.publish(dict(row, type='log'))
+
+# Log deteksi ditulis berbatch oleh satu thread dengan koneksi WAL yang tetap terbuka (log_writer.py)
+# Setiap batch yang tersimpan diterbitkan sebagai event 'log' untuk /log_stream
+# Thread penulis dibuat per proses saat log pertama (ProcessLocal), juga di worker hasil fork
+log_writer = ProcessLocal(lambda: DetectionLogWriter(
+    DB_LOGS,
+    batch_size=int(os.getenv('LOG_BATCH_SIZE', '100')),
+    flush_interval=float(os.getenv('LOG_FLUSH_SECONDS', '1')),
+    on_written=publish_logs,
+))
 
 def init_target_db():
-    conn = sqlite3.connect(DB_TARGET_PLATS)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS target_plats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            plat_nomor TEXT NOT NULL UNIQUE
-        )
-    ''')
-    target_plats_example = ['B 1001 ZZZ', 'B 2156 TOR', 'F 9012 HIJ']
-    for plat in target_plats_example:
-        try:
-            cursor.execute("INSERT INTO target_plats (plat_nomor) VALUES (?)", (plat,))
-        except sqlite3.IntegrityError:
-            pass # Plat already exists
-    conn.commit()
-    conn.close()
+    with target_db.transaction() as cursor:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS target_plats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                plat_nomor TEXT NOT NULL UNIQUE,
+                rule_type TEXT NOT NULL DEFAULT 'plate' -- 'plate' or 'pattern' (wildcards, see plate_patterns.py)
+            )
+        ''')
+        target_plats_example = ['B 1001 ZZZ', 'B 2156 TOR', 'F 9012 HIJ']
+        for plat in target_plats_example:
+            try:
+                cursor.execute("INSERT INTO target_plats (plat_nomor) VALUES (?)", (plat,))
+            except sqlite3.IntegrityError:
+                pass # Plat already exists
+        prepare_target_store(cursor)
 
 def init_log_db():
-    conn = sqlite3.connect(DB_LOGS)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS detection_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME NOT NULL,
-            plat_nomor TEXT NOT NULL,
-            is_target BOOLEAN NOT NULL,
-            screenshot_path TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def log_detected_plat(plat_nomor, is_target, screenshot_path=None):
-    try:
-        conn = sqlite3.connect(DB_LOGS)
-        cursor = conn.cursor()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("INSERT INTO detection_logs (timestamp, plat_nomor, is_target, screenshot_path) VALUES (?, ?, ?, ?)",
-                       (timestamp, plat_nomor, is_target, screenshot_path))
-        conn.commit()
-        conn.close()
-    except sqlite3.Error as e:
-        print(f"Error saat menyimpan log ke database: {e}")
+    with log_db.transaction() as cursor:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS detection_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME NOT NULL,
+                plat_nomor TEXT NOT NULL,
+                is_target BOOLEAN NOT NULL,
+                screenshot_path TEXT
+            )
+        ''')
+        # Indexes for /get_logs: newest-first pages, optionally filtered by plate or target status.
+        # The rowid (id) is implicitly the last column of every index, which the keyset cursor uses.
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_detection_logs_timestamp ON detection_logs (timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_detection_logs_plat ON detection_logs (plat_nomor, timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_detection_logs_target ON detection_logs (is_target, timestamp)")
 
-def format_plat(plat_text):
-    if not plat_text:
-        return ""
-    
-    plat_text_clean = plat_text.replace(" ", "").upper().strip()
-    
-    match = re.search(r'([A-Z]{1,2})(\d{1,4})([A-Z]{1,3})', plat_text_clean)
-    if match:
-        prefix = match.group(1)
-        angka = match.group(2)
-        suffix = match.group(3)
-        suffix = suffix.replace('2', 'Z') # Common OCR error correction
-        return f"{prefix} {angka} {suffix}".strip()
-    
-    if len(plat_text_clean) > 5:
-        corrected_plat = ""
-        for char in plat_text_clean:
-            if char.isdigit() and char != '0' and char != '1': # Assuming 2 might be Z
-                corrected_plat += char.replace('2', 'Z')
-            else:
-                corrected_plat += char
-        plat_text_clean = corrected_plat
-        
-        match = re.search(r'([A-Z]+)(\d+)([A-Z]+)', plat_text_clean)
-        if match:
-            prefix = match.group(1)
-            angka = match.group(2)
-            suffix = match.group(3)
-            return f"{prefix} {angka} {suffix}".strip()
-            
-    return ""
-
-def detect_and_recognize_plate(frame):
-    results = yolo_model(frame, verbose=False)
-    plat_text = ""
-    bbox = None
-    frame_height, frame_width, _ = frame.shape
-    for result in results:
-        for box in result.boxes.data:
-            x1, y1, x2, y2, conf, cls = box
-            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-            w, h = x2 - x1, y2 - y1
-            aspect_ratio = w / float(h) if h > 0 else 0
-            min_aspect, max_aspect = 2.0, 5.0 # Typical aspect ratio for license plates
-            min_width, min_height = frame_width * 0.1, frame_height * 0.05 # Minimum size for a plate
-            if min_aspect <= aspect_ratio <= max_aspect and w >= min_width and h >= min_height:
-                cropped_plate = frame[y1:y2, x1:x2]
-                # Tesseract configuration for license plates
-                custom_config = r'--oem 3 --psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-                text = pytesseract.image_to_string(cropped_plate, config=custom_config)
-                if text:
-                    plat_text = text.strip()
-                    bbox = (x1, y1, w, h)
-                    return plat_text, bbox
-    return "", None
+def log_detected_plat(plat_nomor, is_target, screenshot_path=None, timestamp=None):
+    """Queues a detection log row; log_writer inserts it in the next batch."""
+    log_writer.get().log(plat_nomor, is_target, screenshot_path=screenshot_path, timestamp=timestamp)
+
+# --- Alert plat target ---
+# Screenshot, log database, event deteksi dan suara dijalankan thread dispatcher, bukan loop frame.
+# ALERT_WEBHOOK_URL dan ALERT_LOG_PATH menambahkan notifier webhook dan file log (opsional).
+ALERT_SOUND = os.getenv('ALERT_SOUND', 'alert.wav')
+ALERT_WEBHOOK_URL = os.getenv('ALERT_WEBHOOK_URL')
+ALERT_LOG_PATH = os.getenv('ALERT_LOG_PATH')
+
+def log_alert(alert):
+    log_detected_plat(alert['plat_nomor'], True, screenshot_path=alert['screenshot_path'], timestamp=alert['timestamp'])
+
+def publish_alert(alert):
+    detection_events.publish(dict(alert, type='match', is_target=True))
+
+def create_alert_dispatcher():
+    dispatcher = AlertDispatcher(screenshot_folder, sound_path=ALERT_SOUND, notifiers=[log_alert, publish_alert])
+    if ALERT_WEBHOOK_URL:
+        dispatcher.add_notifier(WebhookNotifier(ALERT_WEBHOOK_URL))
+    if ALERT_LOG_PATH:
+        dispatcher.add_notifier(LogFileNotifier(ALERT_LOG_PATH))
+    return dispatcher
+
+# Thread dispatcher dibuat per proses saat alert pertama (ProcessLocal), juga di worker hasil fork
+alert_dispatcher = ProcessLocal(create_alert_dispatcher)
+
+def detect_plate_boxes(frame, camera_index=None, profile=None):
+    """
+    Runs YOLO on the camera's region of interest and returns the (x, y, w, h) boxes
+    that look like license plates, in full-frame coordinates.
+    """
+    profile = profile or CameraProfile()
+    roi_image, (offset_x, offset_y) = profile.crop(frame)
+    # Detection goes through the shared scheduler so frames from several cameras run as one batch
+    # Never wait forever: a stuck model call only costs this frame its detections
+    boxes = get_inference_scheduler().detect(roi_image, source=camera_index, imgsz=profile.imgsz,
+                                             timeout=DETECT_TIMEOUT_SECONDS)
+    return profile.plate_boxes(boxes, roi_image.shape, (offset_x, offset_y))
+
+def recognize_plate_text(cropped_plate):
+    """Runs Tesseract on a cropped plate and returns the stripped raw text."""
+    # Tesseract configuration for license plates: --oem 3 --psm 8 with an A-Z/0-9 whitelist
+    text = ocr_backend.get().image_to_string(cropped_plate, psm=8)
+    return text.strip() if text else ""
+
+def recognize_plate_text_cached(cropped_plate):
+    """recognize_plate_text behind the perceptual-hash cache, so near-identical crops skip Tesseract."""
+    return ocr_cache.get_or_compute(cropped_plate, recognize_plate_text)
+
+def request_track_ocr(tracker, track, cropped_plate, camera_index=None):
+    """
+    Starts OCR for a tracked plate. A cache hit (or inline OCR when the pool is off) is
+    applied right away; otherwise the crop goes to the async pool and the reading is
+    delivered to the tracker when it arrives.
+
+    Only a track's first reading may come from the cache: later crops of the same plate hit
+    the entry of its own first reading, and counting those as votes would let one misread
+    settle the vote on its own.
+    """
+    first_reading = track.ocr_attempts == 0
+    if ocr_pool is None:
+        text = recognize_plate_text_cached(cropped_plate) if first_reading else recognize_plate_text(cropped_plate)
+        track.add_reading(format_plat(text))
+        return
+    crop_hash = crop_dhash(cropped_plate, ocr_cache.hash_size)
+    cached_text = ocr_cache.get(crop_hash) if first_reading else None
+    if cached_text is not None:
+        track.add_reading(format_plat(cached_text))
+        return
+
+    track.ocr_pending = True
+    track_id = track.track_id
+
+    def on_text(text):
+        # Called from the pool's thread; the tracker applies it on the processing thread
+        if text is None:
+            tracker.deliver_reading(track_id, None)
+            return
+        ocr_cache.put(crop_hash, text)
+        tracker.deliver_reading(track_id, format_plat(text))
+
+    ocr_pool.get().submit(camera_index, cropped_plate, on_text)
+
+def detect_and_recognize_plate(frame, camera_index=None, tracker=None, profile=None):
+    """
+    Returns (plat_text, bbox, settled) for the first readable plate in the frame, or ("", None, False).
+
+    With a PlateTracker, each plate keeps its track across frames and is only OCR'd
+    until its vote is settled; after that the voted (already formatted) text is reused.
+    Until then settled is False and plat_text is only the leading reading (see pick_plate).
+    OCR for tracks may complete asynchronously (see request_track_ocr).
+    """
+    bboxes = detect_plate_boxes(frame, camera_index, profile)
+    if tracker is None:
+        for bbox in bboxes:
+            x, y, w, h = bbox
+            text = recognize_plate_text_cached(frame[y:y + h, x:x + w])
+            if text:
+                return text, bbox, True # No tracker, no vote: the single reading is all there is
+        return "", None, False
+
+    tracks = tracker.update(bboxes)
+    for track in tracks:
+        if track.needs_ocr():
+            x, y, w, h = track.bbox
+            tracker.ocr_calls += 1
+            request_track_ocr(tracker, track, frame[y:y + h, x:x + w], camera_index)
+        else:
+            tracker.ocr_skipped += 1
+    return pick_plate(tracks)
 
 def get_cameras():
     """
@@ -167,15 +385,10 @@ def get_cameras():
     index = 0
     arr = []
     
-    # Release any lingering camera instances before checking
-    # This part should ideally not clear active_camera_streams if they are in use by video feeds.
-    # For now, we'll keep it as is, but note that it might interrupt active streams.
+    # Cameras that already have a running pipeline are reported as available without probing,
+    # so loading the dashboard never interrupts another operator's stream.
     with camera_lock:
-        for cam_info in list(active_camera_streams.values()): # Iterate over a copy to allow modification
-            if cam_info['cap'].isOpened():
-                cam_info['stop_event'].set() # Signal to stop
-                cam_info['cap'].release()
-        active_camera_streams.clear() # Clear the dictionary
+        busy_indices = {idx for idx, pipeline in active_camera_streams.items() if pipeline.is_running()}
 
     print("Mencari kamera yang tersedia...")
     # List of backends to try, in order of preference
@@ -187,6 +400,11 @@ def get_cameras():
 
     while index < max_camera_index_to_check:
         found_at_index = False
+        if index in busy_indices:
+            arr.append(f"Kamera {index}")
+            print(f"Kamera {index} sedang dipakai oleh stream aktif.")
+            index += 1
+            continue
         for backend in backends_to_try:
             cap = None
             try:
@@ -213,129 +431,81 @@ def get_cameras():
     print(f"Ditemukan {len(arr)} kamera yang berfungsi.")
     return arr
 
-# --- Fungsi untuk generator frame ---
-def generate_frames(camera_index):
+# --- Pipeline kamera bersama ---
+def make_frame_processor(camera_index):
     """
-    Generator function to capture frames from the camera and process them.
-    Manages camera lifecycle using active_camera_streams and stop_event.
+    Builds the per-camera processing step used by CameraPipeline.
+    Returns a function that detects, recognizes and matches a plate on a frame,
+    draws the overlay and returns the annotated frame.
     """
-    print(f"Mencoba memulai stream untuk Kamera {camera_index}...")
-
-    # Ensure any previous stream for this index is stopped before starting a new one
-    with camera_lock:
-        if camera_index in active_camera_streams:
-            print(f"Menghentikan stream lama untuk Kamera {camera_index}...")
-            active_camera_streams[camera_index]['stop_event'].set()
-            time.sleep(0.2) # Give it a moment to stop
-            # Clean up the old entry if it hasn't already by its own loop
-            if camera_index in active_camera_streams: # Check again if it's still there
-                try:
-                    active_camera_streams[camera_index]['cap'].release()
-                    del active_camera_streams[camera_index]
-                except KeyError:
-                    pass # Already removed
-
-        cap = None
-        stop_event = threading.Event()
-
-        # Try opening camera with different backends if on Windows
-        backends_to_try = [cv2.CAP_DSHOW] if sys.platform == "win32" else []
-        backends_to_try.append(cv2.CAP_ANY)
-
-        for backend in backends_to_try:
-            try:
-                cap = cv2.VideoCapture(camera_index + backend)
-                if cap.isOpened():
-                    break # Successfully opened with this backend
-                else:
-                    if cap is not None: cap.release() # Release if failed to open
-                    cap = None
-            except Exception as e:
-                print(f"Error saat mencoba membuka Kamera {camera_index} dengan backend {backend}: {e}")
-                if cap is not None: cap.release()
-                cap = None
-
-        if cap is None or not cap.isOpened():
-            print(f"Error: Tidak bisa membuka Kamera {camera_index} dengan backend apapun.")
-            # Set stop event immediately if camera can't be opened
-            stop_event.set()
-            yield (b'--frame\r\n' # Send an empty frame to indicate no video
-                    b'Content-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n')
-            return # Exit generator
-
-        active_camera_streams[camera_index] = {'cap': cap, 'stop_event': stop_event}
-        print(f"Stream untuk Kamera {camera_index} berhasil dimulai.")
-    
-    # Load target plates from database (same as before)
-    conn = sqlite3.connect(DB_TARGET_PLATS)
-    cursor = conn.cursor()
-    cursor.execute("SELECT plat_nomor FROM target_plats")
-    target_plats = {plat_nomor.upper() for (plat_nomor,) in cursor.fetchall()}
-    conn.close()
+    # Target plates come from the shared watchlist cache, which tolerates OCR misreads (0/O, 8/B, 2/Z, ...)
+    # and picks up changes to target_plats without restarting the camera
+    watchlist_cache.index()
 
     if not os.path.exists(screenshot_folder):
         os.makedirs(screenshot_folder)
 
-    while not stop_event.is_set(): # Loop until stop event is set
-        success, frame = cap.read()
-        if not success:
-            if stop_event.is_set(): # Break if stop event was set during read
-                break
-            # If read fails but not stopped, try to re-open camera (can happen if camera disconnects)
-            print(f"Peringatan: Gagal membaca frame dari Kamera {camera_index}. Mencoba membuka kembali...")
-            cap.release() # Release current capture object
-            cap = None # Reset cap
-            
-            # Try to re-open with preferred backends
-            for backend in backends_to_try:
-                try:
-                    cap = cv2.VideoCapture(camera_index + backend)
-                    if cap.isOpened():
-                        print(f"Kamera {camera_index} berhasil dibuka kembali dengan backend {backend}.")
-                        break
-                    else:
-                        if cap is not None: cap.release()
-                        cap = None
-                except Exception as e:
-                    print(f"Error saat mencoba membuka kembali Kamera {camera_index} dengan backend {backend}: {e}")
-                    if cap is not None: cap.release()
-                    cap = None
-            
-            if cap is None or not cap.isOpened():
-                print(f"Error: Gagal membuka kembali Kamera {camera_index}. Menghentikan stream.")
-                stop_event.set() # Force stop if re-opening fails
-                break
-            time.sleep(0.5) # Wait a bit before retrying read
-            continue
-        
+    profile = CAMERA_PROFILES.get(camera_index) or CameraProfile()
+    # Setiap kamera punya pelacak sendiri agar tiap kendaraan hanya di-OCR beberapa kali
+    tracker = PlateTracker()
+    # YOLO hanya dijalankan jika ada gerakan di ROI (atau keepalive); frame statis memakai hasil terakhir
+    motion_gate = MotionGate(**{**MOTION_GATE_SETTINGS.get(camera_index, {}), **profile.motion})
+    cadence = AdaptiveCadence(target_fps=TARGET_FPS_PER_CAMERA) if ADAPTIVE_CADENCE_ENABLED else None
+    propagator = FlowBoxPropagator()
+    last_result = ("", None, False)
+
+    def process_frame(frame):
+        nonlocal last_result
         #frame = cv2.flip(frame, 1) # Flip frame horizontally for mirror effect
 
-        plat_text, bbox = detect_and_recognize_plate(frame)
+        # Attach OCR results that arrived from the worker pool since the previous frame
+        tracker.apply_readings()
+        if motion_gate.should_detect(profile.crop(frame)[0]):
+            if cadence is None or cadence.should_detect():
+                start = time.perf_counter()
+                last_result = detect_and_recognize_plate(frame, camera_index, tracker, profile)
+                if cadence is not None:
+                    cadence.record_detection(time.perf_counter() - start)
+                    propagator.reset(frame)
+            else:
+                # Between detections, move the known boxes with optical flow and keep their voted text
+                start = time.perf_counter()
+                visible_tracks = tracker.visible_tracks()
+                if not propagator.propagate(frame, visible_tracks):
+                    cadence.force_detection()
+                cadence.record_tracking(time.perf_counter() - start)
+                last_result = pick_plate(visible_tracks)
+        plat_text, bbox, settled = last_result
         display_text = "Mencari plat nomor..."
         display_color = (0, 255, 255) # Yellow color
         formatted_plat = ""
 
-        if plat_text:
+        if plat_text and not settled:
+            # Voting still running: show the leading reading, but only a settled vote may raise an alert
+            formatted_plat = format_plat(plat_text)
+            display_text = f"Membaca plat: {formatted_plat}"
+        elif plat_text:
             formatted_plat = format_plat(plat_text)
-            if formatted_plat in target_plats:
+            # Listed plates (tolerating OCR misreads) first, then wildcard pattern rules
+            hit = watchlist_cache.lookup(formatted_plat) if formatted_plat else None
+            if hit:
+                target_plat, match_distance, matched_rule = hit
                 current_time = datetime.now()
-                # Check cooldown period
-                # Gunakan last_detected_time_lock saat membaca dan menulis last_detected_time
+                # Check cooldown period (per target plate, however it was read)
+                # The lock only guards last_detected_time; the alert's side effects run on the dispatcher
                 with last_detected_time_lock:
-                    if formatted_plat not in last_detected_time or \
-                       (current_time - last_detected_time.get(formatted_plat, datetime.min)).total_seconds() > COOLDOWN_SECONDS:
-                        display_text = f"*** COCOK! {formatted_plat} ***"
-                        display_color = (0, 255, 0) # Green color for match
-                        timestamp = current_time.strftime("%Y%m%d_%H%M%S")
-                        filename = os.path.join(screenshot_folder, f"{formatted_plat.replace(' ', '_')}_{timestamp}.jpg")
-                        cv2.imwrite(filename, frame) # Save screenshot
-                        log_detected_plat(formatted_plat, True, screenshot_path=filename) # Log detection
-                        try:
-                            playsound('alert.wav') # Play alert sound
-                        except Exception as e:
-                            print(f"Error memutar suara: {e}")
-                        last_detected_time[formatted_plat] = current_time
+                    is_new_match = target_plat not in last_detected_time or \
+                       (current_time - last_detected_time.get(target_plat, datetime.min)).total_seconds() > COOLDOWN_SECONDS
+                    if is_new_match:
+                        last_detected_time[target_plat] = current_time
                 # End of lock usage
+                if is_new_match:
+                    display_text = f"*** COCOK! {target_plat} ***"
+                    display_color = (0, 255, 0) # Green color for match
+                    # Screenshot, log, event and sound happen on the dispatcher thread; it gets its
+                    # own copy because the overlay is drawn on this frame next
+                    alert_dispatcher.get().dispatch(target_plat, frame.copy(), camera=camera_index, detected_at=current_time.timestamp(),
+                                              ocr_plat=formatted_plat, match_distance=match_distance, matched_rule=matched_rule)
             else:
                 display_text = f"Plat terdeteksi: {formatted_plat}"
                 display_color = (0, 255, 255) # Yellow color for detected but not target
@@ -347,23 +517,168 @@ def generate_frames(camera_index):
             cv2.putText(frame, formatted_plat if formatted_plat else display_text, (bbox[0], bbox[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, display_color, 2)
         else:
             cv2.putText(frame, display_text, (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, display_color, 2, cv2.LINE_AA)
+        return frame
 
-        # Encode frame to JPEG and yield it
-        ret, buffer = cv2.imencode('.jpg', frame)
-        if not ret:
-            if stop_event.is_set():
-                break
-            continue
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-    
-    # Clean up when the loop breaks
+    def stats():
+        stats = tracker.stats()
+        stats.update(motion_gate.stats())
+        if cadence is not None:
+            stats.update(cadence.stats())
+        return stats
+
+    process_frame.stats = stats
+    return process_frame
+
+def acquire_pipeline(camera_index):
+    """
+    Returns the running CameraPipeline for a camera, starting one if needed.
+    Returns None if the camera can't be opened.
+    """
+    # The first stream request loads the model; that takes seconds, so it happens before
+    # camera_lock is taken and other cameras' stream and stop requests aren't held up
+    get_inference_scheduler()
+    with camera_lock:
+        pipeline = active_camera_streams.get(camera_index)
+        if pipeline is not None and pipeline.is_running():
+            return pipeline
+
+        print(f"Mencoba memulai pipeline untuk Kamera {camera_index}...")
+        pipeline = CameraPipeline(camera_index, make_frame_processor(camera_index))
+        if not pipeline.start():
+            print(f"Error: Tidak bisa membuka Kamera {camera_index} dengan backend apapun.")
+            active_camera_streams.pop(camera_index, None)
+            return None
+        active_camera_streams[camera_index] = pipeline
+        print(f"Pipeline untuk Kamera {camera_index} berhasil dimulai.")
+        return pipeline
+
+def stream_camera_frames(camera_index):
+    """
+    Yields the camera's annotated JPEG frames from its shared pipeline, starting it if needed.
+    Yields nothing if the camera can't be opened.
+    """
+    pipeline = acquire_pipeline(camera_index)
+    if pipeline is None:
+        return
+
+    subscriber = pipeline.subscribe()
+    try:
+        while pipeline.is_running():
+            jpeg = subscriber.get()
+            if jpeg is None:
+                continue
+            yield jpeg
+    finally:
+        # Runs when the viewer disconnects; the pipeline stops by itself once nobody is watching
+        pipeline.unsubscribe(subscriber)
+
+def stop_camera_stream(camera_index, force=False):
+    """
+    Signals the specified camera stream to stop and returns (response, status_code).
+    Without force only the caller's viewer goes away: its subscription ends when its feed
+    connection closes, and the shared pipeline stops by itself PIPELINE_IDLE_SECONDS after
+    the last viewer left. force stops the pipeline for every viewer right away.
+    """
     with camera_lock:
-        if camera_index in active_camera_streams:
-            active_camera_streams[camera_index]['cap'].release()
+        pipeline = active_camera_streams.get(camera_index)
+        if pipeline is None or not pipeline.is_running():
+            print(f"Kamera {camera_index} tidak aktif atau sudah dihentikan.")
+            return {'message': f'Kamera {camera_index} tidak aktif.'}, 404
+        if force:
+            pipeline.stop()
             del active_camera_streams[camera_index]
-            print(f"Stream untuk Kamera {camera_index} dihentikan dan dilepaskan.")
+            print(f"Sinyal berhenti dikirim ke Kamera {camera_index}.")
+            return {'message': f'Sinyal berhenti dikirim ke Kamera {camera_index}.'}, 200
+    # The caller can't be told apart from other viewers here, so the pipeline is never stopped on its behalf
+    message = (f'Kamera {camera_index} berhenti sendiri {PIPELINE_IDLE_SECONDS:.0f} detik '
+               f'setelah penonton terakhir menutup stream.')
+    print(message)
+    return {'message': message}, 200
+
+def engine_readiness(warm=False):
+    """Returns (state, status_code): 200 once the model is loaded and warmed up, 503 before that."""
+    if warm:
+        start_engine_loading()
+    state = dict(engine_state)
+    state['ready'] = state['status'] == 'ready'
+    return state, 200 if state['ready'] else 503
+
+def collect_pipeline_stats():
+    with camera_lock:
+        pipelines = dict(active_camera_streams)
+    return {str(idx): pipeline.stats() for idx, pipeline in pipelines.items()}
+
+def collect_inference_stats():
+    return {
+        'max_batch_size': YOLO_BATCH_SIZE,
+        'max_wait_ms': YOLO_BATCH_MAX_WAIT_MS,
+        'per_batch_size': inference_scheduler.peek().stats() if inference_scheduler.peek() is not None else {},
+        'ocr_cache': ocr_cache.stats(),
+        'ocr_pool': ocr_pool.peek().stats() if ocr_pool is not None and ocr_pool.peek() is not None else None,
+        'detection_events': {'published': detection_events.published, 'dropped': detection_events.dropped},
+        'alerts': alert_dispatcher.peek().stats() if alert_dispatcher.peek() is not None else None,
+        'log_writer': log_writer.peek().stats() if log_writer.peek() is not None else None,
+        'watchlist': watchlist_cache.stats(),
+        'plate_normalizer': plate_normalizer.stats(),
+    }
+
+# Perintah yang bisa dijalankan mesin deteksi; anpr_engine.py melayani perintah yang sama lewat IPC
+ENGINE_COMMANDS = {
+    'cameras': get_cameras,
+    'stop': stop_camera_stream,
+    'ready': engine_readiness,
+    'pipeline_stats': collect_pipeline_stats,
+    'inference_stats': collect_inference_stats,
+}
+
+def engine_call(cmd, **params):
+    """Runs an engine command here, or in anpr_engine.py when ANPR_ENGINE=remote."""
+    if REMOTE_ENGINE:
+        return engine_client.request(cmd, **params)
+    return ENGINE_COMMANDS[cmd](**params)
+
+def detection_event_stream():
+    """
+    Yields detection events from this process, or from the engine process when
+    ANPR_ENGINE=remote. A {'type': 'ping'} is yielded right after subscribing and then
+    whenever no event arrived for EVENT_KEEPALIVE_SECONDS.
+    """
+    if REMOTE_ENGINE:
+        yield from engine_client.stream_events()
+        return
+    subscriber = detection_events.subscribe()
+    try:
+        yield {'type': 'ping'}
+        while True:
+            try:
+                yield subscriber.get(timeout=EVENT_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield {'type': 'ping'}
+    finally:
+        detection_events.unsubscribe(subscriber)
+
+# --- Fungsi untuk generator frame ---
+def generate_frames(camera_index):
+    """
+    Generator function that streams a camera's annotated frames as MJPEG parts.
+    Every viewer subscribes to the same CameraPipeline (in this process, or in the
+    engine process when ANPR_ENGINE=remote), so opening the feed in another browser
+    doesn't stop or duplicate the detection work.
+    """
+    frames = engine_client.stream_frames(camera_index) if REMOTE_ENGINE else stream_camera_frames(camera_index)
+    sent_any = False
+    try:
+        for jpeg in frames:
+            sent_any = True
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+    except EngineUnavailable as e:
+        print(e)
+    finally:
+        frames.close()
+    if not sent_any:
+        yield (b'--frame\r\n' # Send an empty frame to indicate no video
+                b'Content-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n')
 
 
 app = Flask(__name__)
@@ -373,27 +688,47 @@ app = Flask(__name__)
 def index():
     return render_template('index.html')
 
+@app.errorhandler(EngineUnavailable)
+def engine_unavailable(error):
+    return jsonify({'message': str(error)}), 503
+
 @app.route('/get_cameras')
 def get_cameras_route():
-    cameras = get_cameras()
+    cameras = engine_call('cameras')
     return jsonify(cameras)
 
 @app.route('/video_feed/<int:camera_index>')
 def video_feed(camera_index):
-    # This route now directly calls generate_frames which handles stopping previous streams
+    # Each request subscribes to the camera's shared pipeline, starting it if needed
     return Response(generate_frames(camera_index), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/stop_video_feed/<int:camera_index>', methods=['POST'])
 def stop_video_feed(camera_index):
-    """Signals the specified camera stream to stop."""
-    with camera_lock:
-        if camera_index in active_camera_streams:
-            active_camera_streams[camera_index]['stop_event'].set()
-            print(f"Sinyal berhenti dikirim ke Kamera {camera_index}.")
-            return jsonify({'message': f'Sinyal berhenti dikirim ke Kamera {camera_index}.'}), 200
-        else:
-            print(f"Kamera {camera_index} tidak aktif atau sudah dihentikan.")
-            return jsonify({'message': f'Kamera {camera_index} tidak aktif.'}), 404
+    """
+    Signals the specified camera stream to stop.
+    The shared pipeline stops once its last viewer left; ?force=1 stops it for every viewer.
+    """
+    response, status = engine_call('stop', camera_index=camera_index, force=request.args.get('force') == '1')
+    return jsonify(response), status
+
+@app.route('/ready')
+def ready():
+    """
+    Readiness probe: 200 once the detection model is loaded and warmed up, 503 before that.
+    ?warm=1 starts loading the model in the background if nothing has loaded it yet.
+    """
+    state, status = engine_call('ready', warm=request.args.get('warm') == '1')
+    return jsonify(state), status
+
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    """Reports frame, drop and OCR counters for every running camera pipeline."""
+    return jsonify(engine_call('pipeline_stats'))
+
+@app.route('/inference_stats')
+def inference_stats():
+    """Reports YOLO throughput per batch size and OCR cache hit/miss statistics."""
+    return jsonify(engine_call('inference_stats'))
 
 # Rute open_screenshots_folder telah dihapus karena tidak sesuai untuk deployment web.
 # Sebagai gantinya, screenshot akan diakses langsung melalui rute /captured_plates/<filename>
@@ -405,18 +740,62 @@ def logs_page():
     """Renders the log history page."""
     return render_template('log.html')
 
+LOG_PAGE_SIZE = 100
+LOG_MAX_PAGE_SIZE = 500
+
+def _log_filters(args):
+    """Builds the WHERE clauses and parameters for the /get_logs filters."""
+    clauses, params = [], []
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+    try:
+        if date_from:
+            clauses.append("timestamp >= ?")
+            params.append(datetime.strptime(date_from, "%Y-%m-%d").strftime("%Y-%m-%d 00:00:00"))
+        if date_to:
+            clauses.append("timestamp <= ?")
+            params.append(datetime.strptime(date_to, "%Y-%m-%d").strftime("%Y-%m-%d 23:59:59"))
+    except ValueError:
+        raise ValueError("Format tanggal harus YYYY-MM-DD.")
+    plat = re.sub(r'[^A-Z0-9 ]', '', args.get('plat', '').upper()).strip()
+    if plat:
+        # Plates are stored upper case; GLOB is case-sensitive, so a prefix match can use the index
+        clauses.append("plat_nomor GLOB ?")
+        params.append(plat + '*')
+    is_target = args.get('is_target')
+    if is_target in ('0', '1'):
+        clauses.append("is_target = ?")
+        params.append(int(is_target))
+    return clauses, params
+
 @app.route('/get_logs')
 def get_logs():
-    """Fetches all detection logs from the database."""
-    conn = sqlite3.connect(DB_LOGS)
-    cursor = conn.cursor()
-    # Select all relevant columns, ordered by timestamp descending
-    cursor.execute("SELECT id, timestamp, plat_nomor, is_target, screenshot_path FROM detection_logs ORDER BY timestamp DESC")
-    logs = cursor.fetchall()
-    conn.close()
+    """
+    Fetches one page of detection logs, newest first.
+
+    Query parameters: limit, cursor (the next_cursor of the previous page), date_from and
+    date_to (YYYY-MM-DD), plat (plate prefix) and is_target (1 or 0). Pages are keyset
+    paginated on (timestamp, id), so deep pages cost the same as the first one.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', LOG_PAGE_SIZE)), 1), LOG_MAX_PAGE_SIZE)
+        clauses, params = _log_filters(request.args)
+        page_cursor = request.args.get('cursor')
+        if page_cursor:
+            cursor_timestamp, cursor_id = page_cursor.rsplit('|', 1)
+            clauses.append("(timestamp, id) < (?, ?)")
+            params.extend([cursor_timestamp, int(cursor_id)])
+    except ValueError as e:
+        return jsonify({'message': f'Parameter tidak valid: {e}'}), 400
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    # Select all relevant columns, ordered by timestamp descending; one extra row tells whether another page exists
+    logs = log_db.execute(
+        f"SELECT id, timestamp, plat_nomor, is_target, screenshot_path FROM detection_logs {where} "
+        "ORDER BY timestamp DESC, id DESC LIMIT ?", params + [limit + 1])
 
     log_list = []
-    for log in logs:
+    for log in logs[:limit]:
         log_dict = {
             'id': log[0],
             'timestamp': log[1],
@@ -425,8 +804,70 @@ def get_logs():
             'screenshot_path': log[4]
         }
         log_list.append(log_dict)
-    
-    return jsonify(log_list)
+
+    next_cursor = None
+    if len(logs) > limit:
+        last = log_list[-1]
+        next_cursor = f"{last['timestamp']}|{last['id']}"
+    return jsonify({'logs': log_list, 'next_cursor': next_cursor})
+
+LOG_STREAM_BACKFILL_LIMIT = 500
+
+def sse_message(event_type, data, event_id=None):
+    message = f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message
+
+def generate_log_events(last_id):
+    """
+    Streams new detection logs ('log') and target matches ('match') as Server-Sent Events.
+    With a last_id (the browser's Last-Event-ID after a reconnect), logs written since then
+    are read from the database first, so nothing is missed while disconnected.
+    """
+    events = detection_event_stream()
+    try:
+        next(events) # Subscribed: everything published from now on is captured
+        yield "retry: 3000\n\n"
+        if last_id is not None:
+            rows = log_db.execute(
+                "SELECT id, timestamp, plat_nomor, is_target, screenshot_path FROM detection_logs "
+                "WHERE id > ? ORDER BY id LIMIT ?", (last_id, LOG_STREAM_BACKFILL_LIMIT))
+            for row in rows:
+                last_id = row[0]
+                yield sse_message('log', {'id': row[0], 'timestamp': row[1], 'plat_nomor': row[2],
+                                          'is_target': bool(row[3]), 'screenshot_path': row[4]}, event_id=row[0])
+        for event in events:
+            event_type = event.get('type')
+            if event_type == 'log':
+                if last_id is not None and event['id'] <= last_id:
+                    continue # Already sent from the database
+                data = {key: value for key, value in event.items() if key != 'type'}
+                yield sse_message('log', data, event_id=event['id'])
+            elif event_type == 'match':
+                yield sse_message('match', {key: value for key, value in event.items() if key != 'type'})
+            else:
+                yield ": ping\n\n" # Comment line: keeps the connection (and proxies) alive
+    except (EngineUnavailable, StopIteration) as e:
+        print(f"Stream log dihentikan: {e}")
+    finally:
+        events.close()
+
+@app.route('/log_stream')
+def log_stream():
+    """
+    Server-Sent Events stream of detection logs as they are written.
+    Each open stream holds one server thread (gunicorn gthread) for as long as the page is open.
+    """
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return jsonify({'message': 'Parameter tidak valid: last_id'}), 400
+    response = Response(generate_log_events(last_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Don't let a reverse proxy buffer the stream
+    return response
 
 @app.route('/delete_logs', methods=['POST'])
 def delete_logs():
@@ -437,13 +878,9 @@ def delete_logs():
     if not ids_to_delete:
         return jsonify({'message': 'Tidak ada log yang dipilih untuk dihapus.'}), 400
 
-    conn = sqlite3.connect(DB_LOGS)
-    cursor = conn.cursor()
-    
     # First, retrieve screenshot paths for the logs to be deleted
     # Using a parameterized query to prevent SQL injection
-    cursor.execute("SELECT screenshot_path FROM detection_logs WHERE id IN ({})".format(','.join('?' for _ in ids_to_delete)), ids_to_delete)
-    screenshot_paths = cursor.fetchall()
+    screenshot_paths = log_db.execute("SELECT screenshot_path FROM detection_logs WHERE id IN ({})".format(','.join('?' for _ in ids_to_delete)), ids_to_delete)
     
     # Delete the actual screenshot files from the server
     for path in screenshot_paths:
@@ -455,9 +892,8 @@ def delete_logs():
                 print(f"Error menghapus screenshot {path[0]}: {e}")
             
     # Then, delete the entries from the database
-    cursor.execute("DELETE FROM detection_logs WHERE id IN ({})".format(','.join('?' for _ in ids_to_delete)), ids_to_delete)
-    conn.commit()
-    conn.close()
+    with log_db.transaction() as cursor:
+        cursor.execute("DELETE FROM detection_logs WHERE id IN ({})".format(','.join('?' for _ in ids_to_delete)), ids_to_delete)
     
     return jsonify({'message': f'{len(ids_to_delete)} log berhasil dihapus.'}), 200
 
@@ -472,24 +908,193 @@ def manage_targets_page():
     """Renders the target plate management page."""
     return render_template('manage_targets.html')
 
+TARGET_PAGE_SIZE = 10
+TARGET_MAX_PAGE_SIZE = 500
+TARGET_ORDER_COLUMNS = {'0': 'id', '1': 'plat_nomor'}
+
 @app.route('/get_target_plats')
 def get_target_plats():
-    """Fetches all target plates from the database."""
-    conn = sqlite3.connect(DB_TARGET_PLATS)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, plat_nomor FROM target_plats ORDER BY plat_nomor ASC")
-    plats = cursor.fetchall()
-    conn.close()
-
-    plat_list = []
-    for plat in plats:
-        plat_dict = {
-            'id': plat[0],
-            'plat_nomor': plat[1]
-        }
-        plat_list.append(plat_dict)
-    
-    return jsonify(plat_list)
+    """
+    Fetches target plates.
+
+    Without paging parameters all plates are returned as a list. With DataTables
+    server-side parameters (draw, start, length, search[value], order[0][column],
+    order[0][dir]) one page is returned as {draw, recordsTotal, recordsFiltered, data};
+    the search matches anywhere in the plate, ignoring spaces. Every row has a rule_type,
+    'plate' or 'pattern'.
+    """
+    if 'draw' not in request.args:
+        plats = target_db.execute("SELECT id, plat_nomor, rule_type FROM target_plats ORDER BY plat_nomor ASC")
+        return jsonify([{'id': plat[0], 'plat_nomor': plat[1], 'rule_type': plat[2]} for plat in plats])
+
+    try:
+        draw = int(request.args['draw'])
+        start = max(int(request.args.get('start', 0)), 0)
+        length = min(max(int(request.args.get('length', TARGET_PAGE_SIZE)), 1), TARGET_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'message': f'Parameter tidak valid: {e}'}), 400
+    order_column = TARGET_ORDER_COLUMNS.get(request.args.get('order[0][column]'), 'id')
+    order_dir = 'DESC' if request.args.get('order[0][dir]') == 'desc' else 'ASC'
+    search = re.sub(r'[^A-Z0-9]', '', request.args.get('search[value]', '').upper())
+
+    where, params = "", []
+    if search:
+        where = "WHERE instr(replace(plat_nomor, ' ', ''), ?) > 0"
+        params.append(search)
+    records_total = target_db.execute("SELECT COUNT(*) FROM target_plats")[0][0]
+    records_filtered = target_db.execute(f"SELECT COUNT(*) FROM target_plats {where}", params)[0][0] if search else records_total
+    plats = target_db.execute(
+        f"SELECT id, plat_nomor, rule_type FROM target_plats {where} ORDER BY {order_column} {order_dir} LIMIT ? OFFSET ?",
+        params + [length, start])
+    return jsonify({
+        'draw': draw,
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'data': [{'id': plat[0], 'plat_nomor': plat[1], 'rule_type': plat[2]} for plat in plats],
+    })
+
+# --- Impor/ekspor daftar target dalam jumlah besar ---
+# CSV dibaca baris demi baris (kolom plat_nomor, atau kolom pertama jika tanpa header), setiap
+# plat dinormalisasi dengan PlateNormalizer (pola wildcard dengan normalize_pattern), lalu ditulis
+# per batch TARGET_IMPORT_BATCH_SIZE baris.
+# mode=merge menambahkan plat baru ke daftar; mode=replace menjadikan isi file sebagai daftar
+# lengkap yang ditukar dalam satu transaksi, jadi detektor tidak pernah melihat daftar setengah jadi.
+TARGET_IMPORT_BATCH_SIZE = 5000
+TARGET_IMPORT_MAX_INVALID_EXAMPLES = 20
+TARGET_EXPORT_CHUNK_ROWS = 1000
+# Input formulir dan impor CSV dinormalisasi dengan cara yang sama, tanpa cache: entri target
+# hanya akan menggeser bacaan OCR dari cache plate_normalizer milik detektor
+target_normalizer = PlateNormalizer(cache_size=0)
+
+def parse_target_entry(text):
+    """Returns (normalized value, rule_type) for a plate or wildcard pattern; ValueError if it is invalid."""
+    if is_plate_pattern(text):
+        return normalize_pattern(text), 'pattern'
+    if not text.strip():
+        raise ValueError('Plat Nomor tidak boleh kosong.')
+    # Stored like the detector formats its readings ("B 2156 TOR"), so the plate can match at all
+    plat_nomor = target_normalizer.normalize(text)
+    if not plat_nomor:
+        raise ValueError(f'"{text.strip()}" bukan plat nomor yang valid.')
+    return plat_nomor, 'plate'
+
+def read_target_csv(text_stream):
+    """
+    Yields (line number, raw value, normalized value, rule_type) for every data row of a
+    target CSV. The normalized value is "" if the row holds no valid plate or pattern.
+    """
+    reader = csv.reader(text_stream)
+    column = 0
+    for row in reader:
+        if not row:
+            continue
+        if reader.line_num == 1:
+            header = [cell.strip().lower() for cell in row]
+            if 'plat_nomor' in header:
+                column = header.index('plat_nomor')
+                continue
+        raw = row[column].strip() if column < len(row) else ''
+        if is_plate_pattern(raw):
+            try:
+                yield reader.line_num, raw, normalize_pattern(raw), 'pattern'
+            except ValueError:
+                yield reader.line_num, raw, '', 'pattern'
+        else:
+            yield reader.line_num, raw, target_normalizer.normalize(raw), 'plate'
+
+@app.route('/import_target_plats', methods=['POST'])
+def import_target_plats():
+    """
+    Imports target plates from a CSV upload (form field "file", or the raw request body).
+    ?mode=merge (default) adds the plates; ?mode=replace replaces the whole list atomically.
+    """
+    mode = request.args.get('mode', request.form.get('mode', 'merge'))
+    if mode not in ('merge', 'replace'):
+        return jsonify({'message': 'Parameter tidak valid: mode harus merge atau replace.'}), 400
+    upload = request.files.get('file')
+    binary_stream = upload.stream if upload is not None else request.stream
+    text_stream = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', errors='replace', newline='')
+
+    summary = {'mode': mode, 'rows_read': 0, 'invalid': 0, 'invalid_examples': [], 'added': 0, 'removed': 0}
+    conn = target_db.connection()
+
+    def write_batch(batch):
+        if mode == 'replace':
+            # Staged in a temp table of this connection; target_plats is untouched until the swap
+            conn.executemany("INSERT OR IGNORE INTO target_plats_import (plat_nomor, rule_type) VALUES (?, ?)", batch)
+            conn.commit()
+        else:
+            with target_db.transaction() as cursor:
+                cursor.executemany("INSERT OR IGNORE INTO target_plats (plat_nomor, rule_type) VALUES (?, ?)", batch)
+                summary['added'] += cursor.rowcount
+
+    try:
+        if mode == 'replace':
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS target_plats_import (plat_nomor TEXT PRIMARY KEY, rule_type TEXT NOT NULL)")
+            conn.execute("DELETE FROM target_plats_import")
+            conn.commit()
+        batch = []
+        for line_num, raw, plat_nomor, rule_type in read_target_csv(text_stream):
+            summary['rows_read'] += 1
+            if not plat_nomor:
+                summary['invalid'] += 1
+                if len(summary['invalid_examples']) < TARGET_IMPORT_MAX_INVALID_EXAMPLES:
+                    summary['invalid_examples'].append({'line': line_num, 'value': raw})
+                continue
+            batch.append((plat_nomor, rule_type))
+            if len(batch) >= TARGET_IMPORT_BATCH_SIZE:
+                write_batch(batch)
+                batch = []
+        if batch:
+            write_batch(batch)
+
+        if mode == 'replace':
+            staged = conn.execute("SELECT COUNT(*) FROM target_plats_import").fetchone()[0]
+            if staged == 0:
+                return jsonify(dict(summary, message='File tidak berisi plat yang valid; daftar target tidak diubah.')), 400
+            # The swap: one transaction, and plates on both lists keep their row (and id)
+            with target_db.transaction() as cursor:
+                cursor.execute("DELETE FROM target_plats WHERE plat_nomor NOT IN (SELECT plat_nomor FROM target_plats_import)")
+                summary['removed'] = cursor.rowcount
+                cursor.execute("INSERT OR IGNORE INTO target_plats (plat_nomor, rule_type) SELECT plat_nomor, rule_type FROM target_plats_import")
+                summary['added'] = cursor.rowcount
+    except (sqlite3.Error, csv.Error) as e:
+        return jsonify(dict(summary, message=f'Error saat mengimpor plat: {e}')), 500
+    finally:
+        if mode == 'replace':
+            conn.execute("DROP TABLE IF EXISTS temp.target_plats_import")
+            conn.commit()
+
+    watchlist_cache.invalidate()
+    summary['total'] = target_db.execute("SELECT COUNT(*) FROM target_plats")[0][0]
+    summary['message'] = (f"{summary['added']} plat ditambahkan, {summary['removed']} dihapus, "
+                          f"{summary['invalid']} baris tidak valid. Total {summary['total']} plat target.")
+    return jsonify(summary), 200
+
+@app.route('/export_target_plats')
+def export_target_plats():
+    """Streams every target plate as CSV, ordered by plate number."""
+    def generate():
+        cursor = target_db.connection().execute("SELECT plat_nomor FROM target_plats ORDER BY plat_nomor ASC")
+        try:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(['plat_nomor'])
+            while True:
+                rows = cursor.fetchmany(TARGET_EXPORT_CHUNK_ROWS)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        finally:
+            cursor.close()
+
+    filename = f"target_plats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return Response(generate(), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 @app.route('/add_target_plat', methods=['POST'])
 def add_target_plat():
@@ -499,19 +1104,20 @@ def add_target_plat():
 
     if not plat_nomor:
         return jsonify({'message': 'Plat Nomor tidak boleh kosong.'}), 400
+    try:
+        plat_nomor, rule_type = parse_target_entry(plat_nomor) # "B 21?? *" and the like become pattern rules
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
-    conn = sqlite3.connect(DB_TARGET_PLATS)
-    cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO target_plats (plat_nomor) VALUES (?)", (plat_nomor,))
-        conn.commit()
+        with target_db.transaction() as cursor:
+            cursor.execute("INSERT INTO target_plats (plat_nomor, rule_type) VALUES (?, ?)", (plat_nomor, rule_type))
+        watchlist_cache.invalidate() # Running detectors match the new plate right away
         return jsonify({'message': f'Plat "{plat_nomor}" berhasil ditambahkan.'}), 201
     except sqlite3.IntegrityError:
         return jsonify({'message': f'Plat "{plat_nomor}" sudah ada dalam daftar.'}), 409 # Conflict
     except sqlite3.Error as e:
         return jsonify({'message': f'Error saat menambahkan plat: {e}'}), 500
-    finally:
-        conn.close()
 
 @app.route('/edit_target_plat', methods=['POST'])
 def edit_target_plat():
@@ -522,24 +1128,26 @@ def edit_target_plat():
 
     if not plat_id or not new_plat_nomor:
         return jsonify({'message': 'ID Plat dan Plat Nomor baru tidak boleh kosong.'}), 400
+    try:
+        new_plat_nomor, rule_type = parse_target_entry(new_plat_nomor)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
-    conn = sqlite3.connect(DB_TARGET_PLATS)
-    cursor = conn.cursor()
     try:
-        # Check if the new plate number already exists for another ID
-        cursor.execute("SELECT id FROM target_plats WHERE plat_nomor = ? AND id != ?", (new_plat_nomor, plat_id))
-        if cursor.fetchone():
-            return jsonify({'message': f'Plat "{new_plat_nomor}" sudah ada untuk plat lain.'}), 409
-
-        cursor.execute("UPDATE target_plats SET plat_nomor = ? WHERE id = ?", (new_plat_nomor, plat_id))
-        conn.commit()
-        if cursor.rowcount == 0:
+        with target_db.transaction() as cursor:
+            # Check if the new plate number already exists for another ID
+            cursor.execute("SELECT id FROM target_plats WHERE plat_nomor = ? AND id != ?", (new_plat_nomor, plat_id))
+            if cursor.fetchone():
+                return jsonify({'message': f'Plat "{new_plat_nomor}" sudah ada untuk plat lain.'}), 409
+
+            cursor.execute("UPDATE target_plats SET plat_nomor = ?, rule_type = ? WHERE id = ?", (new_plat_nomor, rule_type, plat_id))
+            updated = cursor.rowcount
+        watchlist_cache.invalidate()
+        if updated == 0:
             return jsonify({'message': 'Plat tidak ditemukan atau tidak ada perubahan.'}), 404
         return jsonify({'message': f'Plat dengan ID {plat_id} berhasil diperbarui menjadi "{new_plat_nomor}".'}), 200
     except sqlite3.Error as e:
         return jsonify({'message': f'Error saat mengedit plat: {e}'}), 500
-    finally:
-        conn.close()
 
 @app.route('/delete_target_plat', methods=['POST'])
 def delete_target_plat():
@@ -550,32 +1158,27 @@ def delete_target_plat():
     if not plat_id:
         return jsonify({'message': 'ID Plat tidak boleh kosong.'}), 400
 
-    conn = sqlite3.connect(DB_TARGET_PLATS)
-    cursor = conn.cursor()
     try:
-        cursor.execute("DELETE FROM target_plats WHERE id = ?", (plat_id,))
-        conn.commit()
-        if cursor.rowcount == 0:
+        with target_db.transaction() as cursor:
+            cursor.execute("DELETE FROM target_plats WHERE id = ?", (plat_id,))
+            deleted = cursor.rowcount
+        watchlist_cache.invalidate()
+        if deleted == 0:
             return jsonify({'message': 'Plat tidak ditemukan.'}), 404
         return jsonify({'message': f'Plat dengan ID {plat_id} berhasil dihapus.'}), 200
     except sqlite3.Error as e:
         return jsonify({'message': f'Error saat menghapus plat: {e}'}), 500
-    finally:
-        conn.close()
 
 @app.route('/delete_all_target_plats', methods=['POST'])
 def delete_all_target_plats():
     """Deletes all target plates from the database."""
-    conn = sqlite3.connect(DB_TARGET_PLATS)
-    cursor = conn.cursor()
     try:
-        cursor.execute("DELETE FROM target_plats")
-        conn.commit()
+        with target_db.transaction() as cursor:
+            cursor.execute("DELETE FROM target_plats")
+        watchlist_cache.invalidate()
         return jsonify({'message': 'Semua plat target berhasil dihapus.'}), 200
     except sqlite3.Error as e:
         return jsonify({'message': f'Error saat menghapus semua plat: {e}'}), 500
-    finally:
-        conn.close()
 
 if __name__ == '__main__':
     init_target_db()
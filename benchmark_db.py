@@ -0,0 +1,159 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+import urllib.request
+
+# --- Benchmark rute log saat detektor sedang menulis ---
+# Mengukur request/detik dan latensi /get_logs dengan banyak pembaca bersamaan, sementara satu
+# penulis terus menambah log deteksi. Contoh:
+#   python benchmark_db.py                       (in-process: koneksi per request vs pool WAL)
+#   python benchmark_db.py --url http://127.0.0.1:5000/get_logs   (server yang sedang berjalan)
+
+from db import ConnectionPool
+from log_writer import DetectionLogWriter
+
+CREATE_LOGS_SQL = '''
+    CREATE TABLE IF NOT EXISTS detection_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME NOT NULL,
+        plat_nomor TEXT NOT NULL,
+        is_target BOOLEAN NOT NULL,
+        screenshot_path TEXT
+    )
+'''
+SELECT_LOGS_SQL = "SELECT id, timestamp, plat_nomor, is_target, screenshot_path FROM detection_logs ORDER BY timestamp DESC"
+
+
+def seed_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_LOGS_SQL)
+    conn.executemany(
+        "INSERT INTO detection_logs (timestamp, plat_nomor, is_target, screenshot_path) VALUES (?, ?, ?, ?)",
+        [(time.strftime("%Y-%m-%d %H:%M:%S"), f"B {i % 10000} XYZ", i % 50 == 0, None) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def run_writer(stop_event, write_rows, path, writes_per_second, batched):
+    """Simulates the detector: the old code committed one row per connection, the new one batches."""
+    interval = 1.0 / writes_per_second
+    writer = DetectionLogWriter(path) if batched else None
+    while not stop_event.is_set():
+        row = (time.strftime("%Y-%m-%d %H:%M:%S"), "B 1001 ZZZ", True, None)
+        if writer is not None:
+            writer.log(*row[1:], timestamp=row[0])
+            write_rows.append(1)
+        else:
+            try:
+                conn = sqlite3.connect(path)
+                conn.execute("INSERT INTO detection_logs (timestamp, plat_nomor, is_target, screenshot_path) VALUES (?, ?, ?, ?)", row)
+                conn.commit()
+                conn.close()
+                write_rows.append(1)
+            except sqlite3.OperationalError:
+                write_rows.append(0) # "database is locked"
+        time.sleep(interval)
+    if writer is not None:
+        writer.close()
+
+
+def bench(name, request_once, threads, duration, path, writes_per_second, batched):
+    latencies = []
+    errors = []
+    write_rows = []
+    lock = threading.Lock()
+    stop_event = threading.Event()
+
+    def reader():
+        while not stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                request_once()
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=reader) for _ in range(threads)]
+    if path:
+        workers.append(threading.Thread(target=run_writer, args=(stop_event, write_rows, path, writes_per_second, batched)))
+    for worker in workers:
+        worker.start()
+    time.sleep(duration)
+    stop_event.set()
+    for worker in workers:
+        worker.join()
+
+    latencies.sort()
+    result = {
+        'name': name,
+        'requests_per_second': round(len(latencies) / duration, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        'p95_ms': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2) if latencies else None,
+        'errors': len(errors),
+        'writes_ok': sum(write_rows),
+        'writes_failed': write_rows.count(0),
+    }
+    print(f"{name:<32} {result['requests_per_second']:>9} req/s  p50 {result['p50_ms']} ms  "
+          f"p95 {result['p95_ms']} ms  error baca {result['errors']}  tulis ok {result['writes_ok']} "
+          f"gagal {result['writes_failed']}")
+    if errors:
+        print(f"  contoh error: {errors[0]}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pembacaan log (request/detik) saat penulis log aktif.")
+    parser.add_argument('--rows', type=int, default=5000, help="Jumlah baris log awal.")
+    parser.add_argument('--threads', type=int, default=8, help="Jumlah pembaca bersamaan.")
+    parser.add_argument('--duration', type=float, default=10.0, help="Lama tiap skenario (detik).")
+    parser.add_argument('--writes-per-second', type=float, default=50.0)
+    parser.add_argument('--url', help="Ukur server yang sedang berjalan alih-alih in-process.")
+    args = parser.parse_args()
+
+    if args.url:
+        def request_once():
+            with urllib.request.urlopen(args.url, timeout=30) as response:
+                response.read()
+        bench(f"HTTP {args.url}", request_once, args.threads, args.duration, None, args.writes_per_second, True)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="anpr_bench_")
+    try:
+        baseline_path = os.path.join(workdir, "baseline.db")
+        pooled_path = os.path.join(workdir, "pooled.db")
+        seed_database(baseline_path, args.rows)
+        seed_database(pooled_path, args.rows)
+
+        def connect_per_request():
+            # The original route: new connection on the default rollback journal every request
+            conn = sqlite3.connect(baseline_path)
+            try:
+                conn.execute(SELECT_LOGS_SQL).fetchall()
+            finally:
+                conn.close()
+
+        pool = ConnectionPool(pooled_path)
+
+        def pooled():
+            pool.execute(SELECT_LOGS_SQL)
+
+        print(f"{args.rows} baris, {args.threads} pembaca, penulis {args.writes_per_second} log/detik, {args.duration} detik per skenario")
+        bench("sqlite3.connect per request", connect_per_request, args.threads, args.duration,
+              baseline_path, args.writes_per_second, batched=False)
+        bench("ConnectionPool (WAL) + log_writer", pooled, args.threads, args.duration,
+              pooled_path, args.writes_per_second, batched=True)
+        pool.close_all()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
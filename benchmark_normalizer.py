@@ -0,0 +1,159 @@
+import argparse
+import random
+import re
+import sys
+import time
+
+# --- Microbenchmark normalisasi teks OCR plat ---
+# Membandingkan format_plat lama (salinan di bawah) dengan PlateNormalizer: tanpa cache, dengan
+# cache memo dan normalize_many. Korpus sintetis meniru keluaran Tesseract: karakter mirip
+# tertukar kelas, spasi/tanda baca ikut terbaca dan teks yang sama berulang di banyak frame.
+# Ketepatan dihitung terhadap plat asli korpus sintetis. Regresi = teks yang dibaca benar oleh
+# format_plat lama (atau, tanpa plat asli, dibaca sama sekali) tetapi tidak oleh PlateNormalizer.
+# Regresi dibagi dua: ditolak (hasil baru kosong, plat yang dulu cocok tidak pernah cocok lagi)
+# dan terbaca lain (pembagian slot yang ambigu, misalnya "B8 6315" sebagai BB 6315 atau B 8631,
+# yang lebih sering benar di PlateNormalizer). --check keluar dengan status 1 jika ada teks yang
+# ditolak. Contoh:
+#   python benchmark_normalizer.py
+#   python benchmark_normalizer.py --corpus ocr_texts.txt   (satu teks OCR mentah per baris)
+#   python benchmark_normalizer.py --check
+
+from plate_normalizer import DIGIT_FOR_LETTER, LETTER_FOR_DIGIT, REGION_CODES, PlateNormalizer
+
+NOISE_CHARS = '|[]-.:\'"'
+
+
+def legacy_format_plat(plat_text):
+    """format_plat as it was in app.py and anpr_system.py before plate_normalizer.py."""
+    if not plat_text:
+        return ""
+    plat_text_clean = plat_text.replace(" ", "").upper().strip()
+    match = re.search(r'([A-Z]{1,2})(\d{1,4})([A-Z]{1,3})', plat_text_clean)
+    if match:
+        prefix = match.group(1)
+        angka = match.group(2)
+        suffix = match.group(3)
+        suffix = suffix.replace('2', 'Z')
+        return f"{prefix} {angka} {suffix}".strip()
+    if len(plat_text_clean) > 5:
+        corrected_plat = ""
+        for char in plat_text_clean:
+            if char.isdigit() and char != '0' and char != '1':
+                corrected_plat += char.replace('2', 'Z')
+            else:
+                corrected_plat += char
+        plat_text_clean = corrected_plat
+        match = re.search(r'([A-Z]+)(\d+)([A-Z]+)', plat_text_clean)
+        if match:
+            return f"{match.group(1)} {match.group(2)} {match.group(3)}".strip()
+    return ""
+
+
+def misread(text, to_other_class, rate, rng):
+    return "".join(to_other_class[char] if char in to_other_class and rng.random() < rate else char
+                   for char in text)
+
+
+def synthetic_corpus(plates, repeat, confusion_rate, noise_rate, seed, vehicles_in_view=4):
+    """Returns [(raw OCR text, true plate)]; every plate is read `repeat` times, like consecutive frames."""
+    rng = random.Random(seed)
+    regions = sorted(REGION_CODES)
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    corpus = []
+    for _ in range(plates):
+        region = rng.choice(regions)
+        angka = str(rng.randint(1, 9999))
+        suffix = "".join(rng.choice(letters) for _ in range(rng.randint(1, 3)))
+        truth = f"{region} {angka} {suffix}"
+        readings = []
+        for _ in range(max(1, repeat // 4)): # A handful of distinct readings per plate
+            raw = " ".join([misread(region, DIGIT_FOR_LETTER, confusion_rate, rng),
+                            misread(angka, LETTER_FOR_DIGIT, confusion_rate, rng),
+                            misread(suffix, DIGIT_FOR_LETTER, confusion_rate, rng)])
+            if rng.random() < noise_rate:
+                raw = rng.choice(NOISE_CHARS) + raw
+            if rng.random() < noise_rate:
+                raw = raw + rng.choice(NOISE_CHARS)
+            if rng.random() < noise_rate:
+                raw = raw.replace(" ", "", 1)
+            readings.append(raw + "\n")
+        corpus.append([(rng.choice(readings), truth) for _ in range(repeat)])
+    # Frames of a few vehicles in view at once are interleaved, the rest of the footage comes later
+    interleaved = []
+    for group_start in range(0, len(corpus), vehicles_in_view):
+        group = [reading for frames in corpus[group_start:group_start + vehicles_in_view] for reading in frames]
+        rng.shuffle(group)
+        interleaved.extend(group)
+    return interleaved
+
+
+def find_regressions(texts, legacy_results, results, truths):
+    """(text, old result, new result) for texts the old format_plat got right and the new normalizer doesn't."""
+    regressions = []
+    for i, (text, old, new) in enumerate(zip(texts, legacy_results, results)):
+        if truths is not None:
+            regressed = old == truths[i] and new != truths[i]
+        else:
+            regressed = bool(old) and not new
+        if regressed:
+            regressions.append((text, old, new))
+    return regressions
+
+
+def bench(name, run, texts, truths):
+    start = time.perf_counter()
+    results = run(texts)
+    elapsed = time.perf_counter() - start
+    line = (f"{name:<28} {len(texts) / elapsed:>11,.0f} teks/detik  "
+            f"{elapsed / len(texts) * 1e6:>7.2f} us/teks")
+    if truths is not None:
+        correct = sum(result == truth for result, truth in zip(results, truths))
+        line += f"  tepat {correct / len(truths):.1%}"
+    print(line)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark normalisasi teks OCR menjadi plat nomor.")
+    parser.add_argument('--plates', type=int, default=5000, help="Jumlah plat berbeda di korpus sintetis.")
+    parser.add_argument('--repeat', type=int, default=20, help="Berapa kali setiap plat terbaca (frame).")
+    parser.add_argument('--confusion-rate', type=float, default=0.08, help="Peluang satu karakter tertukar kelas.")
+    parser.add_argument('--noise-rate', type=float, default=0.2, help="Peluang noise/spasi hilang per bacaan.")
+    parser.add_argument('--cache-size', type=int, default=4096)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--corpus', help="File teks OCR mentah (satu per baris) alih-alih korpus sintetis.")
+    parser.add_argument('--check', action='store_true', help="Keluar dengan status 1 jika ada regresi terhadap format_plat lama.")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding='utf-8', errors='replace') as corpus_file:
+            texts = [line.rstrip('\n') for line in corpus_file]
+        truths = None
+    else:
+        corpus = synthetic_corpus(args.plates, args.repeat, args.confusion_rate, args.noise_rate, args.seed)
+        texts = [raw for raw, _ in corpus]
+        truths = [truth for _, truth in corpus]
+    print(f"{len(texts)} teks OCR, {len(set(texts))} berbeda")
+
+    legacy_results = bench("format_plat lama", lambda batch: [legacy_format_plat(text) for text in batch], texts, truths)
+    uncached = PlateNormalizer(cache_size=0)
+    results = bench("PlateNormalizer tanpa cache", lambda batch: [uncached.normalize(text) for text in batch], texts, truths)
+    cached = PlateNormalizer(cache_size=args.cache_size)
+    bench("PlateNormalizer + cache", lambda batch: [cached.normalize(text) for text in batch], texts, truths)
+    batched = PlateNormalizer(cache_size=args.cache_size)
+    bench("normalize_many", batched.normalize_many, texts, truths)
+    print(f"statistik cache: {cached.stats()}")
+
+    regressions = find_regressions(texts, legacy_results, results, truths)
+    rejected = sorted({regression for regression in regressions if not regression[2]})
+    misread = sorted({regression for regression in regressions if regression[2]})
+    print(f"regresi terhadap format_plat lama: {len(regressions)} teks, "
+          f"{len(rejected)} berbeda ditolak, {len(misread)} berbeda terbaca lain")
+    for text, old, new in rejected[:10] + misread[:5]:
+        print(f"  {text.strip()!r}: lama {old!r}, baru {new!r}")
+    if args.check and rejected:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from frame_capture import LatestFrameCapture
+from shared_frames import SharedFrameCapture
+
+# --- Pipeline bersama per kamera ---
+# Satu pipeline = satu capture thread + satu thread pemrosesan (deteksi, OCR, gambar overlay,
+# encode JPEG). Hasil JPEG dibagikan ke semua penonton (subscriber), masing-masing dengan
+# antrean terbatas. Biaya deteksi tetap sama berapa pun jumlah browser yang menonton.
+
+SUBSCRIBER_QUEUE_SIZE = 2 # Frame JPEG maksimum yang ditahan per penonton
+PIPELINE_IDLE_SECONDS = 5.0 # Pipeline berhenti jika tidak ada penonton selama ini
+STREAM_STATS_INTERVAL = 300 # Cetak statistik frame (diproses/dibuang) setiap N frame
+# Transport frame dari kamera: 'thread' (capture thread di proses ini) atau 'shm' (proses capture
+# terpisah yang menulis ke ring buffer shared memory; lihat shared_frames.py)
+FRAME_TRANSPORT = os.getenv('FRAME_TRANSPORT', 'thread')
+
+
+def create_frame_capture(camera_index):
+    if FRAME_TRANSPORT == 'shm':
+        return SharedFrameCapture(camera_index)
+    return LatestFrameCapture(camera_index)
+
+
+class FrameSubscriber:
+    """A single viewer of a CameraPipeline. Holds a bounded queue of encoded JPEG frames."""
+
+    def __init__(self, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.frames_dropped = 0
+
+    def put(self, jpeg):
+        # Slow viewers lose their oldest frame instead of slowing the pipeline down
+        while True:
+            try:
+                self.queue.put_nowait(jpeg)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.frames_dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=1.0):
+        """Returns the next JPEG bytes, or None if nothing arrived within timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class CameraPipeline:
+    """
+    Owns the capture and processing of one camera and fans the annotated frames out.
+
+    `process_frame(frame)` is called once per processed frame and must return the frame
+    to publish (annotated in place or a new array). Every transport hands out frames the
+    pipeline owns, so a processed frame is always published.
+    """
+
+    def __init__(self, camera_index, process_frame, idle_timeout=PIPELINE_IDLE_SECONDS):
+        self.camera_index = camera_index
+        self.process_frame = process_frame
+        self.idle_timeout = idle_timeout
+        self.capture = create_frame_capture(camera_index)
+        self.stop_event = self.capture.stop_event
+        self._subscribers = []
+        self._subscribers_lock = threading.Lock()
+        self._idle_since = time.monotonic()
+        self._thread = None
+        self.frames_processed = 0
+
+    def start(self):
+        """Starts capture and processing. Returns False if the camera can't be opened."""
+        if not self.capture.start():
+            return False
+        self._thread = threading.Thread(target=self._process_loop, name=f"pipeline-{self.camera_index}", daemon=True)
+        self._thread.start()
+        return True
+
+    def _process_loop(self):
+        try:
+            while not self.stop_event.is_set():
+                if self._idle_expired():
+                    print(f"Tidak ada penonton untuk Kamera {self.camera_index}. Pipeline dihentikan.")
+                    break
+
+                frame, frame_age = self.capture.read()
+                if frame is None:
+                    continue # Timeout or capture stopped; the loop condition decides
+
+                self.frames_processed += 1
+                if self.frames_processed % STREAM_STATS_INTERVAL == 0:
+                    stats = self.stats()
+                    print(f"Kamera {self.camera_index}: {stats['frames_processed']} diproses, "
+                          f"{stats['frames_dropped']} frame basi dibuang, usia frame {frame_age * 1000:.0f} ms, "
+                          f"{stats['subscribers']} penonton")
+
+                try:
+                    frame = self.process_frame(frame)
+                except Exception as e:
+                    print(f"Error saat memproses frame Kamera {self.camera_index}: {e}")
+                    continue
+
+                # Encode once, share the bytes with every viewer
+                ret, buffer = cv2.imencode('.jpg', frame)
+                if not ret:
+                    continue
+                self._publish(buffer.tobytes())
+        finally:
+            self.capture.stop()
+            print(f"Pipeline Kamera {self.camera_index} dihentikan dan dilepaskan. Statistik: {self.stats()}")
+
+    def _publish(self, jpeg):
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(jpeg)
+
+    def _idle_expired(self):
+        with self._subscribers_lock:
+            if self._subscribers:
+                return False
+            return time.monotonic() - self._idle_since > self.idle_timeout
+
+    def subscribe(self):
+        subscriber = FrameSubscriber()
+        with self._subscribers_lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._subscribers_lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+            if not self._subscribers:
+                self._idle_since = time.monotonic()
+
+    def subscriber_count(self):
+        with self._subscribers_lock:
+            return len(self._subscribers)
+
+    def is_running(self):
+        return not self.stop_event.is_set()
+
+    def stop(self):
+        """Stops processing and releases the camera for every viewer."""
+        self.stop_event.set()
+        self.capture.stop()
+
+    def stats(self):
+        stats = self.capture.stats()
+        stats['frames_processed'] = self.frames_processed
+        stats['subscribers'] = self.subscriber_count()
+        # The processing step may expose its own counters (tracker, OCR, ...)
+        processor_stats = getattr(self.process_frame, 'stats', None)
+        if processor_stats is not None:
+            stats.update(processor_stats())
+        return stats
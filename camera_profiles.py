@@ -0,0 +1,130 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+# --- Profil per kamera: area deteksi (ROI) dan resolusi inferensi ---
+# Profil dibaca dari file JSON (CAMERA_PROFILES_PATH, default camera_profiles.json), contoh:
+#
+#   {
+#     "0": {"roi": [0.0, 0.55, 1.0, 0.35], "imgsz": 416},
+#     "1": {"roi_polygon": [[120, 400], [1180, 380], [1270, 700], [40, 710]], "imgsz": 320,
+#           "motion": {"min_changed_ratio": 0.02}}
+#   }
+#
+# "roi" adalah [x, y, w, h] dalam piksel, atau relatif terhadap ukuran frame jika semua nilai <= 1.
+# "roi_polygon" adalah daftar titik (piksel atau relatif); area di luar poligon dihitamkan.
+# YOLO hanya melihat potongan ROI pada ukuran "imgsz"; OCR tetap memotong dari frame resolusi
+# penuh karena kotak hasil deteksi dikembalikan ke koordinat frame.
+
+CAMERA_PROFILES_PATH = os.getenv('CAMERA_PROFILES_PATH', 'camera_profiles.json')
+DEFAULT_MIN_PLATE_WIDTH_RATIO = 0.1 # Lebar plat minimum relatif terhadap lebar ROI
+DEFAULT_MIN_PLATE_HEIGHT_RATIO = 0.05 # Tinggi plat minimum relatif terhadap tinggi ROI
+MIN_PLATE_ASPECT, MAX_PLATE_ASPECT = 2.0, 5.0 # Rasio lebar/tinggi khas plat nomor
+
+
+def _is_relative(values):
+    return all(0.0 <= float(v) <= 1.0 for v in values)
+
+
+class CameraProfile:
+    """Detection region, inference size and plate size limits of one camera."""
+
+    def __init__(self, roi=None, roi_polygon=None, imgsz=None, motion=None,
+                 min_plate_width_ratio=DEFAULT_MIN_PLATE_WIDTH_RATIO,
+                 min_plate_height_ratio=DEFAULT_MIN_PLATE_HEIGHT_RATIO):
+        self.roi = roi
+        self.roi_polygon = roi_polygon
+        self.imgsz = imgsz
+        self.motion = motion or {}
+        self.min_plate_width_ratio = min_plate_width_ratio
+        self.min_plate_height_ratio = min_plate_height_ratio
+        self._cached_shape = None
+        self._cached_region = None
+        self._cached_mask = None
+
+    def _resolve(self, frame_shape):
+        if self._cached_shape == frame_shape:
+            return self._cached_region, self._cached_mask
+        frame_height, frame_width = frame_shape[:2]
+        mask = None
+
+        if self.roi_polygon:
+            points = np.array(self.roi_polygon, dtype=np.float64)
+            if _is_relative(points.ravel()):
+                points *= (frame_width, frame_height)
+            points = points.round().astype(np.int32)
+            x, y, w, h = cv2.boundingRect(points)
+        elif self.roi:
+            x, y, w, h = self.roi
+            if _is_relative(self.roi):
+                x, y, w, h = x * frame_width, y * frame_height, w * frame_width, h * frame_height
+            x, y, w, h = int(round(x)), int(round(y)), int(round(w)), int(round(h))
+        else:
+            x, y, w, h = 0, 0, frame_width, frame_height
+
+        # Batasi ROI agar tetap di dalam frame
+        x, y = max(0, min(x, frame_width - 1)), max(0, min(y, frame_height - 1))
+        w, h = max(1, min(w, frame_width - x)), max(1, min(h, frame_height - y))
+
+        if self.roi_polygon:
+            mask = np.zeros((h, w), dtype=np.uint8)
+            cv2.fillPoly(mask, [points - (x, y)], 255)
+
+        self._cached_shape = frame_shape
+        self._cached_region = (x, y, w, h)
+        self._cached_mask = mask
+        return self._cached_region, mask
+
+    def region(self, frame_shape):
+        """Returns the (x, y, w, h) detection region in frame pixels."""
+        return self._resolve(frame_shape)[0]
+
+    def crop(self, frame):
+        """Returns (roi_image, (offset_x, offset_y)). Rectangle ROIs are views, polygon ROIs masked copies."""
+        (x, y, w, h), mask = self._resolve(frame.shape)
+        roi_image = frame[y:y + h, x:x + w]
+        if mask is not None:
+            roi_image = cv2.bitwise_and(roi_image, roi_image, mask=mask)
+        return roi_image, (x, y)
+
+    def plate_boxes(self, boxes, roi_shape, offset):
+        """
+        Filters raw detector boxes (x1, y1, x2, y2, conf, cls) found in the ROI to those shaped
+        like a license plate, as (x, y, w, h) in full-frame coordinates.
+        """
+        roi_height, roi_width = roi_shape[:2]
+        offset_x, offset_y = offset
+        # Minimum size for a plate, relative to the region YOLO looked at
+        min_width, min_height = roi_width * self.min_plate_width_ratio, roi_height * self.min_plate_height_ratio
+        bboxes = []
+        for box in boxes:
+            x1, y1, x2, y2, conf, cls = box
+            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+            w, h = x2 - x1, y2 - y1
+            aspect_ratio = w / float(h) if h > 0 else 0
+            if MIN_PLATE_ASPECT <= aspect_ratio <= MAX_PLATE_ASPECT and w >= min_width and h >= min_height:
+                # Map back to the full-resolution frame so OCR and the overlay use full-frame pixels
+                bboxes.append((x1 + offset_x, y1 + offset_y, w, h))
+        return bboxes
+
+
+def load_camera_profiles(path=CAMERA_PROFILES_PATH):
+    """Reads {camera_index: CameraProfile} from the JSON file. A missing file means no profiles."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            raw_profiles = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error membaca profil kamera dari {path}: {e}")
+        return {}
+    profiles = {}
+    for camera_index, settings in raw_profiles.items():
+        try:
+            profiles[int(camera_index)] = CameraProfile(**settings)
+        except (TypeError, ValueError) as e:
+            print(f"Profil Kamera {camera_index} tidak valid, diabaikan: {e}")
+    print(f"Profil kamera dimuat dari {path}: {sorted(profiles)}")
+    return profiles
@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+# --- Koneksi SQLite bersama ---
+# Setiap thread (thread worker Flask/gunicorn, thread detektor) memakai satu koneksi per database
+# yang tetap terbuka, bukan sqlite3.connect per request. Semua koneksi memakai WAL: pembaca
+# (dashboard) tidak menahan penulis (log detektor) dan sebaliknya; busy_timeout menunggu kunci
+# sebentar alih-alih langsung gagal dengan "database is locked".
+
+BUSY_TIMEOUT_MS = 5000
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"), # Aman dengan WAL; commit tidak menunggu fsync penuh
+    ("temp_store", "MEMORY"),
+    ("cache_size", -16000), # ~16 MB cache halaman per koneksi
+    ("mmap_size", 134217728), # Baca lewat mmap hingga 128 MB
+)
+
+
+def connect_wal(db_path, busy_timeout_ms=BUSY_TIMEOUT_MS, pragmas=DEFAULT_PRAGMAS, check_same_thread=True):
+    """Opens a SQLite connection in WAL mode with a busy timeout and the tuned pragmas."""
+    conn = sqlite3.connect(db_path, timeout=busy_timeout_ms / 1000, check_same_thread=check_same_thread)
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+    for name, value in pragmas:
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+class ConnectionPool:
+    """
+    One long-lived connection per thread to a single database file.
+
+    Use `with pool.transaction() as cursor:` for statements that should commit together;
+    the transaction is rolled back if the block raises.
+    """
+
+    def __init__(self, db_path, busy_timeout_ms=BUSY_TIMEOUT_MS, pragmas=DEFAULT_PRAGMAS):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.pragmas = pragmas
+        self._local = threading.local()
+        self._connections = [] # (weakref to owning thread, connection)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def connection(self):
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # check_same_thread=False only so close_all() may close it from another thread
+            conn = connect_wal(self.db_path, self.busy_timeout_ms, self.pragmas, check_same_thread=False)
+            self._local.conn = conn
+            with self._lock:
+                self._prune_dead_threads()
+                self._connections.append((weakref.ref(threading.current_thread()), conn))
+                self.connections_opened += 1
+        return conn
+
+    def _prune_dead_threads(self):
+        # Servers that start a thread per request (the Flask dev server) leave connections behind
+        alive = []
+        for thread_ref, conn in self._connections:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                alive.append((thread_ref, conn))
+            else:
+                conn.close()
+        self._connections = alive
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def execute(self, sql, params=()):
+        """Runs a read query and returns all rows."""
+        cursor = self.connection().execute(sql, params)
+        try:
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for _, conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {'db_path': self.db_path, 'connections': len(self._connections), 'connections_opened': self.connections_opened}
@@ -0,0 +1,137 @@
+import math
+
+import cv2
+import numpy as np
+
+# --- Kadens deteksi adaptif ---
+# Deteksi penuh (YOLO + OCR) dijalankan setiap N frame. Di antaranya, kotak setiap track
+# digeser dengan optical flow (Lucas-Kanade) yang jauh lebih murah. N dihitung ulang dari
+# latensi deteksi dan tracking yang terukur agar target fps per kamera tercapai. Jika
+# tracking kehilangan keyakinan, deteksi penuh langsung dipaksa.
+
+DEFAULT_TARGET_FPS = 15.0
+MIN_DETECT_INTERVAL = 1
+MAX_DETECT_INTERVAL = 15
+LATENCY_SMOOTHING = 0.2 # Bobot sampel baru pada rata-rata eksponensial latensi
+
+FLOW_MAX_POINTS = 20 # Titik fitur maksimum per kotak plat
+FLOW_MIN_POINTS = 4 # Titik yang berhasil dilacak minimum agar kotak dianggap yakin
+FLOW_MIN_TRACKED_RATIO = 0.5 # Porsi titik yang berhasil dilacak minimum
+
+
+class AdaptiveCadence:
+    """
+    Chooses how many frames to wait between full detections.
+
+    With a per-frame budget of 1/target_fps, detection latency L and tracking latency t,
+    running detection every N frames costs L + (N - 1) * t, so N is the smallest value
+    with L + (N - 1) * t <= N / target_fps.
+    """
+
+    def __init__(self, target_fps=DEFAULT_TARGET_FPS, min_interval=MIN_DETECT_INTERVAL, max_interval=MAX_DETECT_INTERVAL):
+        self.target_fps = target_fps
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.detect_latency = None
+        self.track_latency = 0.0
+        self._frames_since_detection = 0
+        self._force = True # Frame pertama selalu deteksi penuh
+        self.detections = 0
+        self.forced_detections = 0
+        self.tracked_frames = 0
+
+    def should_detect(self):
+        if self._force or self._frames_since_detection + 1 >= self.interval:
+            return True
+        self._frames_since_detection += 1
+        return False
+
+    def force_detection(self):
+        """Requests a full detection on the next frame (e.g. tracking lost confidence)."""
+        self._force = True
+        self.forced_detections += 1
+
+    def record_detection(self, seconds):
+        self.detections += 1
+        self._frames_since_detection = 0
+        self._force = False
+        self.detect_latency = _smooth(self.detect_latency, seconds)
+        self._update_interval()
+
+    def record_tracking(self, seconds):
+        self.tracked_frames += 1
+        self.track_latency = _smooth(self.track_latency, seconds)
+
+    def _update_interval(self):
+        budget = 1.0 / self.target_fps
+        if self.detect_latency <= budget:
+            interval = self.min_interval
+        elif budget <= self.track_latency:
+            interval = self.max_interval # Tracking alone already misses the target
+        else:
+            interval = math.ceil((self.detect_latency - self.track_latency) / (budget - self.track_latency))
+        self.interval = max(self.min_interval, min(self.max_interval, interval))
+
+    def stats(self):
+        return {
+            'detect_interval': self.interval,
+            'detect_latency_ms': round(self.detect_latency * 1000, 1) if self.detect_latency is not None else None,
+            'track_latency_ms': round(self.track_latency * 1000, 1),
+            'full_detections': self.detections,
+            'forced_detections': self.forced_detections,
+            'tracked_frames': self.tracked_frames,
+        }
+
+
+def _smooth(previous, sample):
+    if previous is None:
+        return sample
+    return (1 - LATENCY_SMOOTHING) * previous + LATENCY_SMOOTHING * sample
+
+
+class FlowBoxPropagator:
+    """Moves track boxes forward between detections using sparse Lucas-Kanade optical flow."""
+
+    def __init__(self, min_points=FLOW_MIN_POINTS, min_tracked_ratio=FLOW_MIN_TRACKED_RATIO):
+        self.min_points = min_points
+        self.min_tracked_ratio = min_tracked_ratio
+        self._prev_gray = None
+
+    def reset(self, frame):
+        """Remembers the frame a fresh detection ran on as the flow reference."""
+        self._prev_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def propagate(self, frame, tracks):
+        """
+        Shifts each visible track's bbox by the median flow of the points inside it.
+        Returns False if any track could not be followed confidently.
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        prev_gray, self._prev_gray = self._prev_gray, gray
+        if prev_gray is None or prev_gray.shape != gray.shape:
+            return False
+
+        frame_height, frame_width = gray.shape
+        confident = True
+        for track in tracks:
+            x, y, w, h = track.bbox
+            roi = prev_gray[y:y + h, x:x + w]
+            if roi.size == 0:
+                confident = False
+                continue
+            points = cv2.goodFeaturesToTrack(roi, maxCorners=FLOW_MAX_POINTS, qualityLevel=0.01, minDistance=3)
+            if points is None or len(points) < self.min_points:
+                confident = False
+                continue
+            points = points.astype(np.float32) + np.array([x, y], dtype=np.float32)
+            next_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None, winSize=(15, 15), maxLevel=2)
+            good = status.ravel() == 1
+            if good.sum() < self.min_points or good.mean() < self.min_tracked_ratio:
+                confident = False
+                continue
+            dx, dy = np.median((next_points - points)[good].reshape(-1, 2), axis=0)
+            new_x = int(round(min(max(x + dx, 0), frame_width - w)))
+            new_y = int(round(min(max(y + dy, 0), frame_height - h)))
+            track.bbox = (new_x, new_y, w, h)
+        return confident
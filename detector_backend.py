@@ -0,0 +1,45 @@
+import os
+
+# --- Backend detektor plat nomor ---
+# Model hasil training (.pt) bisa diekspor ke ONNX atau OpenVINO (opsional int8) dengan
+# export_detector.py. Semua format dimuat lewat YOLO(...) sehingga antarmuka deteksinya
+# sama: model(frames, verbose=False) -> hasil dengan .boxes.data.
+#
+# Pilih backend dengan variabel lingkungan DETECTOR_BACKEND, atau tunjuk file/folder
+# model secara langsung dengan DETECTOR_WEIGHTS. Kuantisasi int8 (terkalibrasi) didukung untuk OpenVINO.
+# Paket runtime (onnxruntime / openvino) tidak ada di requirements.txt; ultralytics memasangnya
+# saat ekspor atau saat model tersebut pertama kali dimuat.
+
+TRAINED_WEIGHTS = 'runs/detect/train/weights/best.pt'
+DETECTOR_BACKENDS = {
+    'pytorch': TRAINED_WEIGHTS,
+    'onnx': 'runs/detect/train/weights/best.onnx',
+    'openvino': 'runs/detect/train/weights/best_openvino_model',
+    'openvino-int8': 'runs/detect/train/weights/best_int8_openvino_model',
+}
+
+
+def resolve_detector_weights(backend=None, weights=None):
+    """Returns (backend, path) for the configured detector, falling back to the .pt model if the export is missing."""
+    backend = backend or os.getenv('DETECTOR_BACKEND', 'pytorch')
+    weights = weights or os.getenv('DETECTOR_WEIGHTS')
+    if weights:
+        return backend, weights
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Backend detektor tidak dikenal: {backend} (pilih dari {list(DETECTOR_BACKENDS)})")
+    path = DETECTOR_BACKENDS[backend]
+    if not os.path.exists(path):
+        print(f"Model {backend} tidak ditemukan di {path}. Jalankan export_detector.py terlebih dahulu. "
+              f"Menggunakan model PyTorch {TRAINED_WEIGHTS}.")
+        return 'pytorch', TRAINED_WEIGHTS
+    return backend, path
+
+
+def load_detector(backend=None, weights=None):
+    """Loads the plate detector for the configured backend."""
+    # Diimpor di sini agar modul ini (dan app.py) bisa diimpor tanpa memuat ultralytics/torch
+    from ultralytics import YOLO
+
+    backend, path = resolve_detector_weights(backend, weights)
+    print(f"Memuat detektor plat ({backend}): {path}")
+    return YOLO(path, task='detect')
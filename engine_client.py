@@ -0,0 +1,123 @@
+from multiprocessing.connection import Client
+import os
+import secrets
+import stat
+import sys
+import tempfile
+
+# --- Klien mesin deteksi (dipakai worker Flask) ---
+# Dengan ANPR_ENGINE=remote, worker web tidak memegang kamera, model maupun OCR. Semua itu
+# dimiliki satu proses anpr_engine.py; worker hanya menarik frame JPEG beranotasi dan event
+# deteksi lewat kanal IPC lokal (Unix socket di Linux/macOS, named pipe di Windows).
+# Socket dan kunci autentikasi disimpan di direktori runtime privat (0700, milik pengguna yang
+# menjalankan mesin). Kunci diambil dari ANPR_ENGINE_AUTHKEY; jika tidak diatur, mesin membuat
+# kunci acak di file 0600 di direktori tersebut dan worker membacanya dari sana.
+
+if sys.platform == "win32":
+    DEFAULT_RUNTIME_DIR = os.path.join(os.getenv('LOCALAPPDATA') or tempfile.gettempdir(), 'anpr')
+elif os.getenv('XDG_RUNTIME_DIR'):
+    DEFAULT_RUNTIME_DIR = os.path.join(os.environ['XDG_RUNTIME_DIR'], 'anpr')
+else:
+    DEFAULT_RUNTIME_DIR = os.path.join(tempfile.gettempdir(), f'anpr-{os.getuid()}')
+RUNTIME_DIR = os.getenv('ANPR_RUNTIME_DIR', DEFAULT_RUNTIME_DIR)
+DEFAULT_ENGINE_ADDRESS = r'\\.\pipe\anpr_engine' if sys.platform == "win32" else os.path.join(RUNTIME_DIR, 'engine.sock')
+ENGINE_ADDRESS = os.getenv('ANPR_ENGINE_ADDRESS', DEFAULT_ENGINE_ADDRESS)
+ENGINE_KEY_FILE = os.path.join(RUNTIME_DIR, 'engine.key')
+AUTHKEY_BYTES = 32
+
+# Kesalahan yang berarti proses mesin tidak berjalan atau koneksi terputus
+ENGINE_ERRORS = (OSError, EOFError)
+
+
+class EngineUnavailable(RuntimeError):
+    """Raised when the engine process can't be reached."""
+
+
+def ensure_runtime_dir():
+    """Creates RUNTIME_DIR with mode 0700, refusing one that another user could write to."""
+    os.makedirs(RUNTIME_DIR, mode=0o700, exist_ok=True)
+    if sys.platform == "win32":
+        return RUNTIME_DIR # Di bawah LOCALAPPDATA, sudah per pengguna
+    info = os.lstat(RUNTIME_DIR)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"Direktori runtime {RUNTIME_DIR} bukan direktori milik pengguna ini.")
+    if info.st_mode & 0o077:
+        os.chmod(RUNTIME_DIR, 0o700)
+    return RUNTIME_DIR
+
+
+def engine_authkey(create=False):
+    """
+    The IPC authentication key: ANPR_ENGINE_AUTHKEY if set, otherwise the key in ENGINE_KEY_FILE.
+    With create=True (the engine) a missing key file is generated with random bytes and mode 0600.
+    """
+    if os.getenv('ANPR_ENGINE_AUTHKEY'):
+        return os.environ['ANPR_ENGINE_AUTHKEY'].encode()
+    # Also checked by clients: a key (and socket) in a directory another user controls can't be trusted
+    ensure_runtime_dir()
+    if create:
+        try:
+            fd = os.open(ENGINE_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            os.chmod(ENGINE_KEY_FILE, 0o600) # Dibuat oleh proses mesin sebelumnya; dipakai ulang
+        else:
+            with os.fdopen(fd, 'w') as key_file:
+                key_file.write(secrets.token_hex(AUTHKEY_BYTES))
+    try:
+        with open(ENGINE_KEY_FILE, encoding='ascii') as key_file:
+            return key_file.read().strip().encode()
+    except FileNotFoundError:
+        raise EngineUnavailable(f"Kunci mesin deteksi {ENGINE_KEY_FILE} belum ada; jalankan anpr_engine.py "
+                                f"terlebih dahulu atau atur ANPR_ENGINE_AUTHKEY.") from None
+
+
+def _connect():
+    try:
+        return Client(ENGINE_ADDRESS, authkey=engine_authkey())
+    except ENGINE_ERRORS as e:
+        raise EngineUnavailable(f"Mesin deteksi tidak bisa dihubungi di {ENGINE_ADDRESS}: {e}") from e
+
+
+def request(cmd, **params):
+    """Sends one command to the engine and returns its result."""
+    conn = _connect()
+    try:
+        conn.send(dict(params, cmd=cmd))
+        status, result = conn.recv()
+    except ENGINE_ERRORS as e:
+        raise EngineUnavailable(f"Koneksi ke mesin deteksi terputus: {e}") from e
+    finally:
+        conn.close()
+    if status == 'error':
+        raise RuntimeError(result)
+    return result
+
+
+def stream_frames(camera_index):
+    """Yields annotated JPEG frames of a camera until the engine stops the stream."""
+    conn = _connect()
+    try:
+        conn.send({'cmd': 'subscribe', 'camera': camera_index})
+        while True:
+            jpeg = conn.recv_bytes()
+            if not jpeg: # Frame kosong = kamera tidak bisa dibuka atau stream dihentikan
+                return
+            yield jpeg
+    except ENGINE_ERRORS:
+        print(f"Stream Kamera {camera_index} dari mesin deteksi terputus.")
+    finally:
+        # Closing the connection is how the engine learns this viewer has left
+        conn.close()
+
+
+def stream_events():
+    """Yields detection events (dicts) published by the engine, plus {'type': 'ping'} keepalives."""
+    conn = _connect()
+    try:
+        conn.send({'cmd': 'events'})
+        while True:
+            yield conn.recv()
+    except ENGINE_ERRORS:
+        print("Stream event dari mesin deteksi terputus.")
+    finally:
+        conn.close()
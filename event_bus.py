@@ -0,0 +1,51 @@
+import queue
+import threading
+
+# --- Bus event deteksi ---
+# Detektor menerbitkan event (misalnya plat target cocok) ke semua pelanggan, masing-masing
+# dengan antrean terbatas. Pelanggan yang lambat kehilangan event terlama, bukan menahan
+# detektor.
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class EventBus:
+    """In-process publish/subscribe of detection events (plain dicts)."""
+
+    def __init__(self, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(event)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
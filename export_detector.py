@@ -0,0 +1,184 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import time
+
+# --- Ekspor dan perbandingan detektor untuk CPU ---
+# Contoh:
+#   python export_detector.py --format openvino --int8 --data plates.yaml
+#   python export_detector.py --format onnx --compare --data plates.yaml --images datasets/plates/val/images
+#
+# --data menunjuk file dataset YOLO (yaml) yang dipakai untuk kalibrasi int8 dan menghitung mAP.
+# Laporan perbandingan (latensi, memori, selisih mAP terhadap model .pt) ditulis sebagai
+# Markdown dan JSON.
+
+from detector_backend import DETECTOR_BACKENDS, TRAINED_WEIGHTS
+
+IMAGE_EXTENSIONS = ('*.jpg', '*.jpeg', '*.png', '*.bmp')
+
+
+def export_model(fmt, int8=False, data=None, imgsz=640, batch=1, dynamic=True):
+    """Exports the trained .pt model and moves the result to the path DETECTOR_BACKENDS expects."""
+    from ultralytics import YOLO
+
+    if int8 and fmt != 'openvino':
+        raise SystemExit("Kuantisasi int8 hanya didukung untuk format openvino.")
+    if int8 and not data:
+        raise SystemExit("Kuantisasi int8 butuh --data (dataset gambar plat untuk kalibrasi).")
+    model = YOLO(TRAINED_WEIGHTS)
+    print(f"Mengekspor {TRAINED_WEIGHTS} ke {fmt}{' int8' if int8 else ''} (imgsz={imgsz}, dynamic={dynamic})...")
+    exported = model.export(format=fmt, int8=int8, data=data, imgsz=imgsz, batch=batch, dynamic=dynamic)
+
+    backend = f"{fmt}-int8" if int8 else fmt
+    target = DETECTOR_BACKENDS[backend]
+    if os.path.abspath(str(exported)) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        shutil.move(str(exported), target)
+    print(f"Model {backend} disimpan di {target}. Aktifkan dengan DETECTOR_BACKEND={backend}.")
+    return backend
+
+
+def _load_images(images_dir, limit):
+    import cv2
+
+    paths = []
+    for pattern in IMAGE_EXTENSIONS:
+        paths.extend(glob.glob(os.path.join(images_dir, pattern)))
+    paths = sorted(paths)[:limit]
+    if not paths:
+        raise SystemExit(f"Tidak ada gambar di {images_dir}.")
+    return [cv2.imread(path) for path in paths]
+
+
+def _rss_mb():
+    import psutil
+
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def _benchmark_backend(backend, data, images_dir, num_images, batch_sizes, imgsz, result_queue):
+    """Runs in a fresh process so memory numbers of one backend don't leak into the next."""
+    try:
+        rss_before = _rss_mb()
+        from detector_backend import load_detector
+
+        model = load_detector(backend)
+        rss_loaded = _rss_mb()
+        images = _load_images(images_dir, num_images)
+        model(images[:1], verbose=False, imgsz=imgsz) # Pemanasan
+
+        latency = {}
+        for batch_size in batch_sizes:
+            timings = []
+            for start in range(0, len(images) - batch_size + 1, batch_size):
+                batch = images[start:start + batch_size]
+                t0 = time.perf_counter()
+                model(batch, verbose=False, imgsz=imgsz)
+                timings.append((time.perf_counter() - t0) * 1000 / batch_size)
+            if timings:
+                timings.sort()
+                latency[batch_size] = {
+                    'mean_ms_per_frame': round(statistics.mean(timings), 2),
+                    'p95_ms_per_frame': round(timings[int(0.95 * (len(timings) - 1))], 2),
+                }
+        rss_peak = _rss_mb()
+
+        metrics = {}
+        if data:
+            val = model.val(data=data, imgsz=imgsz, batch=1, verbose=False, plots=False)
+            metrics = {'map50': round(float(val.box.map50), 4), 'map50_95': round(float(val.box.map), 4)}
+
+        result_queue.put({
+            'backend': backend,
+            'load_mb': round(rss_loaded - rss_before, 1),
+            'peak_rss_mb': round(rss_peak, 1),
+            'latency': latency,
+            'metrics': metrics,
+        })
+    except BaseException as e:
+        result_queue.put({'backend': backend, 'error': f"{type(e).__name__}: {e}"})
+
+
+def compare_backends(backends, data, images_dir, num_images=100, batch_sizes=(1, 4), imgsz=640):
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for backend in backends:
+        print(f"Mengukur backend {backend}...")
+        result_queue = ctx.Queue()
+        process = ctx.Process(target=_benchmark_backend,
+                              args=(backend, data, images_dir, num_images, batch_sizes, imgsz, result_queue))
+        process.start()
+        results.append(result_queue.get())
+        process.join()
+    return results
+
+
+def write_report(results, report_path):
+    baseline = next((r for r in results if r['backend'] == 'pytorch' and 'error' not in r), None)
+    lines = [
+        "# Perbandingan backend detektor plat",
+        "",
+        "| Backend | Latensi b=1 (ms/frame) | p95 b=1 | Latensi batch (ms/frame) | Memori model (MB) | RSS puncak (MB) | mAP50 | mAP50-95 | Drift mAP50-95 |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    for result in results:
+        if 'error' in result:
+            lines.append(f"| {result['backend']} | error: {result['error']} |||||||")
+            continue
+        latency = result['latency']
+        single = latency.get(1, {})
+        batched = [f"b={size}: {value['mean_ms_per_frame']}" for size, value in latency.items() if size != 1]
+        metrics = result['metrics']
+        drift = ""
+        if baseline and metrics and baseline['metrics']:
+            drift = f"{metrics['map50_95'] - baseline['metrics']['map50_95']:+.4f}"
+        lines.append(
+            f"| {result['backend']} | {single.get('mean_ms_per_frame', '')} | {single.get('p95_ms_per_frame', '')} | "
+            f"{', '.join(batched)} | {result['load_mb']} | {result['peak_rss_mb']} | "
+            f"{metrics.get('map50', '')} | {metrics.get('map50_95', '')} | {drift} |"
+        )
+
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    with open(os.path.splitext(report_path)[0] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print("\n".join(lines))
+    print(f"Laporan disimpan di {report_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ekspor detektor plat ke ONNX/OpenVINO dan bandingkan dengan model .pt.")
+    parser.add_argument('--format', choices=['onnx', 'openvino'], help="Format ekspor. Kosongkan untuk hanya membandingkan.")
+    parser.add_argument('--int8', action='store_true', help="Kuantisasi int8 (openvino) dengan kalibrasi dari --data.")
+    parser.add_argument('--data', help="File dataset YOLO (yaml) untuk kalibrasi int8 dan mAP.")
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--static', action='store_true', help="Ekspor dengan ukuran batch tetap (default: dinamis agar bisa di-batch).")
+    parser.add_argument('--compare', action='store_true', help="Bandingkan latensi, memori dan mAP semua backend yang tersedia.")
+    parser.add_argument('--images', help="Folder gambar untuk mengukur latensi.")
+    parser.add_argument('--num-images', type=int, default=100)
+    parser.add_argument('--batch-sizes', default='1,4', help="Ukuran batch yang diukur, dipisah koma.")
+    parser.add_argument('--report', default='runs/detect/detector_report.md')
+    args = parser.parse_args()
+
+    if args.format:
+        export_model(args.format, int8=args.int8, data=args.data, imgsz=args.imgsz, dynamic=not args.static)
+
+    if args.compare:
+        if not args.images:
+            raise SystemExit("--compare butuh --images (folder gambar plat).")
+        backends = [name for name, path in DETECTOR_BACKENDS.items() if os.path.exists(path)]
+        batch_sizes = [int(size) for size in args.batch_sizes.split(',') if size.strip()]
+        results = compare_backends(backends, args.data, args.images, args.num_images, batch_sizes, args.imgsz)
+        write_report(results, args.report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import sys
+import threading
+import time
+
+import cv2
+
+# --- Capture thread dengan slot "frame terbaru" ---
+# Kamera dibaca terus-menerus oleh thread terpisah. Setiap frame baru menimpa
+# slot tunggal, sehingga tahap pemrosesan (YOLO, OCR, encode) selalu mengambil
+# frame paling baru dan frame yang sudah basi dibuang, bukan diantrekan.
+
+REOPEN_DELAY_SECONDS = 0.5
+MAX_REOPEN_ATTEMPTS = 5
+
+
+def camera_backends():
+    """Returns the list of OpenCV capture backends to try, in order of preference."""
+    backends = [cv2.CAP_DSHOW] if sys.platform == "win32" else [] # DirectShow for Windows
+    backends.append(cv2.CAP_ANY)
+    return backends
+
+
+def open_camera(camera_index):
+    """Opens a camera with the first backend that works. Returns None if all backends fail."""
+    for backend in camera_backends():
+        cap = None
+        try:
+            cap = cv2.VideoCapture(camera_index + backend)
+            if cap.isOpened():
+                return cap
+            cap.release()
+        except Exception as e:
+            print(f"Error saat mencoba membuka Kamera {camera_index} dengan backend {backend}: {e}")
+            if cap is not None:
+                cap.release()
+    return None
+
+
+class LatestFrameCapture:
+    """
+    Reads a camera on a background thread and keeps only the newest frame.
+
+    read() hands the consumer the most recent frame it has not seen yet. Frames
+    that were overwritten before anyone read them are counted in `frames_dropped`,
+    so latency stays bounded by one processing step instead of growing with the
+    camera buffer.
+    """
+
+    def __init__(self, camera_index):
+        self.camera_index = camera_index
+        self.cap = None
+        self.stop_event = threading.Event()
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_time = 0.0
+        self._seq = 0 # Nomor urut frame terakhir yang ditulis ke slot
+        self._last_read_seq = 0 # Nomor urut frame terakhir yang diambil konsumen
+        self._thread = None
+        self.frames_captured = 0
+        self.frames_dropped = 0
+
+    def start(self):
+        """Opens the camera and starts the capture thread. Returns False if the camera can't be opened."""
+        self.cap = open_camera(self.camera_index)
+        if self.cap is None:
+            self.stop_event.set()
+            return False
+        self._thread = threading.Thread(target=self._capture_loop, name=f"capture-{self.camera_index}", daemon=True)
+        self._thread.start()
+        return True
+
+    def _capture_loop(self):
+        reopen_attempts = 0
+        while not self.stop_event.is_set():
+            success, frame = self.cap.read()
+            if not success:
+                if self.stop_event.is_set():
+                    break
+                # Kamera bisa terputus; coba buka kembali beberapa kali sebelum menyerah
+                print(f"Peringatan: Gagal membaca frame dari Kamera {self.camera_index}. Mencoba membuka kembali...")
+                self.cap.release()
+                self.cap = open_camera(self.camera_index)
+                reopen_attempts += 1
+                if self.cap is None or reopen_attempts > MAX_REOPEN_ATTEMPTS:
+                    print(f"Error: Gagal membuka kembali Kamera {self.camera_index}. Menghentikan stream.")
+                    self.stop_event.set()
+                    break
+                time.sleep(REOPEN_DELAY_SECONDS)
+                continue
+
+            reopen_attempts = 0
+            with self._cond:
+                if self._seq > self._last_read_seq:
+                    # Frame sebelumnya belum sempat diproses dan sekarang ditimpa
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._frame_time = time.monotonic()
+                self._seq += 1
+                self.frames_captured += 1
+                self._cond.notify_all()
+
+        with self._cond:
+            self._cond.notify_all() # Bangunkan konsumen yang sedang menunggu agar bisa keluar
+        if self.cap is not None:
+            self.cap.release()
+
+    def read(self, timeout=1.0):
+        """
+        Waits for a frame newer than the last one returned.
+
+        Returns (frame, age_seconds), or (None, None) on timeout or when the capture stopped.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._seq == self._last_read_seq:
+                if self.stop_event.is_set():
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None, None
+                self._cond.wait(remaining)
+            self._last_read_seq = self._seq
+            return self._frame, time.monotonic() - self._frame_time
+
+    def is_running(self):
+        return not self.stop_event.is_set()
+
+    def stop(self, join_timeout=2.0):
+        """Signals the capture thread to stop and waits for it to release the camera."""
+        self.stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(join_timeout)
+
+    def stats(self):
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_dropped': self.frames_dropped,
+        }
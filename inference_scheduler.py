@@ -0,0 +1,135 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# --- Penjadwal inferensi YOLO lintas kamera ---
+# Setiap kamera mengirim frame ke satu penjadwal pusat. Penjadwal mengumpulkan frame
+# menjadi batch (dibatasi ukuran batch atau batas waktu tunggu), menjalankan satu
+# pemanggilan model untuk seluruh batch, lalu mengembalikan kotak deteksi ke tiap kamera.
+
+DEFAULT_MAX_BATCH_SIZE = 4
+DEFAULT_MAX_WAIT_MS = 10
+ACTIVE_SOURCE_SECONDS = 2.0 # Sumber (kamera) dianggap aktif jika mengirim frame dalam rentang ini
+
+
+class BatchInferenceScheduler:
+    """
+    Collects frames from many cameras and runs them through the model in batches.
+
+    A batch is dispatched when it reaches `max_batch_size`, when every camera that is
+    currently active has a frame waiting, or when the oldest frame has waited
+    `max_wait_ms`. Frames that ask for different inference sizes (imgsz) run as separate
+    model calls within the batch. Each caller gets back only its own boxes as an (N, 6)
+    array of [x1, y1, x2, y2, conf, cls].
+    """
+
+    def __init__(self, model, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS, predict_kwargs=None):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.predict_kwargs = dict(predict_kwargs or {})
+        self.predict_kwargs.setdefault('verbose', False)
+        self._queue = queue.Queue()
+        self._source_last_seen = {}
+        self._sources_lock = threading.Lock()
+        self._stats = {} # {batch_size: {'batches': n, 'frames': n, 'seconds': total}}
+        self._stats_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, source=None, imgsz=None):
+        """Queues a frame for detection and returns a Future resolving to its boxes array."""
+        future = Future()
+        with self._sources_lock:
+            self._source_last_seen[source] = time.monotonic()
+        self._queue.put((frame, imgsz, future))
+        return future
+
+    def detect(self, frame, source=None, imgsz=None, timeout=None):
+        """Blocking helper: submits a frame and waits for its boxes."""
+        return self.submit(frame, source, imgsz).result(timeout)
+
+    def _active_sources(self):
+        now = time.monotonic()
+        with self._sources_lock:
+            for source, last_seen in list(self._source_last_seen.items()):
+                if now - last_seen > ACTIVE_SOURCE_SECONDS:
+                    del self._source_last_seen[source]
+            return len(self._source_last_seen)
+
+    def _collect_batch(self):
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        # No point waiting for more frames than there are cameras submitting
+        target_size = min(self.max_batch_size, max(1, self._active_sources()))
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < target_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            # One model call per inference size present in the batch
+            groups = {}
+            for frame, imgsz, future in batch:
+                groups.setdefault(imgsz, []).append((frame, future))
+            for imgsz, group in groups.items():
+                self._run_group(imgsz, group)
+
+    def _run_group(self, imgsz, group):
+        frames = [frame for frame, _ in group]
+        predict_kwargs = dict(self.predict_kwargs)
+        if imgsz is not None:
+            predict_kwargs['imgsz'] = imgsz
+        start = time.perf_counter()
+        try:
+            results = self.model(frames, **predict_kwargs)
+        except Exception as e:
+            for _, future in group:
+                future.set_exception(e)
+            return
+        self._record(len(group), time.perf_counter() - start)
+        for (_, future), result in zip(group, results):
+            future.set_result(result.boxes.data.cpu().numpy() if result.boxes is not None else np.empty((0, 6)))
+
+    def _record(self, batch_size, seconds):
+        with self._stats_lock:
+            entry = self._stats.setdefault(batch_size, {'batches': 0, 'frames': 0, 'seconds': 0.0})
+            entry['batches'] += 1
+            entry['frames'] += batch_size
+            entry['seconds'] += seconds
+
+    def stats(self):
+        """Returns throughput per batch size: batches run, frames, mean batch latency and frames/sec."""
+        with self._stats_lock:
+            report = {}
+            for batch_size, entry in sorted(self._stats.items()):
+                seconds = entry['seconds']
+                report[batch_size] = {
+                    'batches': entry['batches'],
+                    'frames': entry['frames'],
+                    'avg_batch_ms': round(seconds / entry['batches'] * 1000, 2),
+                    'frames_per_second': round(entry['frames'] / seconds, 2) if seconds > 0 else None,
+                }
+            return report
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join(timeout=2.0)
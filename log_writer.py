@@ -0,0 +1,178 @@
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from db import connect_wal
+
+# --- Penulis log deteksi berbatch ---
+# Semua log deteksi masuk ke antrean dan ditulis oleh satu thread dengan koneksi SQLite yang
+# tetap terbuka (mode WAL), memakai executemany setiap LOG_BATCH_SIZE baris atau setiap
+# LOG_FLUSH_SECONDS detik. Dengan WAL, halaman log yang sedang membaca database tidak menahan
+# penulisan; jika database terkunci, batch dicoba lagi hingga MAX_WRITE_ATTEMPTS kali.
+# Callback on_written menerima baris yang sudah tersimpan (lengkap dengan id), misalnya untuk
+# mendorong log baru ke dashboard secara langsung.
+
+LOG_BATCH_SIZE = 100
+LOG_FLUSH_SECONDS = 1.0
+MAX_RETRY_DELAY_SECONDS = 5.0
+MAX_WRITE_ATTEMPTS = 5 # Setelah ini batch dibuang (misalnya tabel belum dibuat), agar antrean tidak tumbuh terus
+
+INSERT_LOG_SQL = "INSERT INTO detection_logs (timestamp, plat_nomor, is_target, screenshot_path) VALUES (?, ?, ?, ?)"
+
+
+class DetectionLogWriter:
+    """
+    Buffers detection log rows and writes them in batches from one background thread.
+
+    log() never touches the database, so it is safe to call from frame loops. Rows are
+    flushed when `batch_size` are pending or `flush_interval` seconds have passed, and on
+    flush()/close() (close() is also registered with atexit).
+
+    `on_written(rows)` is called from the writer thread after each committed batch with a
+    list of dicts {'id', 'timestamp', 'plat_nomor', 'is_target', 'screenshot_path'}.
+    """
+
+    def __init__(self, db_path, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_SECONDS, on_written=None,
+                 max_attempts=MAX_WRITE_ATTEMPTS):
+        self.db_path = db_path
+        self.max_attempts = max(1, int(max_attempts))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.on_written = on_written
+        self._queue = queue.Queue()
+        self._closed = False
+        self.rows_written = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        self.rows_dropped = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, plat_nomor, is_target, screenshot_path=None, timestamp=None):
+        """Queues one detection log row."""
+        timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._queue.put((timestamp, plat_nomor, is_target, screenshot_path))
+
+    def flush(self, timeout=10.0):
+        """Blocks until every row queued before this call has been written. Returns False on timeout."""
+        done = threading.Event()
+        self._queue.put(done) # Queued behind the caller's rows, so it is reached after them
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """Flushes the remaining rows and stops the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(StopIteration)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"Peringatan: log deteksi belum selesai ditulis ke {self.db_path} saat ditutup.")
+
+    def _run(self):
+        conn = None
+        pending = []
+        waiters = [] # flush() callers to wake once everything before them is written
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None # Flush interval elapsed
+            # Take whatever else is already queued without waiting
+            while True:
+                if item is StopIteration:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                elif item is not None:
+                    pending.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                if stopping or len(pending) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            due = stopping or waiters or len(pending) >= self.batch_size or \
+                (deadline is not None and time.monotonic() >= deadline)
+            if due and pending:
+                conn = self._write(conn, pending)
+            if not pending:
+                deadline = None
+                for done in waiters:
+                    done.set()
+                waiters = []
+        for done in waiters:
+            done.set()
+        if conn is not None:
+            conn.close()
+
+    def _write(self, conn, pending):
+        """
+        Writes the pending rows in one transaction. A failed batch is retried with backoff and
+        dropped after max_attempts, so an error that doesn't clear can't stall the writer.
+        """
+        delay = 0.1
+        attempts = 0
+        while pending:
+            try:
+                if conn is None:
+                    conn = connect_wal(self.db_path)
+                with conn:
+                    conn.executemany(INSERT_LOG_SQL, pending)
+                    # The write lock is held for the whole transaction, so the batch got consecutive ids
+                    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                self.rows_written += len(pending)
+                self.batches_written += 1
+                written = pending[:]
+                pending.clear()
+            except sqlite3.Error as e:
+                self.write_errors += 1
+                attempts += 1
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                if attempts >= self.max_attempts:
+                    print(f"Error saat menyimpan {len(pending)} log ke {self.db_path} setelah {attempts} percobaan, "
+                          f"log dibuang: {e}")
+                    self.rows_dropped += len(pending)
+                    pending.clear()
+                    break
+                print(f"Error saat menyimpan {len(pending)} log ke database, dicoba lagi: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY_SECONDS)
+                continue
+            self._notify_written(written, last_id)
+        return conn
+
+    def _notify_written(self, written, last_id):
+        if self.on_written is None:
+            return
+        first_id = last_id - len(written) + 1
+        rows = [
+            {'id': first_id + i, 'timestamp': timestamp, 'plat_nomor': plat_nomor,
+             'is_target': bool(is_target), 'screenshot_path': screenshot_path}
+            for i, (timestamp, plat_nomor, is_target, screenshot_path) in enumerate(written)
+        ]
+        try:
+            self.on_written(rows)
+        except Exception as e:
+            print(f"Error pada callback log tersimpan: {e}")
+
+    def stats(self):
+        return {
+            'rows_written': self.rows_written,
+            'batches_written': self.batches_written,
+            'rows_queued': self._queue.qsize(),
+            'write_errors': self.write_errors,
+            'rows_dropped': self.rows_dropped,
+        }
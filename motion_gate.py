@@ -0,0 +1,82 @@
+import time
+
+import cv2
+
+# --- Gerbang gerakan sebelum deteksi YOLO ---
+# Frame diperkecil dan dibandingkan dengan latar belakang rata-rata berjalan. YOLO hanya
+# dijalankan jika ada perubahan cukup besar, ditambah deteksi "keepalive" berkala agar
+# kendaraan yang berhenti tetap terdeteksi ulang sesekali.
+
+DEFAULT_MOTION_SETTINGS = {
+    'enabled': True,
+    'downscale_width': 160, # Lebar frame kecil untuk perbandingan
+    'pixel_threshold': 25, # Selisih intensitas minimum agar satu piksel dianggap berubah
+    'min_changed_ratio': 0.01, # Porsi piksel berubah minimum agar dianggap ada gerakan
+    'background_alpha': 0.05, # Laju adaptasi latar belakang (makin kecil makin lambat)
+    'hold_seconds': 1.0, # Tetap deteksi selama ini setelah gerakan terakhir
+    'keepalive_seconds': 5.0, # Deteksi paksa setiap N detik walau tidak ada gerakan
+}
+
+
+class MotionGate:
+    """
+    Decides per frame whether the detector needs to run.
+
+    should_detect() returns True on motion, during the hold period after motion,
+    and once every `keepalive_seconds`; otherwise the frame is gated out.
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_MOTION_SETTINGS)
+        self.settings.update(settings)
+        self._background = None
+        self._last_motion_time = 0.0
+        self._last_detect_time = 0.0
+        self.frames_checked = 0
+        self.frames_gated = 0
+        self.motion_frames = 0
+        self.keepalive_runs = 0
+
+    def _motion_ratio(self, frame):
+        height, width = frame.shape[:2]
+        small_width = min(self.settings['downscale_width'], width)
+        small_height = max(1, int(height * small_width / float(width)))
+        small = cv2.resize(frame, (small_width, small_height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype('float32')
+            return 1.0 # First frame: nothing to compare with, treat as motion
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(gray, self._background, self.settings['background_alpha'])
+        _, mask = cv2.threshold(diff, self.settings['pixel_threshold'], 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / float(mask.size)
+
+    def should_detect(self, frame, now=None):
+        """`now` defaults to the wall clock; pass the video time when frames come faster than real time."""
+        self.frames_checked += 1
+        if not self.settings['enabled']:
+            return True
+
+        now = time.monotonic() if now is None else now
+        if self._motion_ratio(frame) >= self.settings['min_changed_ratio']:
+            self.motion_frames += 1
+            self._last_motion_time = now
+        elif now - self._last_motion_time > self.settings['hold_seconds']:
+            if now - self._last_detect_time < self.settings['keepalive_seconds']:
+                self.frames_gated += 1
+                return False
+            self.keepalive_runs += 1
+
+        self._last_detect_time = now
+        return True
+
+    def stats(self):
+        return {
+            'motion_frames_checked': self.frames_checked,
+            'motion_frames_gated': self.frames_gated,
+            'motion_frames': self.motion_frames,
+            'motion_keepalive_runs': self.keepalive_runs,
+        }
@@ -0,0 +1,185 @@
+import ctypes
+import ctypes.util
+import os
+import queue
+import sys
+import threading
+
+import numpy as np
+import pytesseract
+
+# --- Backend OCR yang bisa diganti ---
+# 'pytesseract' : perilaku lama, satu proses tesseract + file gambar sementara per panggilan.
+# 'capi'        : engine Tesseract tetap hidup di dalam proses (lewat C API libtesseract via
+#                 ctypes), dengan pool handle agar beberapa kamera bisa OCR bersamaan.
+#                 Array numpy dikirim langsung tanpa file sementara.
+# 'auto'        : coba 'capi', kembali ke 'pytesseract' jika libtesseract tidak ditemukan.
+
+PLATE_CHAR_WHITELIST = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+DEFAULT_OEM = 3 # Neural network (LSTM) + legacy, sama dengan --oem 3
+DEFAULT_LANG = 'eng'
+OCR_BACKENDS = ('auto', 'capi', 'pytesseract')
+
+
+class OcrBackend:
+    """
+    Common interface of OCR backends.
+
+    image_to_string(image, psm, whitelist) returns the raw recognized text for a
+    numpy image (grayscale or 3-channel), like pytesseract.image_to_string with
+    '--oem 3 --psm <psm> -c tessedit_char_whitelist=<whitelist>'.
+    """
+
+    name = None
+
+    def image_to_string(self, image, psm=8, whitelist=PLATE_CHAR_WHITELIST):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PytesseractBackend(OcrBackend):
+    """Runs the tesseract executable once per call through pytesseract."""
+
+    name = 'pytesseract'
+
+    def __init__(self, oem=DEFAULT_OEM, lang=DEFAULT_LANG):
+        self.oem = oem
+        self.lang = lang
+
+    def image_to_string(self, image, psm=8, whitelist=PLATE_CHAR_WHITELIST):
+        config = f'--oem {self.oem} --psm {psm}'
+        if whitelist:
+            config += f' -c tessedit_char_whitelist={whitelist}'
+        return pytesseract.image_to_string(image, lang=self.lang, config=config)
+
+
+def _find_libtesseract():
+    """Locates libtesseract: TESSERACT_LIB, next to the tesseract executable, then the system path."""
+    explicit = os.getenv('TESSERACT_LIB')
+    if explicit:
+        return explicit
+    tesseract_cmd = pytesseract.pytesseract.tesseract_cmd
+    if sys.platform == "win32" and os.path.isabs(tesseract_cmd):
+        # Installer Windows (UB Mannheim) menaruh DLL di folder yang sama dengan tesseract.exe
+        folder = os.path.dirname(tesseract_cmd)
+        for name in sorted(os.listdir(folder), reverse=True) if os.path.isdir(folder) else []:
+            if name.startswith('libtesseract') and name.endswith('.dll'):
+                return os.path.join(folder, name)
+    for name in ('tesseract', 'libtesseract', 'tesseract-5', 'libtesseract-5'):
+        path = ctypes.util.find_library(name)
+        if path:
+            return path
+    if sys.platform.startswith('linux'):
+        return 'libtesseract.so.5'
+    return None
+
+
+def _load_capi(lib_path):
+    lib = ctypes.CDLL(lib_path)
+    handle = ctypes.c_void_p
+    lib.TessBaseAPICreate.restype = handle
+    lib.TessBaseAPICreate.argtypes = []
+    lib.TessBaseAPIInit2.restype = ctypes.c_int
+    lib.TessBaseAPIInit2.argtypes = [handle, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+    lib.TessBaseAPISetPageSegMode.restype = None
+    lib.TessBaseAPISetPageSegMode.argtypes = [handle, ctypes.c_int]
+    lib.TessBaseAPISetVariable.restype = ctypes.c_int
+    lib.TessBaseAPISetVariable.argtypes = [handle, ctypes.c_char_p, ctypes.c_char_p]
+    lib.TessBaseAPISetImage.restype = None
+    lib.TessBaseAPISetImage.argtypes = [handle, ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int]
+    lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p # Pointer mentah agar bisa dibebaskan dengan TessDeleteText
+    lib.TessBaseAPIGetUTF8Text.argtypes = [handle]
+    lib.TessDeleteText.restype = None
+    lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+    lib.TessBaseAPIClear.restype = None
+    lib.TessBaseAPIClear.argtypes = [handle]
+    lib.TessBaseAPIEnd.restype = None
+    lib.TessBaseAPIEnd.argtypes = [handle]
+    lib.TessBaseAPIDelete.restype = None
+    lib.TessBaseAPIDelete.argtypes = [handle]
+    return lib
+
+
+class TesseractCApiBackend(OcrBackend):
+    """
+    Keeps `pool_size` initialized Tesseract engines resident and hands them out per call.
+
+    traineddata is loaded once per engine at startup instead of once per call, and images
+    are passed to Tesseract as raw numpy buffers. Pixels are passed in the same channel
+    order pytesseract uses (it saves the array as-is), so results match the CLI path.
+    """
+
+    name = 'capi'
+
+    def __init__(self, pool_size=2, oem=DEFAULT_OEM, lang=DEFAULT_LANG, tessdata_dir=None, lib_path=None):
+        lib_path = lib_path or _find_libtesseract()
+        if not lib_path:
+            raise OSError("libtesseract tidak ditemukan. Atur variabel lingkungan 'TESSERACT_LIB'.")
+        self._lib = _load_capi(lib_path)
+        tessdata_dir = tessdata_dir or os.getenv('TESSDATA_PREFIX')
+        self._datapath = tessdata_dir.encode() if tessdata_dir else None
+        self._lang = lang.encode()
+        self._oem = oem
+        self._pool = queue.Queue()
+        self._handles = []
+        self._lock = threading.Lock()
+        for _ in range(max(1, pool_size)):
+            self._pool.put(self._create_handle())
+
+    def _create_handle(self):
+        handle = self._lib.TessBaseAPICreate()
+        if self._lib.TessBaseAPIInit2(handle, self._datapath, self._lang, self._oem) != 0:
+            self._lib.TessBaseAPIDelete(handle)
+            raise RuntimeError("Gagal menginisialisasi engine Tesseract (periksa TESSDATA_PREFIX dan bahasa).")
+        with self._lock:
+            self._handles.append(handle)
+        return handle
+
+    def image_to_string(self, image, psm=8, whitelist=PLATE_CHAR_WHITELIST):
+        if image is None or image.size == 0:
+            return ""
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+
+        handle = self._pool.get()
+        try:
+            self._lib.TessBaseAPISetPageSegMode(handle, psm)
+            # Variabel bertahan di handle, jadi selalu diatur ulang (string kosong = tanpa whitelist)
+            self._lib.TessBaseAPISetVariable(handle, b'tessedit_char_whitelist', (whitelist or '').encode())
+            self._lib.TessBaseAPISetImage(handle, image.ctypes.data, width, height, bytes_per_pixel, image.strides[0])
+            text_ptr = self._lib.TessBaseAPIGetUTF8Text(handle)
+            if not text_ptr:
+                return ""
+            try:
+                return ctypes.string_at(text_ptr).decode('utf-8', errors='replace')
+            finally:
+                self._lib.TessDeleteText(text_ptr)
+        finally:
+            self._lib.TessBaseAPIClear(handle)
+            self._pool.put(handle)
+
+    def close(self):
+        with self._lock:
+            handles, self._handles = self._handles, []
+        for handle in handles:
+            self._lib.TessBaseAPIEnd(handle)
+            self._lib.TessBaseAPIDelete(handle)
+
+
+def create_ocr_backend(name='auto', pool_size=2):
+    """Builds the configured OCR backend. 'auto' prefers the resident C API engine."""
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"Backend OCR tidak dikenal: {name} (pilih dari {OCR_BACKENDS})")
+    if name in ('auto', 'capi'):
+        try:
+            backend = TesseractCApiBackend(pool_size=pool_size)
+            print(f"Menggunakan backend OCR C API Tesseract dengan {pool_size} engine.")
+            return backend
+        except (OSError, RuntimeError, AttributeError) as e:
+            if name == 'capi':
+                raise
+            print(f"Backend OCR C API tidak tersedia ({e}). Menggunakan pytesseract.")
+    return PytesseractBackend()
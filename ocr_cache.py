@@ -0,0 +1,126 @@
+from collections import OrderedDict
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# --- Cache hasil OCR berbasis perceptual hash ---
+# Kendaraan yang parkir atau bergerak pelan menghasilkan potongan plat yang hampir sama
+# di banyak frame. Potongan dinormalisasi lalu di-hash (dHash); jika sudah ada entri
+# dengan jarak Hamming di bawah ambang batas, teks OCR sebelumnya dipakai lagi tanpa
+# memanggil Tesseract.
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 30.0
+DEFAULT_MAX_DISTANCE = 6 # Jarak Hamming maksimum (dari 64 bit) agar dianggap potongan yang sama
+DEFAULT_HASH_SIZE = 8
+EVICTION_POLICIES = ('lru', 'fifo')
+
+
+def crop_dhash(crop, hash_size=DEFAULT_HASH_SIZE):
+    """Difference hash of a plate crop as an int of hash_size * hash_size bits."""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    # Ukuran tetap + perbandingan piksel bertetangga membuat hash tahan terhadap skala dan kecerahan
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class OcrResultCache:
+    """
+    Thread-safe LRU/FIFO cache of OCR text keyed by perceptual hash, with optional TTL.
+
+    Memory is bounded by `max_entries`. With policy 'lru' a hit refreshes the entry's
+    position; with 'fifo' entries leave in insertion order. Entries older than
+    `ttl_seconds` are never returned (None disables the TTL).
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_distance=DEFAULT_MAX_DISTANCE, hash_size=DEFAULT_HASH_SIZE, policy='lru'):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Kebijakan eviction tidak dikenal: {policy} (pilih dari {EVICTION_POLICIES})")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.policy = policy
+        self._entries = OrderedDict() # {hash: (text, stored_at)}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def get(self, crop_hash):
+        """Returns the cached text for a hash within max_distance, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(crop_hash)
+            if entry is not None and not self._expired(entry[1], now):
+                self.exact_hits += 1
+                if self.policy == 'lru':
+                    self._entries.move_to_end(crop_hash)
+                return entry[0]
+
+            best_hash, best_distance = None, self.max_distance + 1
+            for stored_hash, (text, stored_at) in self._entries.items():
+                distance = (stored_hash ^ crop_hash).bit_count()
+                if distance < best_distance and not self._expired(stored_at, now):
+                    best_hash, best_distance = stored_hash, distance
+            if best_hash is None:
+                self.misses += 1
+                return None
+            self.near_hits += 1
+            if self.policy == 'lru':
+                self._entries.move_to_end(best_hash)
+            return self._entries[best_hash][0]
+
+    def put(self, crop_hash, text):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[crop_hash] = (text, now)
+            self._entries.move_to_end(crop_hash)
+            # Buang entri kedaluwarsa di ujung terlama dulu, baru batasi jumlah entri
+            if self.ttl_seconds is not None:
+                for stored_hash, (_, stored_at) in list(self._entries.items()):
+                    if not self._expired(stored_at, now):
+                        break
+                    del self._entries[stored_hash]
+                    self.expirations += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, crop, compute):
+        """Returns cached text for a near-identical crop, otherwise calls compute(crop) and stores it."""
+        if crop is None or crop.size == 0:
+            return compute(crop)
+        crop_hash = crop_dhash(crop, self.hash_size)
+        text = self.get(crop_hash)
+        if text is None:
+            text = compute(crop)
+            self.put(crop_hash, text)
+        return text
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'exact_hits': self.exact_hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.exact_hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -0,0 +1,154 @@
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import multiprocessing
+import threading
+
+import pytesseract
+
+from ocr_backend import PLATE_CHAR_WHITELIST, create_ocr_backend
+
+# --- Pool worker OCR asinkron ---
+# Potongan plat dikirim ke sekumpulan proses OCR sehingga Tesseract yang lambat tidak
+# menahan loop frame. Setiap kamera punya antrean terbatas; jika penuh, potongan paling
+# lama dibuang (backpressure). Hasil dikirim balik lewat callback saat sudah tersedia.
+
+DEFAULT_MAX_PENDING_PER_CAMERA = 2
+
+_worker_backend = None # Backend OCR milik proses worker, dibuat sekali oleh _init_worker
+
+
+def _init_worker(backend_name, tesseract_cmd):
+    global _worker_backend
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    # Satu engine per proses; paralelisme datang dari jumlah proses
+    _worker_backend = create_ocr_backend(backend_name, pool_size=1)
+
+
+def _run_ocr(crop, psm, whitelist):
+    try:
+        text = _worker_backend.image_to_string(crop, psm=psm, whitelist=whitelist)
+    except Exception as e:
+        # Beberapa exception pytesseract tidak bisa di-pickle dan akan merusak pool; kirim sebagai teks
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+    return text.strip() if text else ""
+
+
+class AsyncOcrPool:
+    """
+    Runs OCR on a pool of worker processes, off the frame loop.
+
+    submit(camera, crop, callback) never blocks: the crop waits in that camera's bounded
+    queue and callback(text) is called from a pool thread once OCR finishes. If the
+    crop is pushed out by newer ones (or OCR fails), callback(None) is called instead.
+    """
+
+    def __init__(self, num_workers, max_pending_per_camera=DEFAULT_MAX_PENDING_PER_CAMERA,
+                 backend_name='auto', psm=8, whitelist=PLATE_CHAR_WHITELIST):
+        self.num_workers = max(1, num_workers)
+        self.max_pending_per_camera = max(1, max_pending_per_camera)
+        self.psm = psm
+        self.whitelist = whitelist
+        # Spawned, not forked: the server process already runs capture, scheduler and writer threads,
+        # and a forked worker could inherit one of their locks held; _init_worker builds its own state
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(backend_name, pytesseract.pytesseract.tesseract_cmd),
+        )
+        self._pending = OrderedDict() # {camera: deque[(crop, callback)]}, urutan = giliran round-robin
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._stopped = False
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.failed = 0
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="ocr-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, camera, crop, callback):
+        """Queues a crop (it is copied, so the caller may keep drawing on the frame)."""
+        dropped_callback = None
+        with self._cond:
+            pending = self._pending.setdefault(camera, deque())
+            if len(pending) >= self.max_pending_per_camera:
+                _, dropped_callback = pending.popleft()
+                self.dropped += 1
+            pending.append((crop.copy(), callback))
+            self.submitted += 1
+            self._cond.notify()
+        if dropped_callback is not None:
+            dropped_callback(None)
+
+    def _next_job(self):
+        # Round-robin antar kamera agar satu kamera ramai tidak memonopoli worker
+        for camera, pending in self._pending.items():
+            if pending:
+                self._pending.move_to_end(camera)
+                return pending.popleft()
+        return None
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopped:
+                    if self._in_flight < self.num_workers:
+                        job = self._next_job()
+                        if job is not None:
+                            break
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                self._in_flight += 1
+            crop, callback = job
+            try:
+                future = self._executor.submit(_run_ocr, crop, self.psm, self.whitelist)
+            except RuntimeError as e: # Executor sudah dimatikan
+                self._finish(callback, None, e)
+                continue
+            future.add_done_callback(functools.partial(self._on_done, callback))
+
+    def _on_done(self, callback, future):
+        try:
+            text, error = future.result(), None
+        except Exception as e:
+            text, error = None, e
+        self._finish(callback, text, error)
+
+    def _finish(self, callback, text, error):
+        with self._cond:
+            self._in_flight -= 1
+            if error is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._cond.notify()
+        if error is not None:
+            print(f"Error OCR di worker: {error}")
+        callback(text)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'ocr_workers': self.num_workers,
+                'ocr_submitted': self.submitted,
+                'ocr_completed': self.completed,
+                'ocr_dropped': self.dropped,
+                'ocr_failed': self.failed,
+                'ocr_in_flight': self._in_flight,
+                'ocr_queued': sum(len(pending) for pending in self._pending.values()),
+            }
+
+    def shutdown(self, timeout=2.0):
+        """Stops the dispatcher and the worker processes; queued crops are dropped."""
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._pending.clear()
+            self._cond.notify_all()
+        self._dispatcher.join(timeout)
+        self._executor.shutdown(wait=True, cancel_futures=True)
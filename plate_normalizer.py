@@ -0,0 +1,199 @@
+import functools
+import re
+
+# --- Normalisasi teks OCR menjadi plat nomor ---
+# Plat Indonesia tersusun dari tiga slot: kode wilayah (1-2 huruf), nomor (1-4 angka) dan
+# huruf belakang (1-3 huruf), misalnya "B 2156 TOR". Tesseract sering membaca karakter yang
+# mirip dari kelas yang salah (O di slot angka, 8 di slot huruf, ...). Karena isi setiap slot
+# sudah pasti huruf atau angka, karakter yang tertukar bisa dikoreksi menurut posisinya:
+#   1. Teks dibersihkan (kapital, hanya A-Z dan 0-9). Jika langsung cocok dengan pola plat dan
+#      kode wilayahnya dikenal, selesai tanpa koreksi.
+#   2. Jika tidak, semua pembagian teks menjadi tiga slot dicoba. Karakter yang bisa dikoreksi
+#      ke kelas slotnya (LETTER_FOR_DIGIT / DIGIT_FOR_LETTER) dihitung sebagai koreksi. Kode
+#      wilayah hasil koreksi harus ada di REGION_CODES, supaya angka acak tidak menjadi kode.
+#   3. Pembagian dengan karakter terbanyak dan koreksi paling sedikit dipilih.
+# Setiap slot butuh minimal satu karakter yang terbaca di kelasnya sendiri. Huruf belakang yang
+# seluruhnya hasil koreksi hanya diterima jika wilayah dikenal tanpa koreksi dan nomor terbaca
+# apa adanya, dan juga bila nomor sudah empat angka (karakter sesudahnya pasti milik huruf
+# belakang, "B1001888" -> "B 1001 BBB") atau bila huruf belakang di akhir teks hanya berisi '2'
+# yang dibaca untuk 'Z' ("KB9602" -> "KB 960 Z"); format_plat lama selalu mengoreksi '2' begitu
+# dan target yang sudah tersimpan bergantung padanya. Pengecekan regresi: benchmark_normalizer.py --check.
+# Teks OCR yang sama berulang di banyak frame, jadi hasilnya disimpan di cache LRU terbatas.
+
+# Kode wilayah plat Indonesia (daftar di log.html ditambah kode yang belum ada di sana)
+REGION_CODES = frozenset({
+    'A', 'B', 'D', 'E', 'F', 'G', 'H', 'K', 'L', 'M', 'N', 'P', 'R', 'S', 'T', 'W', 'Z',
+    'AA', 'AB', 'AD', 'AE', 'AG',
+    'BA', 'BB', 'BD', 'BE', 'BG', 'BH', 'BK', 'BL', 'BM', 'BN', 'BP',
+    'CC', 'CD',
+    'DA', 'DB', 'DC', 'DD', 'DE', 'DG', 'DH', 'DK', 'DL', 'DM', 'DN', 'DP', 'DR', 'DS', 'DT', 'DU', 'DW',
+    'EA', 'EB', 'ED',
+    'KB', 'KH', 'KT', 'KU',
+    'PA', 'PB', 'RI',
+})
+
+# Koreksi menurut posisi, searah dengan pasangan OCR_CONFUSION_COSTS di watchlist_index.py
+LETTER_FOR_DIGIT = {'0': 'O', '1': 'I', '2': 'Z', '4': 'A', '5': 'S', '6': 'G', '7': 'T', '8': 'B'}
+DIGIT_FOR_LETTER = {'O': '0', 'D': '0', 'Q': '0', 'I': '1', 'L': '1', 'Z': '2', 'A': '4',
+                    'S': '5', 'G': '6', 'T': '7', 'B': '8'}
+
+PREFIX_LENGTHS = (1, 2)
+NUMBER_LENGTHS = (1, 2, 3, 4)
+SUFFIX_LENGTHS = (1, 2, 3)
+MAX_CORRECTIONS = 3
+CORRECTION_PENALTY = 0.5 # Satu koreksi mengurangi nilai setengah karakter
+UNKNOWN_REGION_PENALTY = 1.5 # Kode wilayah tanpa koreksi tapi tidak dikenal (misalnya noise "IB")
+DEFAULT_CACHE_SIZE = 4096
+
+_NOT_PLATE_CHAR = re.compile(r'[^A-Z0-9]+')
+_PLATE = re.compile(r'([A-Z]{1,2})(\d{1,4})([A-Z]{1,3})')
+_TO_LETTERS = str.maketrans(LETTER_FOR_DIGIT)
+_TO_DIGITS = str.maketrans(DIGIT_FOR_LETTER)
+_IMPOSSIBLE = 100 # Biaya karakter yang tidak bisa dikoreksi ke kelas slot; di atas MAX_CORRECTIONS
+
+# Biaya setiap karakter di slot huruf dan slot angka: 0 cocok, 1 bisa dikoreksi
+_LETTER_COST = {}
+_DIGIT_COST = {}
+for _char in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789':
+    if _char.isalpha():
+        _LETTER_COST[_char] = 0
+        _DIGIT_COST[_char] = 1 if _char in DIGIT_FOR_LETTER else _IMPOSSIBLE
+    else:
+        _LETTER_COST[_char] = 1 if _char in LETTER_FOR_DIGIT else _IMPOSSIBLE
+        _DIGIT_COST[_char] = 0
+
+
+def _running_sums(values):
+    sums = [0]
+    for value in values:
+        sums.append(sums[-1] + value)
+    return sums
+
+
+class PlateNormalizer:
+    """
+    Turns raw OCR text into a formatted plate ("B 2156 TOR"), or "" if it holds none.
+
+    Characters read in the wrong class are corrected by their slot: letters in the number
+    and digits in the region code or suffix. normalize() results are memoized in an LRU
+    cache of `cache_size` entries (0 disables it). Safe to use from several threads.
+    """
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, region_codes=REGION_CODES):
+        self.cache_size = cache_size
+        self.region_codes = frozenset(region_codes)
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._normalize)
+        self.corrected = 0
+        self.rejected = 0
+
+    def normalize(self, plat_text):
+        if not plat_text:
+            return ""
+        return self._cached(plat_text)
+
+    def normalize_many(self, texts):
+        """normalize() for a batch of texts, in order; repeats within the batch are done once."""
+        done = {}
+        result = []
+        for text in texts:
+            plat_nomor = done.get(text)
+            if plat_nomor is None:
+                plat_nomor = done[text] = self.normalize(text)
+            result.append(plat_nomor)
+        return result
+
+    def clear_cache(self):
+        self._cached.cache_clear()
+
+    def _normalize(self, plat_text):
+        clean = _NOT_PLATE_CHAR.sub('', plat_text.upper())
+        match = _PLATE.fullmatch(clean)
+        if match and match.group(1) in self.region_codes:
+            return " ".join(match.groups())
+        parsed = self._parse_slots(clean)
+        if parsed is None:
+            self.rejected += 1
+            return ""
+        start, number_start, suffix_start, end, corrections = parsed
+        if corrections:
+            self.corrected += 1
+        prefix = clean[start:number_start].translate(_TO_LETTERS)
+        angka = clean[number_start:suffix_start].translate(_TO_DIGITS)
+        suffix = clean[suffix_start:end].translate(_TO_LETTERS)
+        return f"{prefix} {angka} {suffix}"
+
+    def _parse_slots(self, clean):
+        """Best (start, number start, suffix start, end, corrections) split of `clean`, or None."""
+        n = len(clean)
+        letter_costs = [_LETTER_COST[char] for char in clean]
+        digit_costs = [_DIGIT_COST[char] for char in clean]
+        letter_sums = _running_sums(letter_costs)
+        digit_sums = _running_sums(digit_costs)
+        # A slot needs at least one character that was read in its own class
+        real_letters = _running_sums(cost == 0 for cost in letter_costs)
+        real_digits = _running_sums(cost == 0 for cost in digit_costs)
+
+        best_key = None
+        best = None
+        for start in range(n):
+            if best_key is not None and best_key[0] >= n - start:
+                break # A later start can't cover enough characters to win
+            for prefix_length in PREFIX_LENGTHS:
+                number_start = start + prefix_length
+                if number_start >= n:
+                    break
+                prefix_cost = letter_sums[number_start] - letter_sums[start]
+                if prefix_cost > MAX_CORRECTIONS:
+                    break
+                known_region = clean[start:number_start].translate(_TO_LETTERS) in self.region_codes
+                if prefix_cost and not known_region:
+                    continue
+                for number_length in NUMBER_LENGTHS:
+                    suffix_start = number_start + number_length
+                    if suffix_start >= n:
+                        break
+                    number_cost = prefix_cost + digit_sums[suffix_start] - digit_sums[number_start]
+                    if number_cost > MAX_CORRECTIONS:
+                        break
+                    if real_digits[suffix_start] == real_digits[number_start]:
+                        continue
+                    # Region and number read as they are; an all-corrected suffix may follow them
+                    plain_split = known_region and number_cost == 0
+                    for suffix_length in SUFFIX_LENGTHS:
+                        end = suffix_start + suffix_length
+                        if end > n:
+                            break
+                        corrections = number_cost + letter_sums[end] - letter_sums[suffix_start]
+                        if corrections > MAX_CORRECTIONS:
+                            break
+                        if real_letters[end] == real_letters[suffix_start] and not (
+                                plain_split and (number_length == NUMBER_LENGTHS[-1] or (
+                                    end == n and clean[suffix_start:end] == '2' * suffix_length))):
+                            continue
+                        score = end - start - CORRECTION_PENALTY * corrections
+                        if not known_region:
+                            score -= UNKNOWN_REGION_PENALTY
+                        # Ties: fewer corrections, then a two-letter region code, then the earlier start
+                        key = (score, -corrections, prefix_length, -start)
+                        if best_key is None or key > best_key:
+                            best_key = key
+                            best = (start, number_start, suffix_start, end, corrections)
+        return best
+
+    def stats(self):
+        info = self._cached.cache_info()
+        return {
+            'normalizer_cache_hits': info.hits,
+            'normalizer_cache_misses': info.misses,
+            'normalizer_cache_entries': info.currsize,
+            'normalizer_corrected': self.corrected,
+            'normalizer_rejected': self.rejected,
+        }
+
+
+plate_normalizer = PlateNormalizer()
+
+
+def format_plat(plat_text):
+    """Formats OCR text as a plate with the shared, cached PlateNormalizer."""
+    return plate_normalizer.normalize(plat_text)
@@ -0,0 +1,162 @@
+import re
+import threading
+
+# --- Aturan pola watchlist (wildcard) ---
+# Selain plat persis, daftar target bisa berisi pola:
+#   *  nol atau lebih karakter apa pun (termasuk spasi)
+#   ?  tepat satu huruf atau angka
+# Contoh: "* TOR" (plat berakhiran TOR), "B 21?? *", "AB *" (semua plat wilayah AB).
+# Semua pola digabung menjadi satu trie (NFA). Plat ditelusuri sekali, karakter demi karakter,
+# dengan himpunan state aktif; transisi antar himpunan state disimpan sehingga lama-lama menjadi
+# DFA yang dibangun sambil jalan. Biaya per plat tidak bertambah dengan jumlah pola.
+
+PATTERN_CHARS = re.compile(r'^[A-Z0-9 *?]+$')
+MAX_DFA_STATES = 20000 # Batas memori transisi DFA; dibuang dan dibangun ulang jika terlampaui
+
+
+def is_plate_pattern(text):
+    return '*' in text or '?' in text
+
+
+def normalize_pattern(text):
+    """Uppercases a pattern and collapses repeated spaces and stars. Raises ValueError if it is invalid."""
+    pattern = " ".join(text.upper().split())
+    pattern = re.sub(r'\*+', '*', pattern)
+    if not pattern or not PATTERN_CHARS.match(pattern):
+        raise ValueError(f'Pola "{text}" hanya boleh berisi huruf, angka, spasi, * dan ?.')
+    if pattern.replace('*', '').strip() == '':
+        raise ValueError(f'Pola "{text}" akan cocok dengan semua plat.')
+    return pattern
+
+
+class _LazyDfa:
+    """Interned sets of trie nodes and the transitions found between them so far."""
+
+    def __init__(self, start_nodes):
+        self.sets = [start_nodes]
+        self.ids = {start_nodes: 0}
+        self.delta = {} # {(state id, char): state id}
+        self.accepts = {} # {state id: patterns matched when the plate ends in that state}
+
+
+class PatternMatcher:
+    """
+    Matches formatted plates against many wildcard patterns in one pass.
+
+    match() returns the patterns that match the whole plate, in the order they were
+    added. Safe to call from several threads; build a new matcher to change the patterns.
+    """
+
+    def __init__(self, patterns=()):
+        # Trie nodes as parallel lists: literal children, '?' child, '*' child, self-loop, accepted pattern numbers
+        self._children = []
+        self._any = []
+        self._star = []
+        self._loop = []
+        self._accepts = []
+        self._new_node()
+        self._patterns = []
+        for pattern in patterns:
+            self._add(pattern)
+        self._lock = threading.Lock()
+        self._dfa = _LazyDfa(self._closure({0}))
+        self.lookups = 0
+        self.hits = 0
+        self.dfa_resets = 0
+
+    def _new_node(self, loop=False):
+        self._children.append({})
+        self._any.append(-1)
+        self._star.append(-1)
+        self._loop.append(loop)
+        self._accepts.append(())
+        return len(self._children) - 1
+
+    def _add(self, pattern):
+        node = 0
+        for char in pattern:
+            if char == '*':
+                if self._star[node] == -1:
+                    self._star[node] = self._new_node(loop=True)
+                node = self._star[node]
+            elif char == '?':
+                if self._any[node] == -1:
+                    self._any[node] = self._new_node()
+                node = self._any[node]
+            else:
+                child = self._children[node].get(char)
+                if child is None:
+                    child = self._children[node][char] = self._new_node()
+                node = child
+        if not any(self._patterns[number] == pattern for number in self._accepts[node]):
+            self._accepts[node] += (len(self._patterns),)
+            self._patterns.append(pattern)
+
+    def _closure(self, nodes):
+        # A '*' also matches nothing, so the node after it is reachable without reading a char
+        result = set()
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if node in result:
+                continue
+            result.add(node)
+            if self._star[node] != -1:
+                stack.append(self._star[node])
+        return frozenset(result)
+
+    def _step(self, dfa, state, char):
+        nodes = set()
+        for node in dfa.sets[state]:
+            if self._loop[node]:
+                nodes.add(node)
+            child = self._children[node].get(char)
+            if child is not None:
+                nodes.add(child)
+            if char != ' ' and self._any[node] != -1:
+                nodes.add(self._any[node])
+        nodes = self._closure(nodes)
+        with self._lock:
+            next_state = dfa.ids.get(nodes)
+            if next_state is None:
+                next_state = dfa.ids[nodes] = len(dfa.sets)
+                dfa.sets.append(nodes)
+            dfa.delta[(state, char)] = next_state
+        return next_state
+
+    def match(self, plat_nomor):
+        """Returns the patterns matching the plate (spaces normalized, upper case)."""
+        self.lookups += 1
+        if not self._patterns:
+            return []
+        dfa = self._dfa
+        if len(dfa.sets) > MAX_DFA_STATES:
+            dfa = self._dfa = _LazyDfa(dfa.sets[0])
+            self.dfa_resets += 1
+        state = 0
+        for char in " ".join(plat_nomor.upper().split()):
+            next_state = dfa.delta.get((state, char))
+            if next_state is None:
+                next_state = self._step(dfa, state, char)
+            state = next_state
+            if not dfa.sets[state]:
+                return [] # No pattern can match any more
+        matched = dfa.accepts.get(state)
+        if matched is None:
+            numbers = sorted({number for node in dfa.sets[state] for number in self._accepts[node]})
+            matched = dfa.accepts[state] = [self._patterns[number] for number in numbers]
+        if matched:
+            self.hits += 1
+        return list(matched)
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def stats(self):
+        return {
+            'watchlist_patterns': len(self._patterns),
+            'pattern_lookups': self.lookups,
+            'pattern_hits': self.hits,
+            'pattern_dfa_states': len(self._dfa.sets),
+            'pattern_dfa_resets': self.dfa_resets,
+        }
@@ -0,0 +1,186 @@
+from collections import Counter
+import itertools
+import queue
+
+# --- Pelacak plat nomor dengan voting OCR per track ---
+# Kotak hasil YOLO dihubungkan antar frame berdasarkan IoU (dengan cadangan jarak titik
+# tengah), sehingga satu kendaraan mendapat satu ID track yang stabil. Setiap track hanya
+# di-OCR beberapa kali; hasil format_plat divoting dan teks pemenang dipakai terus
+# selama track masih hidup.
+
+IOU_MATCH_THRESHOLD = 0.3
+CENTROID_MATCH_RATIO = 0.5 # Jarak titik tengah maksimum, relatif terhadap lebar kotak
+MAX_MISSED_FRAMES = 15 # Track dihapus setelah tidak terlihat sebanyak ini
+MAX_OCR_ATTEMPTS = 5 # OCR maksimum per track sebelum hasil voting dikunci
+VOTES_TO_CONFIRM = 3 # Hasil yang sama sebanyak ini langsung mengunci teks track
+
+
+def bbox_iou(a, b):
+    """IoU of two (x, y, w, h) boxes."""
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    inter_w = min(ax2, bx2) - max(a[0], b[0])
+    inter_h = min(ay2, by2) - max(a[1], b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / float(union) if union > 0 else 0.0
+
+
+def bbox_centroid_distance(a, b):
+    ax, ay = a[0] + a[2] / 2.0, a[1] + a[3] / 2.0
+    bx, by = b[0] + b[2] / 2.0, b[1] + b[3] / 2.0
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5
+
+
+class PlateTrack:
+    """One plate followed across frames, with its OCR votes."""
+
+    def __init__(self, track_id, bbox, max_ocr_attempts=MAX_OCR_ATTEMPTS, votes_to_confirm=VOTES_TO_CONFIRM):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.missed = 0
+        self.age = 1
+        self.ocr_attempts = 0
+        self.ocr_pending = False # True while an asynchronous OCR request for this track is in flight
+        self.votes = Counter()
+        self.final_text = None
+        self.max_ocr_attempts = max_ocr_attempts
+        self.votes_to_confirm = votes_to_confirm
+
+    def needs_ocr(self):
+        return self.final_text is None and not self.ocr_pending and self.ocr_attempts < self.max_ocr_attempts
+
+    def add_reading(self, formatted_text):
+        """Records one OCR attempt. Empty readings use up an attempt but don't vote."""
+        self.ocr_attempts += 1
+        if formatted_text:
+            self.votes[formatted_text] += 1
+        if self.votes:
+            leader, count = self.votes.most_common(1)[0]
+            if count >= self.votes_to_confirm or self.ocr_attempts >= self.max_ocr_attempts:
+                self.final_text = leader
+        elif self.ocr_attempts >= self.max_ocr_attempts:
+            self.final_text = "" # Unreadable plate: stop spending OCR on it
+
+    @property
+    def text(self):
+        """The locked text if voting finished, otherwise the current leader (may be empty)."""
+        if self.final_text is not None:
+            return self.final_text
+        if self.votes:
+            return self.votes.most_common(1)[0][0]
+        return ""
+
+
+class PlateTracker:
+    """
+    Assigns stable track IDs to plate boxes across frames of one camera.
+
+    update() takes this frame's (x, y, w, h) boxes and returns the tracks seen in
+    this frame, in the same order as the boxes.
+    """
+
+    def __init__(self, iou_threshold=IOU_MATCH_THRESHOLD, max_missed=MAX_MISSED_FRAMES,
+                 max_ocr_attempts=MAX_OCR_ATTEMPTS, votes_to_confirm=VOTES_TO_CONFIRM):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.max_ocr_attempts = max_ocr_attempts
+        self.votes_to_confirm = votes_to_confirm
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self.tracks_created = 0
+        self.ocr_calls = 0
+        self.ocr_skipped = 0
+        self._readings = queue.SimpleQueue() # Hasil OCR asinkron, diterapkan di thread pemrosesan
+
+    def update(self, bboxes):
+        # Greedy matching: best IoU pairs first, then centroid distance for fast movers
+        pairs = []
+        for ti, track in enumerate(self.tracks):
+            for bi, bbox in enumerate(bboxes):
+                iou = bbox_iou(track.bbox, bbox)
+                if iou >= self.iou_threshold:
+                    pairs.append((1.0 + iou, ti, bi))
+                else:
+                    distance = bbox_centroid_distance(track.bbox, bbox)
+                    max_distance = CENTROID_MATCH_RATIO * max(track.bbox[2], bbox[2])
+                    if distance <= max_distance:
+                        pairs.append((1.0 - distance / max_distance if max_distance > 0 else 0.0, ti, bi))
+        pairs.sort(reverse=True)
+
+        matched_tracks, assigned = set(), {}
+        for _, ti, bi in pairs:
+            if ti in matched_tracks or bi in assigned:
+                continue
+            matched_tracks.add(ti)
+            track = self.tracks[ti]
+            track.bbox = bboxes[bi]
+            track.missed = 0
+            track.age += 1
+            assigned[bi] = track
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.missed += 1
+
+        for bi, bbox in enumerate(bboxes):
+            if bi not in assigned:
+                track = PlateTrack(next(self._ids), bbox, self.max_ocr_attempts, self.votes_to_confirm)
+                self.tracks.append(track)
+                self.tracks_created += 1
+                assigned[bi] = track
+
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+        return [assigned[bi] for bi in range(len(bboxes))]
+
+    def deliver_reading(self, track_id, formatted_text):
+        """
+        Thread-safe: hands an asynchronous OCR result to the track. None means the request
+        was dropped and doesn't count as an attempt. Applied on the next apply_readings().
+        """
+        self._readings.put((track_id, formatted_text))
+
+    def apply_readings(self):
+        """Applies the OCR results delivered since the last call to the tracks still alive."""
+        tracks_by_id = None
+        while True:
+            try:
+                track_id, formatted_text = self._readings.get_nowait()
+            except queue.Empty:
+                return
+            if tracks_by_id is None:
+                tracks_by_id = {track.track_id: track for track in self.tracks}
+            track = tracks_by_id.get(track_id)
+            if track is None:
+                continue # Track sudah hilang sebelum hasil OCR tiba
+            track.ocr_pending = False
+            if formatted_text is not None:
+                track.add_reading(formatted_text)
+
+    def visible_tracks(self):
+        """Tracks that were matched on the latest update."""
+        return [track for track in self.tracks if track.missed == 0]
+
+    def stats(self):
+        return {
+            'active_tracks': len(self.tracks),
+            'tracks_created': self.tracks_created,
+            'ocr_calls': self.ocr_calls,
+            'ocr_skipped': self.ocr_skipped,
+            'ocr_calls_per_track': round(self.ocr_calls / self.tracks_created, 2) if self.tracks_created else 0.0,
+        }
+
+
+def pick_plate(tracks):
+    """
+    Returns (text, bbox, settled) of the plate to show, or ("", None, False).
+    A track whose text has been settled by voting wins over one still being read. The text
+    of an unsettled track is only the current leader, one misread may be all it rests on,
+    so it is for display only and must not be matched against the watchlist.
+    """
+    for track in sorted(tracks, key=lambda t: t.final_text is None):
+        if track.text:
+            return track.text, track.bbox, track.final_text is not None
+    return "", None, False
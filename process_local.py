@@ -0,0 +1,43 @@
+import os
+import threading
+
+# --- Objek per proses ---
+# Objek yang menjalankan thread latar belakang (penjadwal inferensi, pool OCR, penulis log,
+# dispatcher alert) tidak boleh dibuat saat impor: dengan 'gunicorn --preload' modul diimpor
+# di proses master lalu di-fork, dan thread tidak ikut ke proses worker. Objek tersebut tetap
+# ada di worker tetapi tidak ada yang menjalankannya. ProcessLocal membuat objek saat pertama
+# dipakai di setiap proses; proses hasil fork membuat salinannya sendiri.
+
+
+class ProcessLocal:
+    """
+    Lazily builds `factory()` once per process.
+
+    get() returns this process's object, creating it on first use; peek() returns it only
+    if it already exists. After a fork the child starts empty and builds its own object.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._value = None
+        self._pid = None
+        if hasattr(os, 'register_at_fork'):
+            # The parent's lock may be held at the moment of the fork; the child gets a fresh one
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self._pid = None
+
+    def get(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._value = self.factory()
+                    self._pid = os.getpid()
+        return self._value
+
+    def peek(self):
+        return self._value if self._pid == os.getpid() else None
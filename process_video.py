@@ -0,0 +1,430 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import queue
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+
+import cv2
+import pytesseract
+
+from camera_profiles import CameraProfile, load_camera_profiles
+from db import connect_wal
+from detector_backend import load_detector
+from log_writer import DetectionLogWriter
+from motion_gate import MotionGate
+from ocr_backend import create_ocr_backend
+from plate_normalizer import format_plat
+from plate_tracker import PlateTracker
+from watchlist_cache import WatchlistCache
+
+# --- Pemrosesan file video rekaman tanpa tampilan ---
+# anpr_system.py memutar file video dengan kecepatan tampilan, frame demi frame. Skrip ini
+# memproses rekaman secepat perangkat keras mampu:
+#   1. Setiap file dibagi menjadi potongan rentang frame (CHUNK_SECONDS) yang didekode oleh
+#      proses worker paralel. Setiap worker memuat detektor dan backend OCR sendiri, lalu
+#      menjalankan YOLO per batch frame dan melacak plat dengan PlateTracker (voting OCR).
+#      Seperti pada stream langsung, hanya plat yang votingnya sudah selesai yang dicatat.
+#      Worker melaporkan jumlah frame setiap PROGRESS_INTERVAL_SECONDS, jadi kemajuan dan
+#      frame/detik terlihat juga selama potongan pertama masih berjalan.
+#   2. Potongan saling tumpang tindih CHUNK_OVERLAP_SECONDS agar kendaraan di perbatasan tetap
+#      terbaca utuh; penampakan plat yang sama berdekatan (MERGE_GAP_SECONDS) digabung menjadi
+#      satu entri timeline.
+#   3. Timeline dicocokkan dengan watchlist (plat dan pola) lalu ditulis ke database log lewat
+#      log_writer, dengan waktu = waktu mulai rekaman + posisi frame.
+# Contoh:
+#   python process_video.py rekaman.mp4
+#   python process_video.py cam0_0800.mp4 cam0_0900.mp4 --workers 4 --camera 0 --output timeline.csv
+#   python process_video.py rekaman.mp4 --start "2025-08-01 08:00:00" --stride 2 --dry-run
+
+DB_TARGET_PLATS = "target_plats.db"
+DB_LOGS = "detection_logs.db"
+SCREENSHOT_FOLDER = "captured_plates"
+WATCHLIST_MAX_DISTANCE = float(os.getenv('WATCHLIST_MAX_DISTANCE', '0.6'))
+
+CHUNK_SECONDS = 60.0
+CHUNK_OVERLAP_SECONDS = 2.0
+MERGE_GAP_SECONDS = 5.0 # Plat yang sama terlihat lagi dalam selang ini dianggap kendaraan yang sama
+DETECT_BATCH_SIZE = 8
+FALLBACK_FPS = 25.0 # Jika file tidak mencantumkan fps
+SNAPSHOT_JPEG_QUALITY = 90
+PROGRESS_INTERVAL_SECONDS = 2.0
+
+CREATE_LOGS_SQL = '''
+    CREATE TABLE IF NOT EXISTS detection_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME NOT NULL,
+        plat_nomor TEXT NOT NULL,
+        is_target BOOLEAN NOT NULL,
+        screenshot_path TEXT
+    )
+'''
+TIMELINE_COLUMNS = ['file', 'first_seen', 'last_seen', 'first_frame', 'last_frame', 'plat_nomor', 'votes',
+                    'is_target', 'target', 'matched_rule', 'match_distance', 'screenshot_path']
+
+_worker_model = None # Detektor dan backend OCR milik proses worker, dibuat sekali oleh _init_worker
+_worker_ocr = None
+_progress_queue = None # Jumlah frame yang baru dibaca, dikirim ke proses utama
+
+
+def _init_worker(tesseract_cmd, torch_threads, ocr_backend_name, progress_queue=None):
+    global _worker_model, _worker_ocr, _progress_queue
+    _progress_queue = progress_queue
+    # Paralelisme datang dari jumlah proses; thread internal dibatasi agar worker tidak berebut CPU
+    os.environ.setdefault('OMP_NUM_THREADS', str(torch_threads)) # Sebelum torch diimpor oleh load_detector
+    cv2.setNumThreads(1)
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    _worker_model = load_detector()
+    _worker_ocr = create_ocr_backend(ocr_backend_name, pool_size=1)
+
+
+def _detect_batch(batch, profile, tracker, sightings, snapshot_quality):
+    """Runs the detector on a batch of ROIs, then tracks and reads plates frame by frame in order."""
+    predict_kwargs = {'verbose': False}
+    if profile.imgsz is not None:
+        predict_kwargs['imgsz'] = profile.imgsz
+    results = _worker_model([roi for _, _, roi, _ in batch], **predict_kwargs)
+    for (frame_index, frame, roi, offset), result in zip(batch, results):
+        boxes = result.boxes.data.cpu().numpy() if result.boxes is not None else ()
+        tracks = tracker.update(profile.plate_boxes(boxes, roi.shape, offset))
+        for track in tracks:
+            sighting = sightings.setdefault(track.track_id, {'first_frame': frame_index, 'track': track, 'snapshot': None})
+            sighting['last_frame'] = frame_index
+            if not track.needs_ocr():
+                tracker.ocr_skipped += 1
+                continue
+            x, y, w, h = track.bbox
+            tracker.ocr_calls += 1
+            text = _worker_ocr.image_to_string(frame[y:y + h, x:x + w], psm=8)
+            formatted_plat = format_plat(text.strip() if text else "")
+            track.add_reading(formatted_plat)
+            if formatted_plat and sighting['snapshot'] is None:
+                # Kept encoded: a screenshot is only written later if the plate is on the watchlist
+                ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, snapshot_quality])
+                sighting['snapshot'] = jpeg.tobytes() if ok else None
+
+
+def _report_progress(frames_read, reported):
+    """Sends the number of frames read since the last report to the main process."""
+    if _progress_queue is not None and frames_read > reported:
+        _progress_queue.put(frames_read - reported)
+    return frames_read
+
+
+def process_chunk(path, start_frame, end_frame, fps, profile, options):
+    """
+    Decodes frames [start_frame, end_frame) of a video (end_frame None = to the end) in a
+    worker process. Returns the plate sightings and frame counters of the chunk.
+    """
+    started = time.perf_counter()
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Tidak bisa membuka video {path}")
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    tracker = PlateTracker(max_ocr_attempts=options['max_ocr_attempts'])
+    motion_gate = MotionGate(**profile.motion) if options['motion_gate'] else None
+    sightings = {} # {track_id: {'first_frame', 'last_frame', 'track', 'snapshot'}}
+    batch = []
+    frame_index = start_frame
+    frames_read = frames_detected = 0
+    reported = 0
+    last_report = started
+    try:
+        while end_frame is None or frame_index < end_frame:
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL_SECONDS:
+                reported = _report_progress(frames_read, reported)
+                last_report = now
+            if (frame_index - start_frame) % options['stride']:
+                # Skipped frames are only grabbed, not converted to an image
+                if not cap.grab():
+                    break
+                frames_read += 1
+                frame_index += 1
+                continue
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames_read += 1
+            roi_image, offset = profile.crop(frame)
+            if motion_gate is None or motion_gate.should_detect(roi_image, now=frame_index / fps):
+                batch.append((frame_index, frame, roi_image, offset))
+                frames_detected += 1
+                if len(batch) >= options['batch_size']:
+                    _detect_batch(batch, profile, tracker, sightings, options['snapshot_quality'])
+                    batch = []
+            frame_index += 1
+        if batch:
+            _detect_batch(batch, profile, tracker, sightings, options['snapshot_quality'])
+    finally:
+        cap.release()
+        _report_progress(frames_read, reported)
+
+    plates = []
+    for sighting in sightings.values():
+        track = sighting['track']
+        # Only settled votes: the leading reading of an unsettled track may be a single misread
+        plat_nomor = track.final_text
+        if plat_nomor and track.votes[plat_nomor] >= options['min_votes']:
+            plates.append({'plat_nomor': plat_nomor, 'first_frame': sighting['first_frame'],
+                           'last_frame': sighting['last_frame'], 'votes': track.votes[plat_nomor],
+                           'snapshot': sighting['snapshot']})
+    return {
+        'path': path,
+        'start_frame': start_frame,
+        'frames_read': frames_read,
+        'frames_detected': frames_detected,
+        'seconds': time.perf_counter() - started,
+        'sightings': plates,
+        'tracker': tracker.stats(),
+    }
+
+
+def probe_video(path):
+    """Returns (frame count, fps) of a video file; the count is 0 if the container doesn't say."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Tidak bisa membuka video {path}")
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    finally:
+        cap.release()
+    if fps <= 0 or fps > 1000:
+        print(f"Peringatan: fps {path} tidak diketahui, dianggap {FALLBACK_FPS}.")
+        fps = FALLBACK_FPS
+    return max(0, frame_count), fps
+
+
+def plan_chunks(frame_count, chunk_frames, overlap_frames):
+    """Splits [0, frame_count) into (start, end) ranges; each starts overlap_frames before the previous end."""
+    if frame_count <= 0:
+        return [(0, None)] # Length unknown: one worker reads to the end
+    chunks = []
+    for start in range(0, frame_count, chunk_frames):
+        chunks.append((max(0, start - overlap_frames), min(frame_count, start + chunk_frames)))
+    return chunks
+
+
+def merge_sightings(sightings, gap_frames):
+    """Merges sightings of the same plate that overlap or are less than gap_frames apart, ordered by time."""
+    merged = []
+    current = {}
+    for sighting in sorted(sightings, key=lambda s: (s['plat_nomor'], s['first_frame'])):
+        previous = current.get(sighting['plat_nomor'])
+        if previous is not None and sighting['first_frame'] <= previous['last_frame'] + gap_frames:
+            previous['last_frame'] = max(previous['last_frame'], sighting['last_frame'])
+            if sighting['votes'] > previous['votes'] and sighting['snapshot'] is not None:
+                previous['snapshot'] = sighting['snapshot']
+            previous['votes'] += sighting['votes']
+            continue
+        entry = dict(sighting)
+        current[entry['plat_nomor']] = entry
+        merged.append(entry)
+    merged.sort(key=lambda s: s['first_frame'])
+    return merged
+
+
+def recording_start(path, frame_count, fps, start_text=None):
+    """Wall-clock time of frame 0: --start if given, otherwise the file's mtime minus its duration."""
+    if start_text:
+        return datetime.fromisoformat(start_text)
+    return datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=frame_count / fps)
+
+
+def print_progress(done_chunks, total_chunks, frames_read, total_frames, started):
+    elapsed = time.perf_counter() - started
+    rate = frames_read / elapsed if elapsed > 0 else 0.0
+    line = f"\r[{done_chunks}/{total_chunks} potongan] {frames_read} frame, {rate:.1f} frame/detik"
+    if total_frames:
+        progress = min(1.0, frames_read / total_frames)
+        remaining = (total_frames - frames_read) / rate if rate > 0 else 0.0
+        line += f", {progress:.1%}, sisa ~{max(0.0, remaining):.0f} detik"
+    sys.stdout.write(line + "   ")
+    sys.stdout.flush()
+
+
+def open_watchlist(db_path):
+    if not os.path.exists(db_path):
+        print(f"Peringatan: {db_path} tidak ditemukan, plat tidak dicocokkan dengan watchlist.")
+        return None
+    watchlist = WatchlistCache(db_path, max_distance=WATCHLIST_MAX_DISTANCE)
+    try:
+        watchlist.index()
+    except sqlite3.Error as e:
+        print(f"Peringatan: watchlist tidak bisa dimuat dari {db_path}: {e}")
+        return None
+    return watchlist
+
+
+def build_timeline(path, sightings, fps, start_time, watchlist, save_screenshots):
+    timeline = []
+    for sighting in sightings:
+        first_seen = start_time + timedelta(seconds=sighting['first_frame'] / fps)
+        last_seen = start_time + timedelta(seconds=sighting['last_frame'] / fps)
+        hit = watchlist.lookup(sighting['plat_nomor']) if watchlist is not None else None
+        target, match_distance, matched_rule = hit if hit else ('', None, None)
+        screenshot_path = None
+        if hit and save_screenshots and sighting['snapshot'] is not None:
+            if not os.path.exists(SCREENSHOT_FOLDER):
+                os.makedirs(SCREENSHOT_FOLDER)
+            screenshot_path = os.path.join(SCREENSHOT_FOLDER, f"{target.replace(' ', '_')}_{first_seen.strftime('%Y%m%d_%H%M%S')}.jpg")
+            with open(screenshot_path, 'wb') as f:
+                f.write(sighting['snapshot'])
+        timeline.append({
+            'file': path,
+            'first_seen': first_seen.strftime("%Y-%m-%d %H:%M:%S"),
+            'last_seen': last_seen.strftime("%Y-%m-%d %H:%M:%S"),
+            'first_frame': sighting['first_frame'],
+            'last_frame': sighting['last_frame'],
+            'plat_nomor': sighting['plat_nomor'],
+            'votes': sighting['votes'],
+            'is_target': bool(hit),
+            'target': target,
+            'matched_rule': matched_rule or '',
+            'match_distance': match_distance if match_distance is not None else '',
+            'screenshot_path': screenshot_path or '',
+        })
+    return timeline
+
+
+def write_logs(db_path, timeline, targets_only):
+    conn = connect_wal(db_path)
+    try:
+        with conn:
+            conn.execute(CREATE_LOGS_SQL)
+    finally:
+        conn.close()
+    writer = DetectionLogWriter(db_path)
+    written = 0
+    for entry in timeline:
+        if targets_only and not entry['is_target']:
+            continue
+        # Like live alerts, a watchlist hit is logged under the listed plate
+        writer.log(entry['target'] or entry['plat_nomor'], entry['is_target'],
+                   screenshot_path=entry['screenshot_path'] or None, timestamp=entry['first_seen'])
+        written += 1
+    writer.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proses file video rekaman tanpa tampilan dan tulis timeline plat ke database log.")
+    parser.add_argument('videos', nargs='+', help="File video yang akan diproses.")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Jumlah proses worker.")
+    parser.add_argument('--chunk-seconds', type=float, default=CHUNK_SECONDS, help="Panjang satu potongan video per tugas worker.")
+    parser.add_argument('--overlap-seconds', type=float, default=CHUNK_OVERLAP_SECONDS)
+    parser.add_argument('--merge-gap-seconds', type=float, default=MERGE_GAP_SECONDS)
+    parser.add_argument('--stride', type=int, default=1, help="Proses setiap frame ke-N (frame lain hanya dilewati).")
+    parser.add_argument('--batch-size', type=int, default=DETECT_BATCH_SIZE, help="Frame per panggilan detektor.")
+    parser.add_argument('--camera', type=int, help="Pakai profil kamera ini (ROI, imgsz, gerakan) dari camera_profiles.json.")
+    parser.add_argument('--imgsz', type=int, help="Ukuran inferensi YOLO (menimpa profil kamera).")
+    parser.add_argument('--no-motion-gate', action='store_true', help="Jalankan detektor pada setiap frame yang diproses.")
+    parser.add_argument('--max-ocr-attempts', type=int, default=5, help="OCR maksimum per plat yang dilacak.")
+    parser.add_argument('--min-votes', type=int, default=1, help="Jumlah bacaan OCR yang sama minimum agar plat dicatat.")
+    parser.add_argument('--start', help="Waktu mulai rekaman (YYYY-MM-DD HH:MM:SS); default waktu file dikurangi durasi.")
+    parser.add_argument('--targets-db', default=DB_TARGET_PLATS)
+    parser.add_argument('--db', default=DB_LOGS, help="Database log tujuan.")
+    parser.add_argument('--targets-only', action='store_true', help="Hanya tulis plat yang cocok dengan watchlist ke log.")
+    parser.add_argument('--output', help="Tulis timeline lengkap ke file CSV ini.")
+    parser.add_argument('--dry-run', action='store_true', help="Jangan tulis ke database log maupun screenshot.")
+    args = parser.parse_args()
+    if args.start and len(args.videos) > 1:
+        parser.error("--start hanya bisa dipakai untuk satu file video.")
+
+    profile = CameraProfile()
+    if args.camera is not None:
+        profile = load_camera_profiles().get(args.camera) or profile
+    if args.imgsz:
+        profile.imgsz = args.imgsz
+    options = {
+        'stride': max(1, args.stride),
+        'batch_size': max(1, args.batch_size),
+        'motion_gate': not args.no_motion_gate,
+        'max_ocr_attempts': args.max_ocr_attempts,
+        'min_votes': max(1, args.min_votes),
+        'snapshot_quality': SNAPSHOT_JPEG_QUALITY,
+    }
+
+    videos = {}
+    tasks = []
+    for path in args.videos:
+        frame_count, fps = probe_video(path)
+        videos[path] = {'frame_count': frame_count, 'fps': fps, 'sightings': []}
+        chunks = plan_chunks(frame_count, max(1, int(args.chunk_seconds * fps)), int(args.overlap_seconds * fps))
+        tasks.extend((path, start, end, fps) for start, end in chunks)
+        print(f"{path}: {frame_count or '?'} frame, {fps:.2f} fps, {len(chunks)} potongan")
+    total_frames = sum(end - start for _, start, end, _ in tasks if end is not None)
+    if any(end is None for _, _, end, _ in tasks):
+        total_frames = 0 # Some lengths are unknown: no percentage or ETA
+
+    workers = max(1, min(args.workers, len(tasks)))
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Memproses {len(tasks)} potongan dengan {workers} worker...")
+    started = time.perf_counter()
+    frames_read = frames_detected = ocr_calls = failed = 0
+    done = frames_progress = 0
+    progress_queue = multiprocessing.Queue()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(pytesseract.pytesseract.tesseract_cmd, torch_threads,
+                                       os.getenv('OCR_BACKEND', 'auto'), progress_queue)) as executor:
+        futures = {executor.submit(process_chunk, path, start, end, fps, profile, options): (path, start)
+                   for path, start, end, fps in tasks}
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, timeout=PROGRESS_INTERVAL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done += 1
+                path, start = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"\nError pada potongan {path} mulai frame {start}: {e}")
+                    continue
+                videos[path]['sightings'].extend(result['sightings'])
+                frames_read += result['frames_read']
+                frames_detected += result['frames_detected']
+                ocr_calls += result['tracker']['ocr_calls']
+            while True:
+                try:
+                    frames_progress += progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+            print_progress(done, len(tasks), max(frames_progress, frames_read), total_frames, started)
+    elapsed = time.perf_counter() - started
+    print(f"\nSelesai dalam {elapsed:.1f} detik: {frames_read} frame didekode ({frames_read / elapsed:.1f} frame/detik), "
+          f"{frames_detected} frame dideteksi, {ocr_calls} panggilan OCR, {failed} potongan gagal.")
+
+    watchlist = open_watchlist(args.targets_db)
+    timeline = []
+    for path, video in videos.items():
+        fps = video['fps']
+        start_time = recording_start(path, video['frame_count'], fps, args.start)
+        sightings = merge_sightings(video['sightings'], int(args.merge_gap_seconds * fps))
+        timeline.extend(build_timeline(path, sightings, fps, start_time, watchlist, save_screenshots=not args.dry_run))
+
+    targets = [entry for entry in timeline if entry['is_target']]
+    print(f"Timeline: {len(timeline)} plat, {len(targets)} cocok dengan watchlist.")
+    for entry in targets:
+        rule = f" (pola {entry['matched_rule']})" if entry['matched_rule'] else ""
+        print(f"  {entry['first_seen']}  {entry['target']}{rule}  dibaca '{entry['plat_nomor']}'  {entry['file']}")
+
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=TIMELINE_COLUMNS)
+            writer.writeheader()
+            writer.writerows(timeline)
+        print(f"Timeline ditulis ke {args.output}.")
+    if not args.dry_run:
+        written = write_logs(args.db, timeline, args.targets_only)
+        print(f"{written} log ditulis ke {args.db}.")
+
+
+if __name__ == "__main__":
+    main()
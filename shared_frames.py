@@ -0,0 +1,408 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from frame_capture import MAX_REOPEN_ATTEMPTS, REOPEN_DELAY_SECONDS, open_camera
+
+# --- Ring buffer frame di shared memory ---
+# Proses capture menulis frame kamera ke sejumlah slot berukuran tetap di shared memory.
+# Proses lain (deteksi, web, anpr_system.py) memetakan slot yang sama, jadi frame 1080p tidak
+# pernah di-pickle atau dikirim lewat pipe. Ring 8 slot berputar dalam ~270 ms pada 30 fps,
+# lebih cepat dari satu putaran deteksi, sehingga pembaca tidak memproses slot secara langsung:
+# slot disalin sekali ke memori pembaca lalu nomor urut slot diperiksa lagi (gaya seqlock).
+# Jika nomor itu berubah selama penyalinan (torn read), salinan dibuang dan dibaca ulang; nomor
+# urut juga menunjukkan apakah pembaca tertinggal lebih dari satu putaran ring (lap).
+
+DEFAULT_NUM_SLOTS = 8
+CAPTURE_START_TIMEOUT = 10.0 # Batas waktu proses capture membuka kamera
+READ_POLL_SECONDS = 0.002 # Interval polling pembaca saat menunggu frame baru
+
+_MAGIC = 0x414E5052 # 'ANPR'
+# Indeks field header (int64)
+_H_MAGIC, _H_SLOTS, _H_HEIGHT, _H_WIDTH, _H_CHANNELS, _H_WRITE_SEQ, _H_READ_SEQ, _H_OVERWRITES, _H_WRITER_PID, _H_CLOSED = range(10)
+_HEADER_FIELDS = 16
+_SLOT_META_FIELDS = 2 # seq, timestamp_ns
+_ALIGN = 64
+
+
+def ring_name_for(camera_index):
+    """Default shared memory name of a camera's ring, so other processes can attach to it."""
+    return f"anpr_cam{camera_index}"
+
+
+def _data_offset(num_slots):
+    offset = (_HEADER_FIELDS + num_slots * _SLOT_META_FIELDS) * 8
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+_attach_lock = threading.Lock()
+
+
+def _attach_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False) # Python 3.13+
+    except TypeError:
+        pass
+    # Older Pythons register attached segments with the resource tracker too, which would unlink
+    # the writer's ring when a reader exits; skip the registration while attaching.
+    from multiprocessing import resource_tracker
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True # Exists but belongs to another user
+    return True
+
+
+class SharedFrameRing:
+    """
+    Fixed-size frame slots in shared memory, written by one process and read by any number.
+
+    Frame `seq` (starting at 1) lives in slot `seq % num_slots`. A slot's sequence number is
+    set to -1 while it is being rewritten. read_latest() and read_next() return read-only views
+    into the slot, which the writer may overwrite at any time; copy_frame() turns such a view
+    into a private copy and checks with is_current() that the slot still held the frame after
+    the copy, so a copy it returns is never torn.
+
+    Writer-side counters live in the shared header (`overwrites`: frames replaced before any
+    reader took them). Reader-side counters (`laps`, `torn_reads`, `frames_skipped`) are per
+    SharedFrameRing object.
+    """
+
+    def __init__(self, shm, owner=False):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+        self._header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if self._header[_H_MAGIC] != _MAGIC:
+            raise ValueError(f"Shared memory {self.name} bukan ring frame ANPR.")
+        self.num_slots = int(self._header[_H_SLOTS])
+        self.frame_shape = (int(self._header[_H_HEIGHT]), int(self._header[_H_WIDTH]), int(self._header[_H_CHANNELS]))
+        self._meta = np.ndarray((self.num_slots, _SLOT_META_FIELDS), dtype=np.int64, buffer=shm.buf, offset=_HEADER_FIELDS * 8)
+        self._slots = np.ndarray((self.num_slots,) + self.frame_shape, dtype=np.uint8, buffer=shm.buf,
+                                 offset=_data_offset(self.num_slots))
+        self.laps = 0
+        self.torn_reads = 0
+        self.frames_skipped = 0
+
+    @classmethod
+    def create(cls, name, frame_shape, num_slots=DEFAULT_NUM_SLOTS):
+        """Creates the ring for frames of `frame_shape`. A leftover ring of a dead writer is replaced."""
+        height, width = frame_shape[:2]
+        channels = frame_shape[2] if len(frame_shape) == 3 else 1
+        size = _data_offset(num_slots) + num_slots * height * width * channels
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            if sys.platform == "win32" or cls.writer_alive(name):
+                raise
+            # Sisa proses capture yang mati tanpa sempat membersihkan ring-nya
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_H_SLOTS] = num_slots
+        header[_H_HEIGHT], header[_H_WIDTH], header[_H_CHANNELS] = height, width, channels
+        header[_H_WRITER_PID] = os.getpid()
+        np.ndarray((num_slots, _SLOT_META_FIELDS), dtype=np.int64, buffer=shm.buf, offset=_HEADER_FIELDS * 8)[:] = 0
+        header[_H_MAGIC] = _MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Maps an existing ring created by another process."""
+        return cls(_attach_shared_memory(name))
+
+    @classmethod
+    def writer_alive(cls, name):
+        """True if a ring with this name exists and its writer is still running."""
+        try:
+            ring = cls.attach(name)
+        except (FileNotFoundError, ValueError):
+            return False
+        alive = not ring.closed and (sys.platform == "win32" or _pid_alive(int(ring._header[_H_WRITER_PID])))
+        ring.close()
+        return alive
+
+    # --- Penulis ---
+    def write(self, frame):
+        """Copies a frame into the next slot and returns its sequence number."""
+        if frame.shape[:2] != self.frame_shape[:2]:
+            frame = cv2.resize(frame, (self.frame_shape[1], self.frame_shape[0]))
+        seq = int(self._header[_H_WRITE_SEQ]) + 1
+        slot = seq % self.num_slots
+        if self._meta[slot, 0] > self._header[_H_READ_SEQ]:
+            self._header[_H_OVERWRITES] += 1 # The frame in this slot was never taken by a reader
+        self._meta[slot, 0] = -1
+        np.copyto(self._slots[slot], frame.reshape(self.frame_shape))
+        self._meta[slot, 1] = time.time_ns()
+        self._meta[slot, 0] = seq
+        self._header[_H_WRITE_SEQ] = seq
+        return seq
+
+    # --- Pembaca ---
+    @property
+    def latest_seq(self):
+        return int(self._header[_H_WRITE_SEQ])
+
+    @property
+    def closed(self):
+        return bool(self._header[_H_CLOSED])
+
+    def _view(self, seq):
+        frame = self._slots[seq % self.num_slots]
+        frame = frame[:, :, 0] if self.frame_shape[2] == 1 else frame[...]
+        # Other processes may read the same slot, so readers get read-only views
+        frame.flags.writeable = False
+        return frame
+
+    def _mark_read(self, seq):
+        if seq > self._header[_H_READ_SEQ]:
+            self._header[_H_READ_SEQ] = seq
+
+    def read_latest(self, after_seq=0):
+        """
+        Returns (seq, frame_view, timestamp) of the newest frame if it is newer than after_seq,
+        otherwise (None, None, None). Frames written in between are counted as skipped.
+        """
+        seq = self.latest_seq
+        if seq <= after_seq:
+            return None, None, None
+        slot = seq % self.num_slots
+        timestamp = self._meta[slot, 1] / 1e9
+        if self._meta[slot, 0] != seq:
+            return None, None, None # Already being rewritten; the caller polls again
+        if after_seq:
+            self.frames_skipped += seq - after_seq - 1
+        self._mark_read(seq)
+        return seq, self._view(seq), timestamp
+
+    def read_next(self, after_seq=0):
+        """
+        Returns (seq, frame_view, timestamp) of the frame right after after_seq, for readers that
+        want every frame. A reader that fell a full ring behind is lapped: it jumps to the oldest
+        frame still available and the missed frames are counted.
+        """
+        latest = self.latest_seq
+        seq = after_seq + 1
+        if seq > latest:
+            return None, None, None
+        oldest = latest - self.num_slots + 2 # The slot after the newest one may be mid-rewrite
+        if seq < oldest:
+            self.laps += 1
+            self.frames_skipped += oldest - seq
+            seq = oldest
+        slot = seq % self.num_slots
+        timestamp = self._meta[slot, 1] / 1e9
+        if self._meta[slot, 0] != seq:
+            self.laps += 1
+            return None, None, None
+        self._mark_read(seq)
+        return seq, self._view(seq), timestamp
+
+    def copy_frame(self, seq, frame_view):
+        """Private copy of the view taken for frame seq, or None if the writer overwrote it meanwhile."""
+        frame = frame_view.copy()
+        # The slot may have been rewritten during the copy; only a seq still in place proves it was not
+        if not self.is_current(seq):
+            return None
+        return frame
+
+    def is_current(self, seq):
+        """True if the slot still holds frame seq, i.e. a view taken for it was not overwritten."""
+        if self._meta[seq % self.num_slots, 0] == seq:
+            return True
+        self.torn_reads += 1
+        return False
+
+    def stats(self):
+        return {
+            'ring_slots': self.num_slots,
+            'ring_frames_written': self.latest_seq,
+            'ring_overwrites': int(self._header[_H_OVERWRITES]),
+            'ring_laps': self.laps,
+            'ring_torn_reads': self.torn_reads,
+            'ring_frames_skipped': self.frames_skipped,
+        }
+
+    def close(self):
+        """Unmaps the ring; the writer also marks it closed and removes it."""
+        if self.owner:
+            self._header[_H_CLOSED] = 1
+        self._header = self._meta = self._slots = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass # A reader still holds frame views; the mapping goes away with them
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _capture_process(source, ring_name, num_slots, stop_event, ready_queue):
+    """Body of the capture process: reads the camera and writes every frame into the ring."""
+    cap = open_camera(source) if isinstance(source, int) else cv2.VideoCapture(source)
+    if cap is None or not cap.isOpened():
+        ready_queue.put(f"Tidak bisa membuka sumber video {source}.")
+        return
+    success, frame = cap.read()
+    if not success:
+        cap.release()
+        ready_queue.put(f"Sumber video {source} tidak menghasilkan frame.")
+        return
+    try:
+        ring = SharedFrameRing.create(ring_name, frame.shape, num_slots)
+    except (FileExistsError, OSError) as e:
+        cap.release()
+        ready_queue.put(f"Ring frame {ring_name} tidak bisa dibuat: {e}")
+        return
+    ready_queue.put(True)
+
+    try:
+        ring.write(frame)
+        reopen_attempts = 0
+        while not stop_event.is_set():
+            success, frame = cap.read()
+            if not success:
+                if stop_event.is_set() or not isinstance(source, int):
+                    break # End of a video file
+                print(f"Peringatan: Gagal membaca frame dari Kamera {source}. Mencoba membuka kembali...")
+                cap.release()
+                cap = open_camera(source)
+                reopen_attempts += 1
+                if cap is None or reopen_attempts > MAX_REOPEN_ATTEMPTS:
+                    print(f"Error: Gagal membuka kembali Kamera {source}. Menghentikan capture.")
+                    break
+                time.sleep(REOPEN_DELAY_SECONDS)
+                continue
+            reopen_attempts = 0
+            ring.write(frame)
+    finally:
+        if cap is not None:
+            cap.release()
+        ring.close()
+
+
+class SharedFrameCapture:
+    """
+    LatestFrameCapture counterpart whose camera is read by a separate process into a SharedFrameRing.
+
+    read() copies the newest slot out of the ring and verifies the copy against the slot's
+    sequence number, so the frame it returns is private, writable and never overwritten.
+    If the camera's ring already has a live writer (another worker or the engine), this
+    capture attaches to it as a reader instead of opening the camera a second time.
+    Pass source=None with a ring_name to only read a ring published elsewhere.
+    """
+
+    def __init__(self, source=None, ring_name=None, num_slots=DEFAULT_NUM_SLOTS):
+        if source is None and ring_name is None:
+            raise ValueError("SharedFrameCapture butuh source atau ring_name.")
+        self.source = source
+        self.ring_name = ring_name or ring_name_for(source)
+        self.num_slots = num_slots
+        self.stop_event = threading.Event()
+        self.ring = None
+        self._process = None
+        self._process_stop = None
+        self._last_seq = 0
+
+    def start(self):
+        """Starts (or attaches to) the capture process. Returns False if no frames can be read."""
+        if self.source is not None and not SharedFrameRing.writer_alive(self.ring_name):
+            # Spawned, not forked: this process already runs threads whose locks a fork could copy held
+            ctx = multiprocessing.get_context('spawn')
+            self._process_stop = ctx.Event()
+            ready_queue = ctx.Queue()
+            self._process = ctx.Process(
+                target=_capture_process,
+                args=(self.source, self.ring_name, self.num_slots, self._process_stop, ready_queue),
+                name=f"capture-{self.source}", daemon=True)
+            self._process.start()
+            try:
+                status = ready_queue.get(timeout=CAPTURE_START_TIMEOUT)
+            except Exception:
+                status = "Proses capture tidak merespons."
+            if status is not True:
+                print(f"Error: {status}")
+                self.stop()
+                return False
+        try:
+            self.ring = SharedFrameRing.attach(self.ring_name)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: Tidak bisa memetakan ring frame {self.ring_name}: {e}")
+            self.stop()
+            return False
+        return True
+
+    def _writer_gone(self):
+        if self.ring.closed:
+            return True
+        return self._process is not None and not self._process.is_alive()
+
+    def read(self, timeout=1.0):
+        """
+        Waits for a frame newer than the last one returned.
+
+        Returns (frame, age_seconds), or (None, None) on timeout or when the capture stopped.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.stop_event.is_set():
+            seq, frame_view, timestamp = self.ring.read_latest(self._last_seq)
+            if seq is not None:
+                self._last_seq = seq
+                frame = self.ring.copy_frame(seq, frame_view)
+                del frame_view # Don't keep the mapping pinned
+                if frame is not None:
+                    return frame, max(time.time() - timestamp, 0.0)
+                continue # Torn while copying; a newer frame is already in the ring
+            if self._writer_gone():
+                self.stop_event.set()
+                break
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(READ_POLL_SECONDS)
+        return None, None
+
+    def is_running(self):
+        return not self.stop_event.is_set()
+
+    def stop(self, join_timeout=2.0):
+        """Stops reading; a capture process started by this object is stopped and removes its ring."""
+        self.stop_event.set()
+        if self._process is not None:
+            self._process_stop.set()
+            self._process.join(join_timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+        # The ring mapping itself is released when the last frame view is gone
+
+    def stats(self):
+        if self.ring is None:
+            return {'frames_captured': 0, 'frames_dropped': 0}
+        stats = self.ring.stats()
+        stats['frames_captured'] = stats['ring_frames_written']
+        stats['frames_dropped'] = stats['ring_frames_skipped']
+        return stats
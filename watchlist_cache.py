@@ -0,0 +1,186 @@
+import sqlite3
+import threading
+import time
+
+from db import connect_wal
+from plate_patterns import PatternMatcher
+from watchlist_index import DEFAULT_MAX_DISTANCE, WatchlistIndex
+
+# --- Cache watchlist dalam memori dengan nomor versi ---
+# Trigger pada tabel target_plats menaikkan watchlist_version.version pada setiap INSERT,
+# UPDATE dan DELETE, dari proses mana pun (rute web, anpr_engine.py, anpr_system.py, sqlite3 CLI).
+# Satu thread per proses membaca nomor versi itu setiap WATCHLIST_CHECK_SECONDS (satu baris,
+# murah); jika berubah, plat dimuat ulang dan indeks baru dibangun di thread tersebut lalu
+# ditukar sekaligus. Loop frame hanya mengambil referensi indeks saat ini, tanpa query database.
+#
+# Kolom rule_type membedakan plat persis ('plate', dicocokkan toleran salah baca lewat
+# WatchlistIndex) dari pola wildcard ('pattern', digabung dalam satu PatternMatcher).
+
+WATCHLIST_CHECK_SECONDS = 1.0
+
+VERSION_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS watchlist_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+'''
+VERSION_TRIGGERS_SQL = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS target_plats_version_{event.lower()}
+    AFTER {event} ON target_plats
+    BEGIN
+        UPDATE watchlist_version SET version = version + 1 WHERE id = 1;
+    END
+    '''
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+
+def prepare_target_store(cursor):
+    """
+    Brings an existing target_plats table up to date: adds the rule_type column and creates
+    the watchlist_version row and the triggers that bump it.
+    """
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(target_plats)").fetchall()]
+    if 'rule_type' not in columns:
+        cursor.execute("ALTER TABLE target_plats ADD COLUMN rule_type TEXT NOT NULL DEFAULT 'plate'")
+    cursor.execute(VERSION_TABLE_SQL)
+    cursor.execute("INSERT OR IGNORE INTO watchlist_version (id, version) VALUES (1, 0)")
+    for trigger_sql in VERSION_TRIGGERS_SQL:
+        cursor.execute(trigger_sql)
+
+
+class WatchlistCache:
+    """
+    Process-wide WatchlistIndex and PatternMatcher of the target_plats table, reloaded when
+    its version changes.
+
+    lookup() matches a plate against both; index() and patterns() return the current ones.
+    The first call loads them and starts the background version check. invalidate() makes
+    the check run now (for changes made in this process). A reload swaps in the new index
+    and matcher together, so callers never see a half-updated watchlist.
+    """
+
+    def __init__(self, db_path, max_distance=DEFAULT_MAX_DISTANCE, check_interval=WATCHLIST_CHECK_SECONDS):
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.check_interval = check_interval
+        self._current = None # (WatchlistIndex, PatternMatcher), replaced as a whole
+        self._version = None
+        self._load_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.reloads = 0
+        self.version_checks = 0
+        self.last_reload_ms = None
+        self.load_errors = 0
+
+    def _snapshot(self):
+        current = self._current
+        if current is None:
+            with self._load_lock:
+                if self._current is None:
+                    conn = connect_wal(self.db_path)
+                    try:
+                        with conn: # Databases made before versioning get the column, table and triggers here
+                            prepare_target_store(conn.cursor())
+                        self._reload(conn)
+                    finally:
+                        conn.close()
+                    self._thread = threading.Thread(target=self._run, name="watchlist-cache", daemon=True)
+                    self._thread.start()
+                current = self._current
+        return current
+
+    def index(self):
+        return self._snapshot()[0]
+
+    def patterns(self):
+        return self._snapshot()[1]
+
+    def lookup(self, plat_nomor):
+        """
+        Matches a formatted plate against the watchlist. Returns (target, distance, rule) or None:
+        for plate rules `target` is the listed plate and `rule` is None; for pattern rules
+        `target` is the plate as read and `rule` the first matching pattern.
+        """
+        index, patterns = self._snapshot()
+        hit = index.best_match(plat_nomor)
+        if hit:
+            return hit[0], hit[1], None
+        rules = patterns.match(plat_nomor)
+        if rules:
+            return plat_nomor, 0.0, rules[0]
+        return None
+
+    def plates(self):
+        """Current target plates as a set."""
+        return set(self.index().plates())
+
+    @property
+    def version(self):
+        return self._version
+
+    def invalidate(self):
+        """Checks the version now instead of waiting for the next interval."""
+        self._wake.set()
+
+    def _read(self, conn, with_plates):
+        # One read transaction, so the plates match the version read with them
+        conn.execute("BEGIN")
+        try:
+            version = conn.execute("SELECT version FROM watchlist_version WHERE id = 1").fetchone()
+            version = version[0] if version else None
+            rules = None
+            if with_plates:
+                rules = conn.execute("SELECT plat_nomor, rule_type FROM target_plats").fetchall()
+            return version, rules
+        finally:
+            conn.execute("COMMIT")
+
+    def _reload(self, conn):
+        start = time.perf_counter()
+        version, rules = self._read(conn, with_plates=True)
+        plates = [plat_nomor.upper() for plat_nomor, rule_type in rules if rule_type != 'pattern']
+        patterns = [plat_nomor for plat_nomor, rule_type in rules if rule_type == 'pattern']
+        if self._current is None:
+            index = WatchlistIndex(plates, max_distance=self.max_distance)
+        else:
+            index = self._current[0].updated(plates)
+        self._current = (index, PatternMatcher(patterns)) # Readers switch to both in one step
+        self._version = version
+        self.reloads += 1
+        self.last_reload_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    def _run(self):
+        conn = None
+        while True:
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+            try:
+                if conn is None:
+                    conn = connect_wal(self.db_path)
+                self.version_checks += 1
+                version, _ = self._read(conn, with_plates=False)
+                if version != self._version:
+                    self._reload(conn)
+            except sqlite3.Error as e:
+                self.load_errors += 1
+                print(f"Error saat memeriksa versi watchlist: {e}")
+                if conn is not None:
+                    conn.close()
+                    conn = None
+
+    def stats(self):
+        current = self._current
+        stats = {
+            'watchlist_version': self._version,
+            'watchlist_reloads': self.reloads,
+            'watchlist_version_checks': self.version_checks,
+            'watchlist_last_reload_ms': self.last_reload_ms,
+            'watchlist_load_errors': self.load_errors,
+        }
+        if current is not None:
+            stats.update(current[0].stats())
+            stats.update(current[1].stats())
+        return stats
@@ -0,0 +1,245 @@
+import copy
+import threading
+
+# --- Indeks watchlist toleran salah baca OCR ---
+# Tesseract sering tertukar antara karakter yang bentuknya mirip (0/O, 8/B, 2/Z, 5/S, ...),
+# sehingga pencocokan persis melewatkan plat target karena satu karakter. Indeks ini:
+#   1. Memetakan setiap karakter ke wakil kelas kebingungannya (0, O, D, Q -> O), sehingga
+#      plat yang hanya berbeda karena salah baca semacam itu punya kunci kanonik yang sama.
+#   2. Jika max_distance >= 1.0 (satu karakter lain boleh salah/hilang/lebih), juga menyimpan
+#      "deletion neighborhood" kunci kanonik: semua varian dengan satu karakter dihapus.
+#      Satu substitusi, sisipan atau penghapusan tetap menghasilkan varian yang sama dengan
+#      salah satu varian target.
+#   3. Memverifikasi kandidat dengan jarak edit berbobot dari OCR_CONFUSION_COSTS.
+# Pencarian hanya beberapa lookup dict (paling banyak panjang plat + 1), jadi tetap di bawah
+# 1 ms untuk ratusan ribu plat target.
+
+# Biaya substitusi karakter yang sering tertukar oleh OCR; substitusi lain, sisipan dan
+# penghapusan berbiaya 1.0. Pasangan berlaku dua arah.
+OCR_CONFUSION_COSTS = {
+    ('0', 'O'): 0.2,
+    ('0', 'D'): 0.4,
+    ('0', 'Q'): 0.4,
+    ('O', 'D'): 0.4,
+    ('O', 'Q'): 0.4,
+    ('1', 'I'): 0.2,
+    ('1', 'L'): 0.4,
+    ('I', 'L'): 0.4,
+    ('2', 'Z'): 0.2,
+    ('5', 'S'): 0.2,
+    ('8', 'B'): 0.2,
+    ('6', 'G'): 0.3,
+    ('4', 'A'): 0.4,
+    ('7', 'T'): 0.4,
+}
+EDIT_COST = 1.0
+# 0.6: hanya salah baca karakter mirip (misalnya tiga kali 0/O). 1.0 juga menerima satu karakter
+# lain yang salah/hilang, tetapi dengan watchlist ratusan ribu plat itu memicu lebih banyak alert palsu.
+DEFAULT_MAX_DISTANCE = 0.6
+REBUILD_CHANGE_RATIO = 0.2 # updated() membangun ulang dari nol jika lebih dari 20% plat berubah
+TOLERANCE = 1e-9 # Jumlah biaya float (0.2 + 0.4) tidak selalu tepat
+
+
+def compact_plate(plat_nomor):
+    """Uppercase plate text without spaces, the form the index compares."""
+    return "".join(plat_nomor.split()).upper()
+
+
+def _confusion_classes(confusion_costs):
+    """Maps every confusable character to one representative of its class (union-find)."""
+    parent = {}
+
+    def find(char):
+        parent.setdefault(char, char)
+        while parent[char] != char:
+            parent[char] = parent[parent[char]]
+            char = parent[char]
+        return char
+
+    for a, b in confusion_costs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            # Letters are the representatives, so canonical keys stay readable
+            if root_a.isdigit():
+                root_a, root_b = root_b, root_a
+            parent[root_b] = root_a
+    return {char: find(char) for char in parent}
+
+
+class WatchlistIndex:
+    """
+    Fuzzy lookup of target plates that tolerates OCR misreads.
+
+    match() returns every target within `max_distance` of the read plate as
+    (target_plate, distance) pairs, closest first. The distance is a weighted edit
+    distance: confusable characters cost OCR_CONFUSION_COSTS, any other substitution,
+    insertion or deletion costs 1.0. Targets are found if they differ from the read plate
+    by confusable substitutions, plus at most one other edit when the index was built
+    with max_distance >= 1.0 (a larger max_distance passed to match() can't add that).
+    add() and remove() are thread-safe; lookups never block on them.
+    """
+
+    def __init__(self, plates=(), confusion_costs=None, max_distance=DEFAULT_MAX_DISTANCE):
+        confusion_costs = OCR_CONFUSION_COSTS if confusion_costs is None else confusion_costs
+        self.confusion_costs = confusion_costs
+        self.max_distance = max_distance
+        self.allow_edit = max_distance >= EDIT_COST # Index one-deletion variants too
+        self._costs = {}
+        for (a, b), cost in confusion_costs.items():
+            self._costs[(a, b)] = cost
+            self._costs[(b, a)] = cost
+        self._canonical_table = str.maketrans(_confusion_classes(confusion_costs))
+        self._plates = {} # {compact plate: plate as stored}
+        self._variants = {} # {canonical key or its deletion variant: compact plate or tuple of them}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        for plat_nomor in plates:
+            self.add(plat_nomor)
+
+    def _canonical(self, compact):
+        return compact.translate(self._canonical_table)
+
+    def _variants_of(self, compact):
+        key = self._canonical(compact)
+        variants = {key}
+        if self.allow_edit:
+            for i in range(len(key)):
+                variants.add(key[:i] + key[i + 1:])
+        return variants
+
+    def add(self, plat_nomor):
+        compact = compact_plate(plat_nomor)
+        if not compact:
+            return
+        with self._lock:
+            if compact in self._plates:
+                self._plates[compact] = plat_nomor
+                return
+            self._plates[compact] = plat_nomor
+            for variant in self._variants_of(compact):
+                entry = self._variants.get(variant)
+                if entry is None:
+                    self._variants[variant] = compact
+                elif isinstance(entry, tuple):
+                    self._variants[variant] = entry + (compact,)
+                else:
+                    self._variants[variant] = (entry, compact)
+
+    def remove(self, plat_nomor):
+        compact = compact_plate(plat_nomor)
+        with self._lock:
+            if self._plates.pop(compact, None) is None:
+                return
+            for variant in self._variants_of(compact):
+                entry = self._variants.get(variant)
+                if entry == compact:
+                    del self._variants[variant]
+                elif isinstance(entry, tuple):
+                    rest = tuple(plate for plate in entry if plate != compact)
+                    self._variants[variant] = rest if len(rest) > 1 else rest[0]
+
+    def updated(self, plates):
+        """
+        Returns a new index holding exactly `plates`; this index is left unchanged.
+        Small changes are applied to a copy of this index instead of indexing every plate again.
+        """
+        wanted = {}
+        for plat_nomor in plates:
+            compact = compact_plate(plat_nomor)
+            if compact:
+                wanted[compact] = plat_nomor
+        removed = [self._plates[compact] for compact in self._plates.keys() - wanted.keys()]
+        added = [plat_nomor for compact, plat_nomor in wanted.items() if self._plates.get(compact) != plat_nomor]
+        if len(removed) + len(added) > REBUILD_CHANGE_RATIO * max(len(wanted), len(self._plates)):
+            return WatchlistIndex(wanted.values(), self.confusion_costs, self.max_distance)
+        with self._lock:
+            clone = copy.copy(self)
+            clone._plates = dict(self._plates)
+            clone._variants = dict(self._variants) # Entries are str/tuple, safe to share
+        clone._lock = threading.Lock()
+        for plat_nomor in removed:
+            clone.remove(plat_nomor)
+        for plat_nomor in added:
+            clone.add(plat_nomor)
+        return clone
+
+    def plates(self):
+        """The indexed plates, as they were added."""
+        return list(self._plates.values())
+
+    def __len__(self):
+        return len(self._plates)
+
+    def __contains__(self, plat_nomor):
+        return compact_plate(plat_nomor) in self._plates
+
+    def distance(self, a, b, limit=None):
+        """Weighted edit distance between two compact plates; stops early once above `limit`."""
+        previous = [i * EDIT_COST for i in range(len(b) + 1)]
+        for i, char_a in enumerate(a, 1):
+            current = [i * EDIT_COST]
+            for j, char_b in enumerate(b, 1):
+                substitution = 0.0 if char_a == char_b else self._costs.get((char_a, char_b), EDIT_COST)
+                current.append(min(previous[j] + EDIT_COST, current[j - 1] + EDIT_COST,
+                                   previous[j - 1] + substitution))
+            if limit is not None and min(current) > limit + TOLERANCE:
+                return min(current)
+            previous = current
+        return previous[-1]
+
+    def match(self, plat_nomor, max_distance=None):
+        """Returns [(target_plate, distance), ...] within max_distance, closest first."""
+        max_distance = self.max_distance if max_distance is None else max_distance
+        compact = compact_plate(plat_nomor)
+        self.lookups += 1
+        if not compact:
+            return []
+        plates = self._plates
+        if max_distance <= 0:
+            exact = plates.get(compact)
+            if exact is None:
+                return []
+            self.exact_hits += 1
+            return [(exact, 0.0)]
+
+        candidates = set()
+        variants = self._variants
+        for variant in self._variants_of(compact):
+            entry = variants.get(variant)
+            if entry is None:
+                continue
+            if isinstance(entry, tuple):
+                candidates.update(entry)
+            else:
+                candidates.add(entry)
+
+        hits = []
+        for candidate in candidates:
+            distance = 0.0 if candidate == compact else self.distance(compact, candidate, limit=max_distance)
+            if distance <= max_distance + TOLERANCE:
+                target = plates.get(candidate)
+                if target is not None: # Removed while we were looking
+                    hits.append((target, round(distance, 3)))
+        hits.sort(key=lambda hit: (hit[1], hit[0]))
+        if hits:
+            if hits[0][1] == 0.0:
+                self.exact_hits += 1
+            else:
+                self.fuzzy_hits += 1
+        return hits
+
+    def best_match(self, plat_nomor, max_distance=None):
+        """Returns the closest (target_plate, distance), or None if nothing is within max_distance."""
+        hits = self.match(plat_nomor, max_distance)
+        return hits[0] if hits else None
+
+    def stats(self):
+        return {
+            'watchlist_plates': len(self._plates),
+            'watchlist_index_keys': len(self._variants),
+            'watchlist_lookups': self.lookups,
+            'watchlist_exact_hits': self.exact_hits,
+            'watchlist_fuzzy_hits': self.fuzzy_hits,
+        }